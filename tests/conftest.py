@@ -0,0 +1,75 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Stands in for wkhtmltopdf: writes a small PDF, either for each invocation or
+# for each line of arguments in --read-args-from-stdin mode, where a failed job
+# ends the process as it does wkhtmltopdf's. URLs containing "fail" fail, "hang"
+# never finish, "crash" kill a persistent process and "mute" close stderr.
+# Like wkhtmltopdf, -q and --quiet hide the progress output and "Done".
+FAKE_WKHTMLTOPDF = """\
+import json, os, shlex, subprocess, sys, time
+
+def convert(args):
+    with open(os.environ["FAKE_WKHTMLTOPDF_LOG"], "a") as log:
+        log.write(json.dumps(args) + "\\n")
+    source = args[-2] if len(args) > 1 else ""
+    if "hang" in source:
+        subprocess.Popen(["sleep", "1000"])
+        time.sleep(1000)
+    if "crash" in source:
+        os._exit(3)
+    if "mute" in source:
+        os.close(2)
+        time.sleep(1000)
+    quiet = "-q" in args or "--quiet" in args
+    if not quiet:
+        sys.stderr.write("Loading pages (1/6)\\n[====>    ] 40%\\r[=========] 100%\\r")
+    if "fail" in source:
+        sys.stderr.write("Exit with code 1 due to network error\\n")
+        sys.stderr.flush()
+        return 1
+    with open(args[-1], "wb") as f:
+        f.write(b"%PDF-1.4 " + source.encode())
+    if not quiet:
+        sys.stderr.write("Done\\n")
+        sys.stderr.flush()
+    return 0
+
+args = sys.argv[1:]
+if args == ["--read-args-from-stdin"]:
+    for line in sys.stdin:
+        if convert(shlex.split(line)):
+            sys.exit(1)
+    sys.exit(0)
+if args[-2:-1] == ["-"]:
+    sys.stdin.buffer.read()
+sys.exit(convert(args))
+"""
+
+
+@pytest.fixture
+def fake_wkhtmltopdf(tmp_path, monkeypatch):
+    """
+    Put a fake wkhtmltopdf first on the PATH.
+
+    Returns:
+        Callable[[], list[list[str]]]: Returns the arguments of each conversion
+            so far.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    script = bin_dir / "wkhtmltopdf"
+    script.write_text(f"#!{sys.executable}\n{FAKE_WKHTMLTOPDF}")
+    script.chmod(0o755)
+    log = tmp_path / "wkhtmltopdf.log"
+    log.touch()
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FAKE_WKHTMLTOPDF_LOG", str(log))
+
+    def calls() -> list[list[str]]:
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+    return calls
@@ -0,0 +1,76 @@
+from typer.testing import CliRunner
+
+from web_snatcher.main import app, assign_output_paths
+
+
+def run_batch(tmp_path, urls: list[str], *args: str):
+    source = tmp_path / "urls.txt"
+    source.write_text("\n".join(urls) + "\n")
+    output_dir = tmp_path / "out"
+    result = CliRunner().invoke(
+        app,
+        [
+            "batch",
+            str(source),
+            "-o",
+            str(output_dir),
+            "--cache-dir",
+            str(tmp_path / "cache"),
+            "--no-prefetch",
+            "--retries",
+            "0",
+            *args,
+        ],
+    )
+    return result, output_dir
+
+
+def test_batch_converts_every_url(tmp_path, fake_wkhtmltopdf):
+    urls = [f"http://example.com/page{i}" for i in range(5)]
+    result, output_dir = run_batch(tmp_path, urls, "-j", "3")
+
+    assert result.exit_code == 0, result.output
+    assert "5 succeeded, 0 failed" in result.output
+    assert len(list(output_dir.glob("*.pdf"))) == 5
+    assert sorted(args[-2] for args in fake_wkhtmltopdf()) == sorted(urls)
+
+
+def test_batch_skips_duplicate_urls(tmp_path, fake_wkhtmltopdf):
+    urls = [
+        "http://example.com/a",
+        "http://example.com/a?utm_source=feed",
+        "http://www.example.com/a/",
+    ]
+    result, _ = run_batch(tmp_path, urls)
+
+    assert result.exit_code == 0, result.output
+    assert "Skipping 2 duplicate URLs" in result.output
+    assert len(fake_wkhtmltopdf()) == 1
+
+
+def test_batch_reports_failures_and_carries_on(tmp_path, fake_wkhtmltopdf):
+    urls = [
+        "http://example.com/ok",
+        "http://example.com/fail",
+        "not a url",
+        "http://example.com/ok2",
+    ]
+    result, output_dir = run_batch(tmp_path, urls)
+
+    assert result.exit_code == 1
+    assert "2 succeeded, 2 failed" in result.output
+    assert "Invalid URL" in result.output
+    assert len(list(output_dir.glob("*.pdf"))) == 2
+
+
+def test_batch_without_urls(tmp_path, fake_wkhtmltopdf):
+    result, _ = run_batch(tmp_path, [""])
+
+    assert result.exit_code == 0
+    assert "No URLs to convert" in result.output
+
+
+def test_output_paths_are_unique():
+    paths = assign_output_paths(["http://example.com/a"] * 3, "out")
+
+    assert len(set(paths)) == 3
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from web_snatcher.bench import app, fixture_page, parse_importtime, percentile
+from web_snatcher.fetch import find_canonical
+
+runner = CliRunner()
+
+
+def test_fixture_pages_are_reproducible():
+    page = fixture_page(7, images=3)
+
+    assert page == fixture_page(7, images=3)
+    assert page != fixture_page(8, images=3)
+    assert page.count(b"<img ") == 3
+    assert find_canonical(page, "http://localhost/") == (
+        "http://localhost/gaa/article-7/"
+    )
+
+
+@pytest.mark.parametrize(
+    "values, percent, expected",
+    [([], 50, 0.0), ([2.0], 99, 2.0), ([1.0, 2.0, 3.0, 4.0, 5.0], 50, 3.0)],
+)
+def test_percentile(values, percent, expected):
+    assert percentile(values, percent) == expected
+
+
+def test_parse_importtime():
+    output = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       150 |        150 |     _io\n"
+        "import time:      1200 |       1350 |   json\n"
+        "import time:       500 |       1850 | web_snatcher.main\n"
+    )
+
+    assert parse_importtime(output) == [
+        ("_io", 2, 0.15, 0.15),
+        ("json", 1, 1.2, 1.35),
+        ("web_snatcher.main", 0, 0.5, 1.85),
+    ]
+
+
+@pytest.mark.parametrize("options", [[], ["--no-prefetch"], ["--fetchers", "2"]])
+def test_pipeline_benchmark(tmp_path, options):
+    report_path = tmp_path / "report.json"
+    result = runner.invoke(
+        app,
+        ["pipeline", "-n", "6", "-j", "2", "--render-ms", "0", "--json"]
+        + [str(report_path)]
+        + options,
+    )
+
+    assert result.exit_code == 0, result.output
+    report = json.loads(report_path.read_text())
+    assert report["config"]["pages"] == 6
+    assert report["results"]["failures"] == 0
+    assert report["results"]["pages_per_minute"] > 0
+
+
+def test_pipeline_benchmark_rejects_unknown_renderers():
+    result = runner.invoke(app, ["pipeline", "--renderer", "chrome"])
+
+    assert result.exit_code == 2
@@ -0,0 +1,105 @@
+import asyncio
+
+import httpx
+import pytest
+
+from web_snatcher.blocklist import Blocklist, SuffixTrie, strip_blocked
+from web_snatcher.proxy import AssetProxy
+
+
+def test_suffix_trie():
+    trie = SuffixTrie()
+    trie.add("Example.com")
+    trie.add("example.com.")
+    trie.add("ads.example.org")
+
+    assert len(trie) == 2
+    assert trie.matches("example.com")
+    assert trie.matches("cdn.EXAMPLE.com")
+    assert trie.matches("x.ads.example.org")
+    assert not trie.matches("example.org")
+    assert not trie.matches("notexample.com")
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://stats.g.doubleclick.net/collect", True),
+        ("https://example.com/ads/banner.png", True),
+        ("https://example.com/js/prebid8.js", True),
+        ("https://example.com/article/", False),
+        ("https://doubleclick.net.example.com/", False),
+    ],
+)
+def test_default_blocklist(url, expected):
+    assert Blocklist.from_lines([]).blocks(url) == expected
+
+
+def test_blocklist_from_lines():
+    blocklist = Blocklist.from_lines(
+        [
+            "# Trackers",
+            "",
+            "tracker.example  # inline comment",
+            "0.0.0.0 pixel.example beacon.example",
+            "example.com/*/sponsored/*",
+        ],
+        defaults=False,
+    )
+
+    assert len(blocklist) == 4
+    assert blocklist.blocks_host("cdn.tracker.example")
+    assert blocklist.blocks_host("beacon.example")
+    assert not blocklist.blocks_host("example.com")
+    assert blocklist.blocks("http://example.com/2024/sponsored/offer")
+    assert not blocklist.blocks("http://doubleclick.net/")
+
+
+def test_strip_blocked():
+    page = (
+        b'<head><script src="https://www.googletagmanager.com/gtm.js"></script>'
+        b"<script>(function(){var s=document.createElement('script');"
+        b"s.src='//connect.facebook.net/en_US/sdk.js';})();</script>"
+        b"<script>var x = 1;</script>"
+        b"<link rel='stylesheet' href='/site.css'></head><body>"
+        b"<img src=/ads/banner.png><img src='photo.jpg'>"
+        b'<iframe src="https://disqus.com/embed"></iframe>'
+        b'<img src="data:image/png;base64,AAAA"></body>'
+    )
+    content, report = strip_blocked(
+        page, "https://example.com/news/", Blocklist.from_lines([])
+    )
+
+    assert content == (
+        b"<head><script>var x = 1;</script>"
+        b"<link rel='stylesheet' href='/site.css'></head><body>"
+        b"<img src='photo.jpg'>"
+        b'<img src="data:image/png;base64,AAAA"></body>'
+    )
+    assert report.requests == 4
+    assert report.bytes == len(page) - len(content)
+
+
+async def request_through(proxy: AssetProxy, url: str) -> httpx.Response:
+    await proxy.start()
+    try:
+        async with httpx.AsyncClient(proxy=proxy.url) as client:
+            return await client.get(url)
+    finally:
+        await proxy.close()
+
+
+def test_proxy_answers_blocked_requests_itself():
+    proxy = AssetProxy(blocklist=Blocklist(["ads.example"]))
+    response = asyncio.run(request_through(proxy, "http://cdn.ads.example/a.js"))
+
+    assert response.status_code == 204
+    assert proxy.stats.blocked == 1
+
+
+def test_proxy_refuses_tunnels_to_blocked_hosts():
+    proxy = AssetProxy(blocklist=Blocklist(["ads.example"]))
+    with pytest.raises(httpx.ProxyError):
+        asyncio.run(request_through(proxy, "https://cdn.ads.example/a.js"))
+
+    assert proxy.stats.blocked == 1
@@ -0,0 +1,122 @@
+import asyncio
+
+from web_snatcher.coalesce import SingleFlight
+from web_snatcher.readiness import Readiness
+from web_snatcher.snatcher import Snatcher
+
+
+def test_concurrent_calls_share_one_run():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run():
+        flights = SingleFlight()
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(3)))
+        await flights.do("other", work)
+        return flights, results
+
+    flights, results = asyncio.run(run())
+    assert results == ["result"] * 3
+    assert len(calls) == 2
+    assert flights.coalesced == 2
+
+
+def test_waiters_share_the_exception():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def run():
+        flights = SingleFlight()
+        return await asyncio.gather(
+            flights.do("key", work), flights.do("key", work), return_exceptions=True
+        )
+
+    assert [str(result) for result in asyncio.run(run())] == ["boom", "boom"]
+
+
+def test_cleanup_runs_after_the_last_waiter():
+    cleaned = []
+
+    async def waiter(flights: SingleFlight, hold: float) -> None:
+        async with flights.join(
+            "key", lambda: asyncio.sleep(0.01, "path"), cleaned.append
+        ):
+            await asyncio.sleep(hold)
+            assert not cleaned
+
+    async def run():
+        flights = SingleFlight()
+        await asyncio.gather(waiter(flights, 0), waiter(flights, 0.02))
+
+    asyncio.run(run())
+    assert cleaned == ["path"]
+
+
+def test_work_is_cancelled_only_when_every_waiter_gives_up():
+    async def run():
+        flights = SingleFlight()
+        work = asyncio.Event()
+        first = asyncio.create_task(flights.do("key", work.wait))
+        second = asyncio.create_task(flights.do("key", work.wait))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        work.set()
+        return await second, first
+
+    result, first = asyncio.run(run())
+    assert result is True
+    assert first.cancelled()
+
+
+def test_concurrent_snatches_of_a_page_share_one_render(tmp_path):
+    renders = []
+
+    async def render(url, output, options, html=None):
+        renders.append(url)
+        await asyncio.sleep(0.01)
+        with open(output, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    async def run():
+        async with Snatcher(render=render) as snatcher:
+            await asyncio.gather(
+                snatcher.snatch("http://example.com/a", str(tmp_path / "1.pdf")),
+                snatcher.snatch("http://www.example.com/a/", str(tmp_path / "2.pdf")),
+            )
+            return snatcher.flights.coalesced
+
+    assert asyncio.run(run()) == 1
+    assert len(renders) == 1
+    assert (tmp_path / "1.pdf").exists() and (tmp_path / "2.pdf").exists()
+    # The shared render's own file is removed once both outputs are in place
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["1.pdf", "2.pdf"]
+
+
+def test_renders_with_different_options_are_not_shared(tmp_path):
+    renders = []
+
+    async def render(url, output, options, html=None):
+        renders.append(options)
+        await asyncio.sleep(0.01)
+        with open(output, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    async def run():
+        async with Snatcher(render=render) as snatcher:
+            await asyncio.gather(
+                snatcher.snatch("http://example.com/a", str(tmp_path / "1.pdf")),
+                snatcher.snatch(
+                    "http://example.com/a",
+                    str(tmp_path / "2.pdf"),
+                    readiness=Readiness("static"),
+                ),
+            )
+
+    asyncio.run(run())
+    assert len(renders) == 2
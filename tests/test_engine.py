@@ -0,0 +1,145 @@
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import pytest
+
+from web_snatcher import engine
+from web_snatcher.engine import (
+    STDIN_INPUT,
+    RenderTimeoutError,
+    ResourceLimits,
+    Runner,
+    build_command,
+    convert,
+    kill_process_group,
+    spawn,
+)
+
+
+def test_build_command():
+    assert build_command("http://example.com/", "out.pdf", ["--grayscale"]) == [
+        "wkhtmltopdf",
+        "--grayscale",
+        "http://example.com/",
+        "out.pdf",
+    ]
+    assert build_command("http://example.com/", "out.pdf")[1:-2] == (
+        engine.WKHTMLTOPDF_OPTIONS
+    )
+
+
+def test_convert_writes_the_pdf(tmp_path, fake_wkhtmltopdf):
+    output = tmp_path / "page.pdf"
+    asyncio.run(convert("http://example.com/", str(output), ["--grayscale"]))
+
+    assert output.read_bytes().startswith(b"%PDF")
+    assert fake_wkhtmltopdf() == [["--grayscale", "http://example.com/", str(output)]]
+
+
+def test_convert_pipes_prefetched_html(tmp_path, fake_wkhtmltopdf):
+    output = tmp_path / "page.pdf"
+    asyncio.run(convert("http://example.com/", str(output), [], b"<p>Hello</p>"))
+
+    assert fake_wkhtmltopdf() == [[STDIN_INPUT, str(output)]]
+    assert output.exists()
+
+
+def test_convert_raises_on_failure(tmp_path, fake_wkhtmltopdf):
+    with pytest.raises(subprocess.CalledProcessError) as raised:
+        asyncio.run(convert("http://example.com/fail", str(tmp_path / "page.pdf"), []))
+
+    assert "network error" in raised.value.output
+
+
+def test_runner_caps_conversions_in_flight(monkeypatch):
+    running, peak = 0, 0
+
+    async def fake_convert(url, output, options, html, limits):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    monkeypatch.setattr(engine, "convert", fake_convert)
+
+    async def run() -> None:
+        runner = Runner(concurrency=2)
+        await asyncio.gather(
+            *(runner.convert(f"http://example.com/{i}", f"{i}.pdf") for i in range(6))
+        )
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_convert_kills_the_process_group_on_timeout(tmp_path, fake_wkhtmltopdf):
+    limits = ResourceLimits(timeout=0.5)
+    started = time.monotonic()
+    with pytest.raises(RenderTimeoutError) as raised:
+        asyncio.run(
+            convert(
+                "http://example.com/hang", str(tmp_path / "a.pdf"), [], None, limits
+            )
+        )
+
+    assert time.monotonic() - started < 5
+    assert str(raised.value) == "wkhtmltopdf timed out after 0.5 seconds"
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # An orphan killed with its group stays a zombie until init reaps it
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return True
+
+
+def test_kill_process_group_kills_children():
+    async def run() -> int:
+        process = await spawn(
+            ["sh", "-c", "sleep 1000 & echo $!; wait"], stdout=asyncio.subprocess.PIPE
+        )
+        child = int(await process.stdout.readline())
+        kill_process_group(process)
+        await process.wait()
+        return child
+
+    child = asyncio.run(run())
+    for _ in range(100):
+        if not is_running(child):
+            break
+        time.sleep(0.02)
+    else:
+        pytest.fail("The child process outlived its group")
+
+
+def test_spawn_applies_resource_limits():
+    script = (
+        "import resource; "
+        "print(resource.getrlimit(resource.RLIMIT_AS)[0], "
+        "resource.getrlimit(resource.RLIMIT_CPU)[0])"
+    )
+
+    async def run(cpu_limit: bool) -> list[int]:
+        process = await spawn(
+            [sys.executable, "-c", script],
+            ResourceLimits(memory_bytes=2**31, cpu_seconds=30),
+            cpu_limit=cpu_limit,
+            stdout=asyncio.subprocess.PIPE,
+        )
+        stdout, _ = await process.communicate()
+        return [int(value) for value in stdout.split()]
+
+    assert asyncio.run(run(True)) == [2**31, 30]
+    # Long-lived processes inherit the CPU limit instead
+    assert asyncio.run(run(False))[1] == resource.getrlimit(resource.RLIMIT_CPU)[0]
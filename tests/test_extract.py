@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+
+from web_snatcher.extract import Article, extract_article, render_article
+from web_snatcher.snatcher import Snatcher
+
+URL = "https://example.com/sport/match-report/"
+
+PARAGRAPH = (
+    "Ireland held on for a narrow win in a match that swung back and forth "
+    "until the final whistle, with the captain leading from the front."
+)
+
+PAGE = f"""<!DOCTYPE html><html><head>
+<title>Match report | Example Sport</title>
+<meta property="og:image" content="/images/lead.jpg">
+<script>var tracking = true;</script>
+</head><body>
+<nav class="site-nav"><a href="/">Home</a> <a href="/sport/">Sport</a></nav>
+<div class="content-with-sidebar">
+<article class="story">
+<h1>Ireland edge thriller</h1>
+<p class="byline">By Jo Bloggs</p>
+<div class="share-buttons"><a href="https://twitter.com/share">Share</a></div>
+<p>{PARAGRAPH} <a href="/teams/ireland/">Ireland</a> <a href="#top">Top</a></p>
+<p>{PARAGRAPH}</p>
+<figure><img src="/images/try.jpg" alt="The try &amp; the crowd">
+<figcaption>The winning try</figcaption></figure>
+<p>{PARAGRAPH} 5 &lt; 6.</p>
+<p>{PARAGRAPH}</p>
+</article>
+<aside class="sidebar"><p>{PARAGRAPH}</p></aside>
+</div>
+<div class="related-articles"><p>{PARAGRAPH}</p></div>
+<div id="comments"><p>{PARAGRAPH}</p></div>
+<footer>Copyright</footer>
+</body></html>""".encode()
+
+
+def test_extract_article():
+    article = extract_article(PAGE, URL)
+
+    assert article.title == "Ireland edge thriller"
+    assert article.byline == "Jo Bloggs"
+    assert article.lead_image == "https://example.com/images/lead.jpg"
+    assert article.body.count("<p>") == 4
+    assert '<a href="https://example.com/teams/ireland/">Ireland</a>' in article.body
+    assert '<img src="https://example.com/images/try.jpg" alt="The try' in article.body
+    assert "5 &lt; 6." in article.body
+    for left_out in ("Jo Bloggs", "Share", "Home", "tracking", "Copyright", "<h1>"):
+        assert left_out not in article.body
+
+
+def test_lead_image_in_body_is_not_repeated():
+    page = PAGE.replace(b"/images/lead.jpg", b"/images/try.jpg")
+
+    assert extract_article(page, URL).lead_image is None
+
+
+def test_title_prefers_open_graph():
+    page = PAGE.replace(
+        b"<head>", b'<head><meta property="og:title" content=" Full headline ">'
+    )
+
+    assert extract_article(page, URL).title == "Full headline"
+
+
+def test_pages_without_an_article_are_not_extracted():
+    index = b"<html><body><ul>" + b"<li><a href='/a'>Story</a></li>" * 50
+    short = f"<html><body><article><p>{PARAGRAPH}</p></article></body></html>"
+
+    assert extract_article(index + b"</ul></body></html>", URL) is None
+    assert extract_article(short.encode(), URL) is None
+
+
+def test_render_article():
+    article = Article(URL, "Tom & Jerry", "A <Writer>", "<p>Body</p>", "/lead.jpg")
+    document = render_article(article).decode()
+
+    assert f'<base href="{URL}">' in document
+    assert "<title>Tom &amp; Jerry</title>" in document
+    assert "By A &lt;Writer&gt; &middot; " in document
+    assert '<figure><img src="/lead.jpg" alt=""></figure>\n<p>Body</p>' in document
+
+
+def snatch(tmp_path, content: bytes, extract: bool) -> bytes:
+    rendered = []
+
+    async def render(url, output, options, html=None):
+        rendered.append(html)
+        with open(output, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    async def run():
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=content)
+            )
+        )
+        async with Snatcher(render=render, client=client, extract=extract) as snatcher:
+            await snatcher.snatch(URL, str(tmp_path / "page.pdf"))
+
+    asyncio.run(run())
+    return rendered[0]
+
+
+def test_snatcher_renders_the_extracted_article(tmp_path):
+    assert b"<h1>Ireland edge thriller</h1>" in snatch(tmp_path, PAGE, extract=True)
+    assert b"site-nav" in snatch(tmp_path, PAGE, extract=False)
+
+
+def test_snatcher_falls_back_to_the_full_page(tmp_path):
+    page = b"<html><head></head><body><p>Not much here</p></body></html>"
+
+    assert b"Not much here" in snatch(tmp_path, page, extract=True)
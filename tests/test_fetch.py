@@ -0,0 +1,143 @@
+import asyncio
+
+import httpx
+import pytest
+
+from web_snatcher.fetch import (
+    USER_AGENT,
+    create_client,
+    fetch_page,
+    find_canonical,
+    inject_base,
+    parse_attributes,
+    parse_srcset,
+)
+
+
+def mock_client(handler) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        transport=httpx.MockTransport(handler), follow_redirects=True
+    )
+
+
+def test_create_client_pools_connections():
+    async def run() -> httpx.AsyncClient:
+        client = create_client(5)
+        await client.aclose()
+        return client
+
+    client = asyncio.run(run())
+    assert client.headers["User-Agent"] == USER_AGENT
+    assert client.follow_redirects
+
+
+def test_fetch_page_follows_redirects():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/old":
+            return httpx.Response(301, headers={"Location": "/new"})
+        return httpx.Response(
+            200, html="<p>Moved</p>", headers={"Content-Type": "text/html"}
+        )
+
+    async def run():
+        async with mock_client(handler) as client:
+            return await fetch_page(client, "http://example.com/old")
+
+    page = asyncio.run(run())
+    assert page.url == "http://example.com/new"
+    assert page.content == b"<p>Moved</p>"
+    assert page.content_type == "text/html"
+
+
+def test_fetch_page_raises_on_error_status():
+    async def run():
+        async with mock_client(lambda request: httpx.Response(404)) as client:
+            await fetch_page(client, "http://example.com/missing")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (
+            b"<html><head><title>T</title></head></html>",
+            b'<html><head><base href="http://example.com/a?b=1&amp;c=2">'
+            b"<title>T</title></head></html>",
+        ),
+        (
+            b'<HEAD lang="en"><title>T</title>',
+            b'<HEAD lang="en"><base href="http://example.com/a?b=1&amp;c=2">'
+            b"<title>T</title>",
+        ),
+        (
+            b"<p>No head</p>",
+            b'<base href="http://example.com/a?b=1&amp;c=2"><p>No head</p>',
+        ),
+        (
+            b'<head><base href="/elsewhere/"></head>',
+            b'<head><base href="/elsewhere/"></head>',
+        ),
+    ],
+)
+def test_inject_base(content, expected):
+    assert inject_base(content, "http://example.com/a?b=1&c=2") == expected
+
+
+def test_parse_attributes():
+    tag = b"""<img SRC="a.jpg" alt='A &amp; B' width=200 title="">"""
+
+    assert parse_attributes(tag) == {
+        b"src": b"a.jpg",
+        b"alt": b"A &amp; B",
+        b"width": b"200",
+        b"title": b"",
+    }
+
+
+@pytest.mark.parametrize(
+    "srcset, expected",
+    [
+        (b"a.jpg 1x, b.jpg 2x", [(b"a.jpg", b"1x"), (b"b.jpg", b"2x")]),
+        (
+            b"/upload/w_400,c_fill/a.jpg 400w,/upload/w_800,c_fill/a.jpg 800w",
+            [
+                (b"/upload/w_400,c_fill/a.jpg", b"400w"),
+                (b"/upload/w_800,c_fill/a.jpg", b"800w"),
+            ],
+        ),
+        (
+            b" a.jpg, b.jpg , c.jpg 2x ",
+            [(b"a.jpg", b""), (b"b.jpg", b""), (b"c.jpg", b"2x")],
+        ),
+        (
+            b"a.jpg 1x (max-width: 4px, odd), b.jpg",
+            [(b"a.jpg", b"1x (max-width: 4px, odd)"), (b"b.jpg", b"")],
+        ),
+        (b" , ", []),
+    ],
+)
+def test_parse_srcset(srcset, expected):
+    assert parse_srcset(srcset) == expected
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b'<link rel="canonical" href="/a?x=1&amp;y=2">',
+        b"<link rel='canonical' href='/a?x=1&amp;y=2'>",
+        b"<link rel=canonical href=/a?x=1&amp;y=2>",
+        b'<link href="/a?x=1&amp;y=2" REL="Canonical alternate">',
+    ],
+)
+def test_find_canonical(content):
+    url = find_canonical(b"<head>" + content + b"</head>", "http://example.com/b/")
+
+    assert url == "http://example.com/a?x=1&y=2"
+
+
+def test_find_canonical_ignores_other_links():
+    content = b'<link rel="stylesheet" href="/style.css"><link rel="canonical">'
+
+    assert find_canonical(content, "http://example.com/") is None
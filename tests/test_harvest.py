@@ -0,0 +1,158 @@
+import asyncio
+import gzip
+
+import httpx
+import pytest
+
+from web_snatcher.harvest import FeedParser, harvest_feeds
+from web_snatcher.jobstore import JobStore
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel>
+  <title>News</title>
+  <link>http://example.com/</link>
+  <item><title>One</title><link>http://example.com/one</link></item>
+  <item><title>Two</title><link>/two</link></item>
+  <item><guid>http://example.com/three</guid></item>
+  <item><guid isPermaLink="false">tag:example.com,4</guid></item>
+  <item><link>mailto:editor@example.com</link></item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <link rel="self" href="http://example.com/atom.xml"/>
+  <entry>
+    <link rel="edit" href="http://example.com/edit/1"/>
+    <link href="http://example.com/one"/>
+  </entry>
+  <entry><link rel="alternate" href="two"/></entry>
+</feed>"""
+
+SITEMAP = b"""<?xml version="1.0"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>http://example.com/one</loc></url>
+  <url><loc> http://example.com/two </loc></url>
+</urlset>"""
+
+SITEMAP_INDEX = b"""<?xml version="1.0"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>http://example.com/sitemap-1.xml</loc></sitemap>
+</sitemapindex>"""
+
+
+def parse(document: bytes, chunk_size: int = 7) -> tuple[list[str], list[str]]:
+    parser = FeedParser("http://example.com/feed.xml")
+    pages = []
+    for start in range(0, len(document), chunk_size):
+        pages += parser.feed(document[start : start + chunk_size])
+    pages += parser.close()
+    return pages, parser.sitemaps
+
+
+def test_rss():
+    assert parse(RSS) == (
+        [
+            "http://example.com/one",
+            "http://example.com/two",
+            "http://example.com/three",
+        ],
+        [],
+    )
+
+
+def test_atom_reads_alternate_links_only():
+    assert parse(ATOM)[0] == ["http://example.com/one", "http://example.com/two"]
+
+
+@pytest.mark.parametrize("document", [SITEMAP, gzip.compress(SITEMAP)])
+def test_sitemap(document):
+    assert parse(document) == (["http://example.com/one", "http://example.com/two"], [])
+
+
+def test_sitemap_index():
+    assert parse(SITEMAP_INDEX) == ([], ["http://example.com/sitemap-1.xml"])
+
+
+def harvest(tmp_path, documents: dict[str, bytes], feeds: list[str], requests: list):
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        body = documents.get(request.url.path)
+        if body is None:
+            return httpx.Response(404)
+        return httpx.Response(200, content=body, headers={"ETag": '"v1"'})
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with JobStore(str(tmp_path / "harvest.db")) as store:
+
+            def enqueue(urls: list[str]) -> None:
+                store.add(urls, [str(tmp_path / "page.pdf")] * len(urls))
+
+            async with client:
+                report = await harvest_feeds(client, feeds, store, enqueue)
+            return report, [job.url for job in store.unfinished()]
+
+    return asyncio.run(run())
+
+
+def test_harvest_queues_new_pages_once(tmp_path):
+    documents = {"/rss.xml": RSS, "/sitemap.xml": SITEMAP}
+    feeds = ["http://example.com/rss.xml", "http://example.com/sitemap.xml"]
+    requests = []
+
+    report, queued = harvest(tmp_path, documents, feeds, requests)
+    assert report.links == 5
+    assert report.queued == 3
+    assert queued == [
+        "http://example.com/one",
+        "http://example.com/two",
+        "http://example.com/three",
+    ]
+
+    # Unchanged feeds cost a 304, and queue nothing again
+    report, queued = harvest(tmp_path, documents, feeds, requests)
+    assert (report.feeds, report.unchanged, report.queued) == (2, 2, 0)
+    assert len(queued) == 3
+    assert requests[-1].headers["If-None-Match"] == '"v1"'
+
+
+def test_harvest_skips_pages_queued_under_another_spelling(tmp_path):
+    with JobStore(str(tmp_path / "harvest.db")) as store:
+        store.add(["http://www.example.com/one/?utm_source=rss"], ["one.pdf"])
+
+    report, queued = harvest(
+        tmp_path, {"/rss.xml": RSS}, ["http://example.com/rss.xml"], []
+    )
+    assert report.queued == 2
+    assert queued == [
+        "http://www.example.com/one/?utm_source=rss",
+        "http://example.com/two",
+        "http://example.com/three",
+    ]
+
+
+def test_harvest_follows_sitemap_indexes(tmp_path):
+    documents = {"/index.xml": SITEMAP_INDEX, "/sitemap-1.xml": SITEMAP}
+    report, queued = harvest(tmp_path, documents, ["http://example.com/index.xml"], [])
+
+    assert report.feeds == 2
+    assert queued == ["http://example.com/one", "http://example.com/two"]
+
+    # The index is unchanged, but the sitemaps it listed are still read
+    requests = []
+    report, _ = harvest(tmp_path, documents, ["http://example.com/index.xml"], requests)
+    assert [request.url.path for request in requests] == [
+        "/index.xml",
+        "/sitemap-1.xml",
+    ]
+
+
+def test_harvest_reports_unreadable_feeds(tmp_path):
+    documents = {"/broken.xml": b"<rss><channel><item>"}
+    feeds = ["http://example.com/missing.xml", "http://example.com/broken.xml"]
+    report, queued = harvest(tmp_path, documents, feeds, [])
+
+    assert len(report.errors) == 2
+    assert queued == []
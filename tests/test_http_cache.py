@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import httpx
+
+from web_snatcher.fetch import fetch_page
+from web_snatcher.http_cache import HttpCache
+
+URL = "http://example.com/article"
+
+
+def test_entries_persist_across_instances(tmp_path):
+    cache = HttpCache(str(tmp_path))
+    cache.put(URL, URL, {"ETag": '"v1"', "Content-Type": "text/html"}, b"<p>Hi</p>")
+
+    entry = HttpCache(str(tmp_path)).get(URL)
+    assert entry.content_type == "text/html"
+    assert entry.conditional_headers() == {"If-None-Match": '"v1"'}
+    assert cache.read_body(entry) == b"<p>Hi</p>"
+
+
+def test_uncacheable_responses_are_not_stored(tmp_path):
+    cache = HttpCache(str(tmp_path))
+
+    assert cache.put(URL, URL, {}, b"no validators") is None
+    assert cache.put(URL, URL, {"ETag": "x", "Cache-Control": "no-store"}, b"") is None
+    assert cache.get(URL) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path), max_bytes=25)
+    for name in ("a", "b"):
+        cache.put(f"http://example.com/{name}", "", {"ETag": name}, b"x" * 10)
+        time.sleep(0.01)
+    cache.get("http://example.com/a")
+    time.sleep(0.01)
+    cache.put("http://example.com/c", "", {"ETag": "c"}, b"x" * 10)
+
+    assert cache.get("http://example.com/a") is not None
+    assert cache.get("http://example.com/b") is None
+    assert cache.get("http://example.com/c") is not None
+    assert cache.total_bytes == 20
+
+
+def test_unchanged_page_is_revalidated_with_a_conditional_request(tmp_path):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, html="<p>Hi</p>", headers={"ETag": '"v1"'})
+
+    async def fetch_twice():
+        cache = HttpCache(str(tmp_path))
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [await fetch_page(client, URL, cache) for _ in range(2)]
+
+    first, second = asyncio.run(fetch_twice())
+    assert first.content == second.content == b"<p>Hi</p>"
+    assert "If-None-Match" not in requests[0].headers
+    assert requests[1].headers["If-None-Match"] == '"v1"'
@@ -0,0 +1,132 @@
+import asyncio
+import sqlite3
+
+from typer.testing import CliRunner
+
+from web_snatcher.jobstore import DONE, FAILED, PENDING, RUNNING, JobStore
+from web_snatcher.main import app
+
+URLS = [f"http://example.com/{i}" for i in range(4)]
+
+
+def add_jobs(store: JobStore, tmp_path) -> list:
+    return store.add(URLS, [str(tmp_path / f"{i}.pdf") for i in range(len(URLS))])
+
+
+def test_unfinished_jobs(tmp_path):
+    with JobStore(str(tmp_path / "state.db")) as store:
+        done, running, failed, pending = add_jobs(store, tmp_path)
+        for job in (done, running, failed):
+            store.mark_running(job)
+        store.mark_done(done, 1.0)
+        store.mark_failed(failed, "Boom", 1.0)
+
+    with JobStore(str(tmp_path / "state.db")) as store:
+        assert [job.url for job in store.unfinished()] == [running.url, pending.url]
+        assert len(store.unfinished(include_failed=True)) == 3
+        assert store.counts() == {DONE: 1, RUNNING: 1, FAILED: 1, PENDING: 1}
+        assert store.unfinished()[0].attempts == 1
+        assert store.known([URLS[0], "http://example.com/new"]) == {URLS[0]}
+        # Other spellings of a stored page are known too
+        assert store.known(["http://www.example.com/1/?utm_source=feed"]) == {
+            "http://www.example.com/1/?utm_source=feed"
+        }
+
+
+def test_stores_without_canonical_urls_are_upgraded(tmp_path):
+    path = str(tmp_path / "state.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id INTEGER PRIMARY KEY, url TEXT NOT NULL, "
+            "output TEXT NOT NULL, state TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, created REAL NOT NULL, "
+            "started REAL, finished REAL, duration REAL)"
+        )
+        conn.execute(
+            "INSERT INTO jobs (url, output, created) VALUES (?, ?, 0)",
+            ("http://www.example.com/a/", "a.pdf"),
+        )
+    conn.close()
+
+    with JobStore(path) as store:
+        assert store.known(["http://example.com/a"]) == {"http://example.com/a"}
+
+
+def test_updates_are_buffered_until_flushed(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = JobStore(path, flush_every=10, flush_interval=3600)
+    job = add_jobs(store, tmp_path)[0]
+    store.mark_running(job)
+    store.mark_done(job, 1.0)
+
+    # A batch that dies now loses the buffered updates, and reruns the job
+    with JobStore(path) as other:
+        assert len(other.unfinished()) == len(URLS)
+    store.close()
+    with JobStore(path) as other:
+        assert len(other.unfinished()) == len(URLS) - 1
+
+
+def test_buffered_updates_are_flushed_after_the_interval(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def run() -> None:
+        with JobStore(path, flush_every=10, flush_interval=0.1) as store:
+            store.mark_running(add_jobs(store, tmp_path)[0])
+            # No further update comes along to trigger the flush
+            await asyncio.sleep(0.3)
+            with JobStore(path) as other:
+                assert other.unfinished()[0].attempts == 1
+
+    asyncio.run(run())
+
+
+def test_meta_round_trips(tmp_path):
+    with JobStore(str(tmp_path / "state.db")) as store:
+        store.set_meta("settings", {"concurrency": 2, "prefetch": False})
+        assert store.get_meta("settings") == {"concurrency": 2, "prefetch": False}
+        assert store.get_meta("missing", {}) == {}
+
+
+def test_resume_runs_only_unfinished_jobs(tmp_path, fake_wkhtmltopdf):
+    state = str(tmp_path / "state.db")
+    with JobStore(state) as store:
+        store.set_meta(
+            "settings",
+            {"prefetch": False, "cache_dir": str(tmp_path / "cache"), "retries": 0},
+        )
+        jobs = add_jobs(store, tmp_path)
+        store.mark_running(jobs[0])
+        store.mark_done(jobs[0], 1.0)
+        store.mark_running(jobs[1])
+
+    result = CliRunner().invoke(app, ["resume", state])
+
+    assert result.exit_code == 0, result.output
+    assert "Resuming 3 unfinished jobs" in result.output
+    assert sorted(args[-2] for args in fake_wkhtmltopdf()) == URLS[1:]
+    with JobStore(state) as store:
+        assert store.counts() == {DONE: 4}
+
+    result = CliRunner().invoke(app, ["resume", state])
+    assert "every job has finished" in result.output
+
+
+def test_resume_retries_failed_jobs_on_request(tmp_path, fake_wkhtmltopdf):
+    source = tmp_path / "urls.txt"
+    source.write_text("http://example.com/ok\nhttp://example.com/fail\n")
+    state = str(tmp_path / "state.db")
+    common = ["--cache-dir", str(tmp_path / "cache"), "--no-prefetch", "--retries", "0"]
+    result = CliRunner().invoke(
+        app, ["batch", str(source), "-o", str(tmp_path), "--state", state, *common]
+    )
+    assert result.exit_code == 1
+
+    result = CliRunner().invoke(app, ["resume", state])
+    assert "every job has finished" in result.output
+
+    result = CliRunner().invoke(app, ["resume", state, "--retry-failed"])
+    assert "Resuming 1 unfinished jobs" in result.output
+    assert [args[-2] for args in fake_wkhtmltopdf()].count(
+        "http://example.com/fail"
+    ) == 2
@@ -0,0 +1,51 @@
+import pytest
+
+from web_snatcher.metrics import Counter, Gauge, Histogram, Metric, Registry
+
+
+def test_metric_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("web_snatcher_test", "A metric without samples")
+
+
+def test_counter_with_labels():
+    counter = Counter("jobs_total", "Jobs", labels=("outcome", "reason"))
+    counter.inc(labels=("failed", "network"))
+    counter.inc(2, labels=("succeeded", ""))
+    assert counter.value(("succeeded", "")) == 2
+    assert counter.samples() == [
+        'jobs_total{outcome="failed",reason="network"} 1',
+        'jobs_total{outcome="succeeded",reason=""} 2',
+    ]
+    counter.reset()
+    assert counter.samples() == []
+
+
+def test_gauge_function():
+    gauge = Gauge("queue_depth", "Jobs waiting")
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.value() == 2
+    gauge.set_function(lambda: 7)
+    assert gauge.value() == 7
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value)
+    samples = histogram.samples()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in samples
+    assert 'latency_seconds_bucket{le="1"} 2' in samples
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in samples
+    assert "latency_seconds_count 3" in samples
+
+
+def test_registry_renders_headers():
+    registry = Registry()
+    registry.register(Counter("pages_total", "Pages converted"))
+    assert registry.render().splitlines() == [
+        "# HELP pages_total Pages converted",
+        "# TYPE pages_total counter",
+        "pages_total 0",
+    ]
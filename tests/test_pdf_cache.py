@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+
+from web_snatcher.pdf_cache import PdfCache, link_or_copy
+from web_snatcher.snatcher import Snatcher
+
+
+def test_key_depends_on_document_and_options():
+    key = PdfCache.key_for(b"<p>Hi</p>", ["--grayscale"])
+
+    assert key == PdfCache.key_for(b"<p>Hi</p>", ["--grayscale"])
+    assert key != PdfCache.key_for(b"<p>Hi!</p>", ["--grayscale"])
+    assert key != PdfCache.key_for(b"<p>Hi</p>", [])
+
+
+def test_store_and_restore(tmp_path):
+    cache = PdfCache(str(tmp_path / "cache"))
+    rendered = tmp_path / "rendered.pdf"
+    rendered.write_bytes(b"%PDF-1.4")
+
+    assert not cache.restore("key", str(tmp_path / "miss.pdf"))
+    cache.store("key", str(rendered))
+    assert cache.restore("key", str(tmp_path / "hit.pdf"))
+    assert (tmp_path / "hit.pdf").read_bytes() == b"%PDF-1.4"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_pdfs_are_evicted(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = PdfCache(directory, max_bytes=20)
+
+    def store(key: str) -> None:
+        rendered = tmp_path / f"{key}.pdf"
+        rendered.write_bytes(b"%PDF-1.4")
+        cache.store(key, str(rendered))
+
+    store("a")
+    store("b")
+    assert cache.restore("a", str(tmp_path / "hit.pdf"))
+    store("c")
+
+    assert not cache.restore("b", str(tmp_path / "miss.pdf"))
+    assert cache.restore("a", str(tmp_path / "hit.pdf"))
+    assert cache.total_bytes == 16
+    # The index is rebuilt from the directory on the next run
+    assert PdfCache(directory, max_bytes=20).total_bytes == 16
+
+
+def test_link_or_copy_replaces_the_destination(tmp_path):
+    source, destination = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    source.write_bytes(b"new")
+    destination.write_bytes(b"old")
+
+    link_or_copy(str(source), str(destination))
+    link_or_copy(str(source), str(destination))
+    assert destination.read_bytes() == b"new"
+
+
+def test_unchanged_page_is_not_rendered_again(tmp_path):
+    renders = []
+
+    async def render(url, output, options, html=None):
+        renders.append(url)
+        with open(output, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    async def run() -> PdfCache:
+        cache = PdfCache(str(tmp_path / "cache"))
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, html="Hi")
+            )
+        )
+        async with Snatcher(render=render, client=client, pdf_cache=cache) as snatcher:
+            await snatcher.snatch("http://example.com/", str(tmp_path / "a.pdf"))
+            await snatcher.snatch("http://example.com/", str(tmp_path / "b.pdf"))
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(renders) == 1
+    assert (tmp_path / "b.pdf").read_bytes() == b"%PDF-1.4"
+    assert (cache.hits, cache.misses) == (1, 1)
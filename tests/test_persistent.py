@@ -0,0 +1,139 @@
+import asyncio
+import shlex
+import subprocess
+
+import pytest
+
+from web_snatcher.engine import RenderTimeoutError, ResourceLimits
+from web_snatcher.persistent import PersistentPool, PersistentWorker, format_args_line
+
+OPTIONS = ["--page-size", "A4"]
+
+
+def test_format_args_line_round_trips_through_shell_quoting():
+    args = ["--title", 'A "quoted" title', "http://example.com/a b", "C:\\out.pdf"]
+    line = format_args_line(args)
+
+    assert line.endswith("\n")
+    assert shlex.split(line) == args
+
+
+def test_format_args_line_rejects_newlines():
+    with pytest.raises(ValueError):
+        format_args_line(["--title", "two\nlines"])
+
+
+def test_worker_reuses_one_process(tmp_path, fake_wkhtmltopdf):
+    async def run() -> set[int]:
+        worker = PersistentWorker(OPTIONS)
+        pids = set()
+        try:
+            for i in range(3):
+                await worker.convert(
+                    f"http://example.com/{i}", str(tmp_path / f"{i}.pdf")
+                )
+                pids.add(worker.process.pid)
+        finally:
+            await worker.close()
+        return pids
+
+    assert len(asyncio.run(run())) == 1
+    assert [args[-2] for args in fake_wkhtmltopdf()] == [
+        f"http://example.com/{i}" for i in range(3)
+    ]
+    assert all((tmp_path / f"{i}.pdf").exists() for i in range(3))
+
+
+def test_failed_job_ends_the_process(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        worker = PersistentWorker(OPTIONS)
+        try:
+            with pytest.raises(subprocess.CalledProcessError) as error:
+                await worker.convert("http://example.com/fail", str(tmp_path / "a.pdf"))
+            assert "network error" in error.value.output
+            assert worker.process is None
+            await worker.convert("http://example.com/ok", str(tmp_path / "b.pdf"))
+        finally:
+            await worker.close()
+
+    asyncio.run(run())
+    assert (tmp_path / "b.pdf").exists()
+
+
+def test_crashed_process_is_restarted(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        worker = PersistentWorker(OPTIONS)
+        try:
+            with pytest.raises(subprocess.CalledProcessError):
+                await worker.convert(
+                    "http://example.com/crash", str(tmp_path / "a.pdf")
+                )
+            await worker.convert("http://example.com/ok", str(tmp_path / "b.pdf"))
+        finally:
+            await worker.close()
+
+    asyncio.run(run())
+    assert (tmp_path / "b.pdf").exists()
+
+
+def test_closed_stderr_fails_the_job(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        worker = PersistentWorker(OPTIONS)
+        try:
+            with pytest.raises(subprocess.CalledProcessError):
+                # No timeout: the job must fail as soon as stderr closes
+                await asyncio.wait_for(
+                    worker.convert("http://example.com/mute", str(tmp_path / "a.pdf")),
+                    10,
+                )
+            assert worker.process is None
+            await worker.convert("http://example.com/ok", str(tmp_path / "b.pdf"))
+        finally:
+            await worker.close()
+
+    asyncio.run(run())
+
+
+def test_quiet_options_are_dropped(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        worker = PersistentWorker([*OPTIONS, "-q", "--log-level", "none", "--quiet"])
+        try:
+            await asyncio.wait_for(
+                worker.convert("http://example.com/a", str(tmp_path / "a.pdf")), 10
+            )
+        finally:
+            await worker.close()
+
+    asyncio.run(run())
+    assert fake_wkhtmltopdf() == [
+        [*OPTIONS, "http://example.com/a", str(tmp_path / "a.pdf")]
+    ]
+
+
+def test_job_over_its_timeout_is_killed(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        worker = PersistentWorker(OPTIONS, ResourceLimits(timeout=0.5))
+        try:
+            with pytest.raises(RenderTimeoutError):
+                await worker.convert("http://example.com/hang", str(tmp_path / "a.pdf"))
+            assert worker.process is None
+            await worker.convert("http://example.com/ok", str(tmp_path / "b.pdf"))
+        finally:
+            await worker.close()
+
+    asyncio.run(run())
+
+
+def test_pool_runs_jobs_on_its_workers(tmp_path, fake_wkhtmltopdf):
+    async def run() -> None:
+        async with PersistentPool(2, OPTIONS) as pool:
+            await asyncio.gather(
+                *(
+                    pool.convert(f"http://example.com/{i}", str(tmp_path / f"{i}.pdf"))
+                    for i in range(4)
+                )
+            )
+
+    asyncio.run(run())
+    assert len(fake_wkhtmltopdf()) == 4
+    assert all((tmp_path / f"{i}.pdf").exists() for i in range(4))
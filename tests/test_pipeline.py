@@ -0,0 +1,112 @@
+import asyncio
+from dataclasses import dataclass
+
+import httpx
+
+from web_snatcher.pipeline import Pipeline
+from web_snatcher.ratelimit import DomainLimiter
+from web_snatcher.snatcher import Snatcher
+
+
+@dataclass
+class Job:
+    url: str
+    output: str
+
+
+async def fake_render(url, output, options, html=None):
+    with open(output, "wb") as f:
+        f.write(b"%PDF-1.4 " + url.encode())
+
+
+def make_snatcher(limiter: DomainLimiter, prefetch: bool = True) -> Snatcher:
+    client = None
+    if prefetch:
+        client = httpx.AsyncClient(
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, html="<p>Hello</p>")
+            )
+        )
+    return Snatcher(render=fake_render, client=client, limiter=limiter)
+
+
+async def run_pipeline(snatcher: Snatcher, jobs: list[Job], **kwargs) -> list[str]:
+    finished = []
+
+    def on_finish(job, error, duration):
+        assert error is None
+        finished.append(job.url)
+
+    async with snatcher:
+        await Pipeline(snatcher, on_finish=on_finish, **kwargs).run(jobs)
+    return finished
+
+
+def test_pipeline_converts_every_job(tmp_path):
+    jobs = [
+        Job(f"http://example.com/{i}", str(tmp_path / f"{i}.pdf")) for i in range(5)
+    ]
+    finished = asyncio.run(
+        run_pipeline(make_snatcher(DomainLimiter()), jobs, fetchers=2, renderers=2)
+    )
+
+    assert sorted(finished) == sorted(job.url for job in jobs)
+    assert all((tmp_path / f"{i}.pdf").exists() for i in range(5))
+
+
+def test_throttled_domain_does_not_hold_up_others(tmp_path):
+    # Ten pages a second per domain: the slow domain's six pages take half a
+    # second, and must not keep the fetchers from the other domains' pages
+    slow = [
+        Job(f"http://slow.example/{i}", str(tmp_path / f"s{i}.pdf")) for i in range(6)
+    ]
+    fast = [
+        Job(f"http://fast{i}.example/", str(tmp_path / f"f{i}.pdf")) for i in range(4)
+    ]
+    limiter = DomainLimiter(rate=10, burst=1)
+    finished = asyncio.run(
+        run_pipeline(make_snatcher(limiter), slow + fast, fetchers=2, renderers=1)
+    )
+
+    fast_urls = {job.url for job in fast}
+    assert fast_urls <= set(finished[:5])
+
+
+def test_throttled_domain_does_not_hold_up_render_workers(tmp_path):
+    # Without a pre-fetch wkhtmltopdf requests the page, so the permit is taken
+    # before a render worker picks the job up
+    slow = [
+        Job(f"http://slow.example/{i}", str(tmp_path / f"s{i}.pdf")) for i in range(4)
+    ]
+    fast = [
+        Job(f"http://fast{i}.example/", str(tmp_path / f"f{i}.pdf")) for i in range(3)
+    ]
+    limiter = DomainLimiter(rate=10, burst=1, max_in_flight=1)
+    finished = asyncio.run(
+        run_pipeline(
+            make_snatcher(limiter, prefetch=False), slow + fast, fetchers=1, renderers=1
+        )
+    )
+
+    assert {job.url for job in fast} <= set(finished[:4])
+
+
+async def convert_all(snatcher: Snatcher, jobs: list[Job], pipeline: bool) -> None:
+    if pipeline:
+        await asyncio.wait_for(run_pipeline(snatcher, jobs), timeout=5)
+        return
+    async with snatcher:
+        for job in jobs:
+            await asyncio.wait_for(snatcher.snatch(job.url, job.output), timeout=5)
+
+
+def test_each_page_is_charged_one_token(tmp_path):
+    # A burst of three and practically no refill: a fourth token would never come
+    for pipeline in (False, True):
+        for prefetch in (False, True):
+            jobs = [
+                Job(f"http://example.com/{i}", str(tmp_path / f"{i}.pdf"))
+                for i in range(3)
+            ]
+            limiter = DomainLimiter(rate=0.001, burst=3)
+            asyncio.run(convert_all(make_snatcher(limiter, prefetch), jobs, pipeline))
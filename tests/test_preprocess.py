@@ -0,0 +1,86 @@
+import pytest
+
+from web_snatcher.preprocess import (
+    inline_noscript,
+    pick_from_srcset,
+    preprocess,
+    promote_lazy_images,
+)
+
+PLACEHOLDER = b"data:image/gif;base64,R0lGODlhAQABAAAAACw="
+
+
+@pytest.mark.parametrize(
+    "srcset, expected",
+    [
+        (b"small.jpg 400w, large.jpg 1200w, huge.jpg 2400w", b"large.jpg"),
+        (b"small.jpg 400w, medium.jpg 600w", b"medium.jpg"),
+        (b"a.jpg 1x, b.jpg 2x", b"a.jpg"),
+        (b"only.jpg", b"only.jpg"),
+        (
+            b"https://res.cloudinary.com/d/image/upload/w_400,c_fill/a.jpg 400w,"
+            b" https://res.cloudinary.com/d/image/upload/w_1200,c_fill/a.jpg 1200w",
+            b"https://res.cloudinary.com/d/image/upload/w_1200,c_fill/a.jpg",
+        ),
+        (b" , ", None),
+    ],
+)
+def test_pick_from_srcset(srcset, expected):
+    assert pick_from_srcset(srcset) == expected
+
+
+@pytest.mark.parametrize(
+    "tag, expected",
+    [
+        (
+            b'<img data-src="a.jpg" alt="">',
+            b'<img src="a.jpg" data-src="a.jpg" alt="">',
+        ),
+        (b"<img src='" + PLACEHOLDER + b"' data-lazy-src='a.jpg'>", None),
+        (b"<img src=placeholder.gif data-original=a.jpg>", None),
+        (
+            b'<img src="' + PLACEHOLDER + b'" data-srcset="a.jpg 400w, b.jpg 900w">',
+            None,
+        ),
+    ],
+)
+def test_promote_lazy_images(tag, expected):
+    content, promoted = promote_lazy_images(b"<p>" + tag + b"</p>")
+
+    assert promoted == ({b"b.jpg"} if b"srcset" in tag else {b"a.jpg"})
+    if expected:
+        assert content == b"<p>" + expected + b"</p>"
+    assert content.count(b" src=") == 1
+
+
+def test_real_images_are_left_alone():
+    page = b"<img src='a.jpg' srcset='a.jpg 1x, b.jpg 2x'><img src=c.jpg>"
+
+    assert promote_lazy_images(page) == (page, set())
+
+
+def test_promoted_urls_are_escaped():
+    content, _ = promote_lazy_images(b'<img data-src="a.jpg?x=1&amp;y=&quot;2">')
+
+    assert content.startswith(b'<img src="a.jpg?x=1&amp;y=&quot;2"')
+
+
+def test_inline_noscript():
+    page = (
+        b'<img data-src="a.jpg"><noscript><img src="a.jpg"></noscript>'
+        b'<noscript><img src="b.jpg"></noscript>'
+        b"<NOSCRIPT><p>Enable JavaScript</p></NOSCRIPT>"
+    )
+
+    assert inline_noscript(page, {b"a.jpg"}) == (
+        b'<img data-src="a.jpg"><img src="b.jpg"><p>Enable JavaScript</p>'
+    )
+
+
+def test_preprocess_inlines_noscript_only_without_javascript():
+    page = b"<img data-src='a.jpg'><noscript><img src='a.jpg'></noscript>"
+
+    assert b"<noscript>" in preprocess(page)
+    assert preprocess(page, javascript=False) == (
+        b"<img src=\"a.jpg\" data-src='a.jpg'>"
+    )
@@ -0,0 +1,83 @@
+import pytest
+
+from web_snatcher.factory import build_readiness, conversion_settings
+from web_snatcher.profiles import BUILTIN_PROFILES, ProfilePolicy
+from web_snatcher.readiness import DISABLE_JAVASCRIPT, Readiness
+from web_snatcher.snatcher import Snatcher
+
+URL = "http://example.com/article"
+
+
+def options_for(
+    readiness: str | None = None,
+    domain_readiness: list[str] | None = None,
+    profile: str = "default",
+    job_readiness: Readiness | None = None,
+) -> list[str]:
+    snatcher = Snatcher(
+        readiness=build_readiness(readiness, domain_readiness),
+        profiles=ProfilePolicy(default=profile),
+    )
+    return snatcher.options_for(URL, job_readiness)
+
+
+def javascript_delay(options: list[str]) -> str | None:
+    if "--javascript-delay" not in options:
+        return None
+    return options[options.index("--javascript-delay") + 1]
+
+
+def test_defaults_to_adaptive_readiness():
+    options = options_for()
+
+    assert "--window-status" in options
+    assert DISABLE_JAVASCRIPT not in options
+
+
+def test_profile_readiness_applies_without_explicit_readiness():
+    options = options_for(profile="full-fidelity")
+
+    assert "3000" in " ".join(options)
+
+
+@pytest.mark.parametrize(
+    "readiness, domain_readiness, job_readiness",
+    [
+        ("fixed:1500", None, None),
+        (None, ["example.com=fixed:1500"], None),
+        ("adaptive", None, Readiness("fixed", 1500)),
+    ],
+)
+def test_explicit_readiness_beats_profile(readiness, domain_readiness, job_readiness):
+    options = options_for(readiness, domain_readiness, "full-fidelity", job_readiness)
+
+    assert javascript_delay(options) == "1500"
+    assert "--window-status" not in options
+
+
+def test_disable_javascript_beats_profile():
+    settings = conversion_settings({"readiness": None, "disable_javascript": True})
+    options = options_for(settings["readiness"], profile="full-fidelity")
+
+    assert DISABLE_JAVASCRIPT in options
+    assert "--run-script" not in options
+
+
+@pytest.mark.parametrize(
+    "readiness, domain_readiness, job_readiness",
+    [
+        (None, None, None),
+        ("fixed:1500", None, None),
+        (None, ["example.com=adaptive:3000"], None),
+        (None, None, Readiness("fixed", 1500)),
+    ],
+)
+def test_profile_without_javascript_ignores_readiness(
+    readiness, domain_readiness, job_readiness
+):
+    assert not BUILTIN_PROFILES["fast-text"].javascript
+    options = options_for(readiness, domain_readiness, "fast-text", job_readiness)
+
+    assert DISABLE_JAVASCRIPT in options
+    assert javascript_delay(options) is None
+    assert "--run-script" not in options
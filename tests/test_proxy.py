@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+
+from web_snatcher.proxy import AssetProxy, downgrade_asset_urls
+
+PAGE = b"""<html><head>
+<link rel="stylesheet" href="/style.css?a=1&amp;b=2">
+<style>body { background: url('https://cdn.example.com/bg.png') }</style>
+</head><body>
+<a href="https://example.com/next">Next</a>
+<img src="img/logo.png" srcset="https://cdn.example.com/a.png 1x, /b.png 2x">
+<img src="data:image/png;base64,AAAA">
+<script src="http://plain.example.org/app.js"></script>
+</body></html>"""
+
+
+def test_downgrade_asset_urls():
+    content, downgraded = downgrade_asset_urls(PAGE, "https://example.com/posts/1")
+
+    assert b'href="http://example.com/style.css?a=1&amp;b=2"' in content
+    assert b"url('http://cdn.example.com/bg.png')" in content
+    assert b'src="http://example.com/posts/img/logo.png"' in content
+    assert (
+        b'srcset="http://cdn.example.com/a.png 1x, http://example.com/b.png 2x"'
+        in content
+    )
+    assert b'src="data:image/png;base64,AAAA"' in content
+    assert b'src="http://plain.example.org/app.js"' in content
+    # Links keep pointing at the real site
+    assert b'<a href="https://example.com/next">' in content
+    assert downgraded == {
+        "http://example.com/style.css?a=1&b=2",
+        "http://cdn.example.com/bg.png",
+        "http://example.com/posts/img/logo.png",
+        "http://cdn.example.com/a.png",
+        "http://example.com/b.png",
+    }
+
+
+@pytest.mark.parametrize(
+    "base",
+    [
+        b'<base href="https://static.example.com/">',
+        b"<base target=_top href='https://static.example.com/'>",
+        b"<base href=https://static.example.com/>",
+    ],
+)
+def test_downgrade_asset_urls_resolves_against_base(base):
+    page = base + b'<img src="a.png">'
+    content, downgraded = downgrade_asset_urls(page, "http://example.com/")
+
+    assert b'src="http://static.example.com/a.png"' in content
+    assert downgraded == {"http://static.example.com/a.png"}
+
+
+def test_downgrade_asset_urls_keeps_commas_in_srcset_urls():
+    page = (
+        b'<img srcset="https://cdn.example.com/w_400,c_fill/a.jpg 400w,'
+        b'https://cdn.example.com/w_800,c_fill/a.jpg 800w">'
+    )
+    content, _ = downgrade_asset_urls(page, "http://example.com/")
+
+    assert content == (
+        b'<img srcset="http://cdn.example.com/w_400,c_fill/a.jpg 400w, '
+        b'http://cdn.example.com/w_800,c_fill/a.jpg 800w">'
+    )
+
+
+def test_plain_http_pages_are_left_alone():
+    page = b'<img src="/a.png"><script src="app.js"></script>'
+
+    assert downgrade_asset_urls(page, "http://example.com/") == (page, set())
+
+
+async def fetch_twice(proxy: AssetProxy, url: str, requested: list[str]) -> list:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(str(request.url))
+        return httpx.Response(
+            200,
+            headers={"Cache-Control": "max-age=3600", "Content-Type": "text/css"},
+            content=b"body {}",
+        )
+
+    await proxy.start()
+    await proxy._client.aclose()
+    proxy._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        async with httpx.AsyncClient(proxy=proxy.url) as client:
+            return [await client.get(url), await client.get(url)]
+    finally:
+        await proxy.close()
+
+
+def test_proxy_serves_repeated_requests_from_cache():
+    proxy = AssetProxy()
+    requested = []
+    first, second = asyncio.run(
+        fetch_twice(proxy, "http://example.com/style.css", requested)
+    )
+
+    assert first.content == second.content == b"body {}"
+    assert second.headers["Content-Type"] == "text/css"
+    assert requested == ["http://example.com/style.css"]
+    assert (proxy.stats.misses, proxy.stats.hits) == (1, 1)
+
+
+def test_proxy_caches_routed_https_assets():
+    proxy = AssetProxy()
+    proxy.route_https(b'<link href="/style.css">', "https://example.com/")
+    requested = []
+    asyncio.run(fetch_twice(proxy, "http://example.com/style.css", requested))
+
+    assert requested == ["https://example.com/style.css"]
+    assert (proxy.stats.misses, proxy.stats.hits, proxy.stats.tunnels) == (1, 1, 0)
+
+
+def test_proxy_only_upgrades_the_rewritten_urls():
+    proxy = AssetProxy()
+    proxy.route_https(
+        b'<img src="https://Cdn.example.com/a b.png#x">', "https://example.com/"
+    )
+
+    assert proxy._upstream_url("http://cdn.example.com/a%20b.png") == (
+        "https://cdn.example.com/a%20b.png"
+    )
+    # Other plain HTTP assets on the same host are fetched as they are
+    assert proxy._upstream_url("http://cdn.example.com/b.png") == (
+        "http://cdn.example.com/b.png"
+    )
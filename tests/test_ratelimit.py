@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+from web_snatcher.ratelimit import DomainLimiter, TokenBucket, domain_of
+
+
+def test_domain_of():
+    assert domain_of("http://Example.com:8080/a") == "example.com:8080"
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    async def run() -> list[float]:
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        times = []
+        for _ in range(4):
+            await bucket.acquire()
+            times.append(time.monotonic() - started)
+        return times
+
+    times = asyncio.run(run())
+    assert times[1] < 0.02
+    # Two more tokens at 20 per second take about 0.1s
+    assert 0.08 <= times[3] < 0.5
+
+
+def test_in_flight_cap_applies_per_domain():
+    peaks: dict[str, int] = {}
+    running: dict[str, int] = {}
+
+    async def request(limiter: DomainLimiter, url: str) -> None:
+        domain = domain_of(url)
+        async with limiter.limit(url):
+            running[domain] = running.get(domain, 0) + 1
+            peaks[domain] = max(peaks.get(domain, 0), running[domain])
+            await asyncio.sleep(0.01)
+            running[domain] -= 1
+
+    async def run() -> None:
+        limiter = DomainLimiter(max_in_flight=2)
+        await asyncio.gather(
+            *(
+                request(limiter, f"http://{host}/")
+                for host in ["a.com"] * 5 + ["b.com"] * 5
+            )
+        )
+
+    asyncio.run(run())
+    assert peaks == {"a.com": 2, "b.com": 2}
+
+
+def test_throttled_domain_does_not_slow_others():
+    async def run() -> float:
+        limiter = DomainLimiter(rate=1, burst=1)
+        await limiter.acquire("http://slow.com/")
+        # The next slow.com request waits a second; other.com goes straight through
+        waiting = asyncio.create_task(limiter.acquire("http://slow.com/"))
+        started = time.monotonic()
+        await limiter.acquire("http://other.com/")
+        elapsed = time.monotonic() - started
+        waiting.cancel()
+        return elapsed
+
+    assert asyncio.run(run()) < 0.1
+
+
+def test_permits_release_their_slot_once():
+    async def run() -> None:
+        limiter = DomainLimiter(max_in_flight=1)
+        permit = await limiter.acquire("http://a.com/")
+        permit.release()
+        permit.release()
+        held = await limiter.acquire("http://a.com/")
+        waiting = asyncio.create_task(limiter.acquire("http://a.com/"))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        held.release()
+        (await waiting).release()
+        # A permit that was already released is not used again by limit()
+        async with limiter.limit("http://a.com/", permit):
+            assert not permit.held
+
+    asyncio.run(run())
+
+
+def test_disabled_limiter_never_waits():
+    async def run() -> float:
+        limiter = DomainLimiter()
+        started = time.monotonic()
+        for _ in range(100):
+            async with limiter.limit("http://a.com/"):
+                pass
+        return time.monotonic() - started
+
+    assert not DomainLimiter().enabled
+    assert asyncio.run(run()) < 0.1
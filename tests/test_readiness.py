@@ -0,0 +1,72 @@
+import pytest
+
+from web_snatcher.readiness import (
+    DISABLE_JAVASCRIPT,
+    READY_STATUS,
+    Readiness,
+    ReadinessPolicy,
+    domain_matches,
+    parse_domain_overrides,
+    parse_readiness,
+)
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("adaptive", Readiness("adaptive", 1000)),
+        ("Adaptive:3000", Readiness("adaptive", 3000)),
+        (" fixed:1500 ", Readiness("fixed", 1500)),
+        ("static", Readiness("static")),
+    ],
+)
+def test_parse_readiness(spec, expected):
+    assert parse_readiness(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["eventually", "fixed:soon", "adaptive:-5", ""])
+def test_parse_readiness_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_readiness(spec)
+
+
+def test_adaptive_mode_waits_for_the_ready_signal():
+    options = Readiness("adaptive", 2500).options()
+
+    assert options[options.index("--window-status") + 1] == READY_STATUS
+    script = options[options.index("--run-script") + 1]
+    assert "Date.now()+2500" in script
+    assert "\n" not in script
+
+
+def test_fixed_and_static_modes():
+    assert Readiness("fixed", 1500).options() == ["--javascript-delay", "1500"]
+    assert Readiness("static").options() == [DISABLE_JAVASCRIPT]
+
+
+def test_domain_matches_subdomains_only():
+    assert domain_matches("the42.ie", "the42.ie")
+    assert domain_matches("www.the42.ie", "the42.ie")
+    assert not domain_matches("notthe42.ie", "the42.ie")
+
+
+def test_most_specific_override_wins():
+    policy = ReadinessPolicy(
+        Readiness("fixed", 500),
+        parse_domain_overrides(["example.com=static", "News.Example.com=fixed:2000"]),
+    )
+
+    assert policy.for_url("http://example.com/") == Readiness("static")
+    assert policy.for_url("http://live.news.example.com/") == Readiness("fixed", 2000)
+    assert policy.for_url("http://other.org/") == Readiness("fixed", 500)
+    assert policy.override_for("http://other.org/") is None
+
+
+def test_policy_without_default_uses_adaptive_mode():
+    assert ReadinessPolicy().for_url("http://example.com/") == Readiness()
+
+
+@pytest.mark.parametrize("spec", ["example.com", "=static", "example.com=never"])
+def test_parse_domain_overrides_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_domain_overrides([spec])
@@ -0,0 +1,118 @@
+import asyncio
+import subprocess
+import time
+
+import httpx
+import pytest
+
+from web_snatcher.engine import RenderTimeoutError
+from web_snatcher.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    is_retryable,
+)
+from web_snatcher.snatcher import Snatcher
+
+URL = "http://example.com/"
+
+
+def status_error(status: int, headers: dict | None = None) -> httpx.HTTPStatusError:
+    request = httpx.Request("GET", URL)
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("Error", request=request, response=response)
+
+
+@pytest.mark.parametrize(
+    "error, retryable",
+    [
+        (status_error(503), True),
+        (status_error(429), True),
+        (status_error(404), False),
+        (httpx.ConnectError("Connection refused"), True),
+        (RenderTimeoutError(["wkhtmltopdf"], 1.0), True),
+        (subprocess.CalledProcessError(1, [], "Error: HostNotFoundError"), True),
+        (subprocess.CalledProcessError(1, [], "Error: ContentNotFoundError"), False),
+        (ValueError("bug"), False),
+    ],
+)
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_delay_backs_off_exponentially_with_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+
+    for attempt, cap in [(1, 1.0), (2, 2.0), (3, 4.0), (6, 5.0)]:
+        delays = [policy.delay(attempt) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_delay_honours_retry_after_up_to_the_cap():
+    policy = RetryPolicy(base_delay=0.1, max_delay=5.0)
+
+    assert policy.delay(1, status_error(429, {"Retry-After": "3"})) >= 3
+    assert policy.delay(1, status_error(429, {"Retry-After": "60"})) == 5.0
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes():
+    breaker = CircuitBreaker(threshold=2, cooldown=0.05)
+    breaker.record_failure(URL)
+    breaker.check(URL)
+    breaker.record_failure(URL)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check(URL)
+    breaker.check("http://other.com/")
+
+    time.sleep(0.06)
+    breaker.check(URL)
+    # Only one probe is let through per cooldown
+    with pytest.raises(CircuitOpenError):
+        breaker.check(URL)
+    breaker.record_success(URL)
+    breaker.check(URL)
+
+
+def test_breaker_with_zero_threshold_never_opens():
+    breaker = CircuitBreaker(threshold=0)
+    for _ in range(10):
+        breaker.record_failure(URL)
+    breaker.check(URL)
+
+
+def snatch(responses: list[int], tmp_path) -> list[int]:
+    statuses = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        statuses.append(responses[len(statuses)])
+        return httpx.Response(statuses[-1], html="Hi")
+
+    async def render(url, output, options, html=None):
+        with open(output, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+    async def run() -> None:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        retry = RetryPolicy(attempts=3, base_delay=0.01)
+        async with Snatcher(render=render, client=client, retry=retry) as snatcher:
+            await snatcher.snatch(URL, str(tmp_path / "page.pdf"))
+
+    asyncio.run(run())
+    return statuses
+
+
+def test_transient_failures_are_retried(tmp_path):
+    assert snatch([503, 502, 200], tmp_path) == [503, 502, 200]
+    assert (tmp_path / "page.pdf").exists()
+
+
+def test_permanent_failures_are_not_retried(tmp_path):
+    with pytest.raises(httpx.HTTPStatusError):
+        snatch([404, 200], tmp_path)
+
+
+def test_retries_give_up_after_the_last_attempt(tmp_path):
+    with pytest.raises(httpx.HTTPStatusError):
+        snatch([503, 503, 503, 200], tmp_path)
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+
+import httpx
+import pytest
+
+from web_snatcher.service import RenderService
+from web_snatcher.snatcher import Snatcher
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def render(url, output, options, html=None):
+    if "slow" in url:
+        await asyncio.sleep(0.5)
+    if "fail" in url:
+        raise httpx.ConnectError("Connection refused")
+    with open(output, "wb") as f:
+        f.write(b"%PDF-1.4 " + url.encode())
+
+
+# Starts a service, and returns what `requests(client)` returns
+def run_service(tmp_path, requests, workers: int = 2, queue_size: int = 10):
+    async def run():
+        service = RenderService(
+            Snatcher(render=render), str(tmp_path), workers, queue_size
+        )
+        port = free_port()
+        serving = asyncio.create_task(service.serve("127.0.0.1", port))
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                for _ in range(100):
+                    try:
+                        await client.get("/healthz")
+                        break
+                    except httpx.ConnectError:
+                        await asyncio.sleep(0.01)
+                return await requests(client)
+        finally:
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+
+    return asyncio.run(run())
+
+
+def test_convert_streams_the_pdf(tmp_path):
+    async def requests(client):
+        return await client.post("/convert", json={"url": "http://example.com/"})
+
+    response = run_service(tmp_path, requests)
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/pdf"
+    assert response.content == b"%PDF-1.4 http://example.com/"
+
+
+def test_asynchronous_jobs(tmp_path):
+    async def requests(client):
+        accepted = await client.post(
+            "/convert", json={"url": "http://example.com/", "wait": False}
+        )
+        location = accepted.headers["Location"]
+        while (await client.get(location)).json()["state"] in ("queued", "running"):
+            await asyncio.sleep(0.01)
+        return accepted, await client.get(location), await client.get(location + "/pdf")
+
+    accepted, job, pdf = run_service(tmp_path, requests)
+    assert accepted.status_code == 202
+    assert job.json()["state"] == "done"
+    assert pdf.content == b"%PDF-1.4 http://example.com/"
+
+
+def test_failed_job(tmp_path):
+    async def requests(client):
+        return await client.post("/convert", json={"url": "http://example.com/fail"})
+
+    response = run_service(tmp_path, requests)
+    assert response.status_code == 502
+    assert response.json()["state"] == "failed"
+
+
+@pytest.mark.parametrize(
+    "payload, error",
+    [
+        ({}, "Missing 'url'"),
+        ({"url": "ftp://example.com/"}, "Invalid URL"),
+        ({"url": "http://example.com/", "readiness": "eventually"}, "readiness"),
+        ({"url": "http://example.com/", "profile": "nope"}, "render profile"),
+    ],
+)
+def test_bad_requests(tmp_path, payload, error):
+    async def requests(client):
+        return await client.post("/convert", json=payload)
+
+    response = run_service(tmp_path, requests)
+    assert response.status_code == 400
+    assert error in response.json()["error"]
+
+
+def test_full_queue_is_refused(tmp_path):
+    async def requests(client):
+        responses = []
+        for i in range(3):
+            responses.append(
+                await client.post(
+                    "/convert",
+                    json={"url": f"http://example.com/slow{i}", "wait": False},
+                )
+            )
+            await asyncio.sleep(0.05)
+        return responses, await client.get("/healthz")
+
+    responses, health = run_service(tmp_path, requests, workers=1, queue_size=1)
+    assert [response.status_code for response in responses] == [202, 202, 429]
+    assert responses[2].headers["Retry-After"] == "1"
+    assert health.json()["busy"] == 1
+    assert health.json()["queued"] == 1
+
+
+def test_unknown_routes(tmp_path):
+    async def requests(client):
+        return [
+            await client.get("/jobs/nope"),
+            await client.get("/elsewhere"),
+            await client.get("/convert"),
+        ]
+
+    statuses = [response.status_code for response in run_service(tmp_path, requests)]
+    assert statuses == [404, 404, 405]
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+import pytest
+
+from web_snatcher.bench import STARTUP_TARGETS
+
+
+@pytest.mark.parametrize("module, forbidden", STARTUP_TARGETS.items())
+def test_entry_points_defer_heavy_imports(module, forbidden):
+    script = (
+        f"import sys, {module}; "
+        f"print(','.join(name for name in {forbidden!r} if name in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == ""
+
+
+def test_help_does_not_import_httpx():
+    script = (
+        "import sys\n"
+        "from typer.testing import CliRunner\n"
+        "from web_snatcher.main import app\n"
+        "assert CliRunner().invoke(app, ['batch', '--help']).exit_code == 0\n"
+        "print('httpx' in sys.modules)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "False"
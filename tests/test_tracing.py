@@ -0,0 +1,42 @@
+import json
+
+from typer.testing import CliRunner
+
+from web_snatcher.main import app
+from web_snatcher.tracing import active_tracer, span, start_tracing, stop_tracing
+
+
+def test_spans_are_recorded_while_tracing():
+    tracer = start_tracing()
+    try:
+        with span("fetch", url="http://example.com/"):
+            pass
+    finally:
+        stop_tracing()
+    with span("render"):
+        pass
+    assert [name for name, *_ in tracer.summary()] == ["fetch"]
+
+
+def test_trace_is_written_when_the_url_is_invalid(tmp_path):
+    trace = tmp_path / "trace.json"
+    result = CliRunner().invoke(
+        app, ["html-to-pdf", "not a url", "--trace", str(trace)]
+    )
+    assert result.exit_code == 1
+    assert "Invalid URL" in result.output
+    assert active_tracer() is None
+    events = json.loads(trace.read_text())["traceEvents"]
+    assert "validate" in [event["name"] for event in events]
+
+
+def test_trace_is_written_when_the_options_are_invalid(tmp_path):
+    trace = tmp_path / "trace.json"
+    result = CliRunner().invoke(
+        app,
+        ["html-to-pdf", "http://example.com/", "--readiness", "bogus"]
+        + ["--trace", str(trace), "--cache-dir", str(tmp_path)],
+    )
+    assert result.exit_code == 2
+    assert active_tracer() is None
+    assert trace.exists()
@@ -0,0 +1,140 @@
+import asyncio
+
+import httpx
+import pytest
+from typer.testing import CliRunner
+
+from web_snatcher.harvest import harvest_feeds
+from web_snatcher.jobstore import JobStore
+from web_snatcher.main import app, dedupe_urls
+from web_snatcher.seen import SeenIndex
+from web_snatcher.snatcher import flight_key
+from web_snatcher.urls import canonicalize_url, generate_output_name, validate_url
+
+MALFORMED = ["http://[::1", "http://x:abc/", "http://x:99999/"]
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("HTTP://Example.COM", "http://example.com/"),
+        ("http://example.com:80/a", "http://example.com/a"),
+        ("https://example.com:443/a", "https://example.com/a"),
+        ("http://example.com:8080/a", "http://example.com:8080/a"),
+        ("http://www.example.com/a/", "http://example.com/a"),
+        ("http://example.com/a#section", "http://example.com/a"),
+        ("http://example.com/?b=2&a=1", "http://example.com/?a=1&b=2"),
+        ("http://example.com/?utm_source=x&fbclid=y&id=3", "http://example.com/?id=3"),
+        ("http://[::1]:8080/x/", "http://[::1]:8080/x"),
+        ("http://user:pw@www.example.com/", "http://user:pw@example.com/"),
+    ],
+)
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+@pytest.mark.parametrize("url", MALFORMED)
+def test_canonicalize_url_rejects_malformed_urls(url):
+    with pytest.raises(ValueError):
+        canonicalize_url(url)
+
+
+@pytest.mark.parametrize(
+    "url, valid",
+    [
+        ("https://example.com/a", True),
+        ("http://127.0.0.1:8000/", True),
+        ("http://[::1]/", True),
+        ("example.com", False),
+        ("http:///path", False),
+        ("http://:80/", False),
+        *[(url, False) for url in MALFORMED],
+    ],
+)
+def test_validate_url(url, valid):
+    assert validate_url(url) is valid
+
+
+def test_validated_urls_can_be_canonicalized():
+    for url in ["http://x:abc/", "http://x:65535/", "http://[::1]:0/"]:
+        if validate_url(url):
+            canonicalize_url(url)
+
+
+def test_dedupe_urls_keeps_the_first_spelling():
+    urls = [
+        "http://example.com/a",
+        "http://www.example.com/a/?utm_source=feed",
+        "http://example.com/b",
+    ]
+    assert dedupe_urls(urls) == ["http://example.com/a", "http://example.com/b"]
+
+
+def test_dedupe_urls_keeps_malformed_urls_for_reporting():
+    urls = [
+        "http://example.com/a",
+        "http://[::1",
+        "http://www.example.com/a/?utm_source=feed",
+        "http://x:abc/",
+        "http://[::1",
+    ]
+    assert dedupe_urls(urls) == ["http://example.com/a", "http://[::1", "http://x:abc/"]
+
+
+def test_flight_key_of_malformed_url():
+    assert flight_key("http://[::1", ["--quiet"]) == ("http://[::1", ("--quiet",))
+    assert flight_key("http://www.example.com/", []) == flight_key(
+        "http://example.com", []
+    )
+
+
+def test_seen_index_with_malformed_urls(tmp_path):
+    with SeenIndex(str(tmp_path / "seen.db")) as seen:
+        assert seen.get("http://[::1") is None
+        seen.add("http://x:abc/", "x.pdf")
+        assert seen.get("http://x:abc/") == "x.pdf"
+        seen.add("http://www.example.com/a/", "a.pdf")
+        assert "http://example.com/a?utm_medium=email" in seen
+
+
+def test_generate_output_name_of_malformed_url():
+    assert generate_output_name("http://[::1").startswith("invalid_index_")
+
+
+def test_batch_reports_malformed_urls_per_job(tmp_path):
+    source = tmp_path / "urls.txt"
+    source.write_text("\n".join(MALFORMED) + "\n")
+    result = CliRunner().invoke(
+        app,
+        ["batch", str(source), "-o", str(tmp_path), "--cache-dir", str(tmp_path)],
+    )
+    assert result.exit_code == 1
+    assert result.output.count("Invalid URL") == len(MALFORMED)
+    assert "0 succeeded" in result.output
+
+
+def test_harvest_skips_malformed_links(tmp_path):
+    feed = b"""<?xml version="1.0"?>
+    <rss><channel>
+      <item><link>http://[::1</link></item>
+      <item><link>http://x:abc/</link></item>
+      <item><link>http://example.com/a</link></item>
+    </channel></rss>"""
+
+    def handler(request):
+        return httpx.Response(200, content=feed)
+
+    async def run(store):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await harvest_feeds(
+                client,
+                ["http://example.com/feed", "http://[::1"],
+                store,
+                lambda urls: store.add(urls, urls),
+            )
+
+    with JobStore(str(tmp_path / "harvest.db")) as store:
+        report = asyncio.run(run(store))
+        assert [job.url for job in store.unfinished()] == ["http://example.com/a"]
+    assert report.queued == 1
+    assert report.errors == ["http://[::1: Invalid URL"]
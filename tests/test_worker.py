@@ -0,0 +1,17 @@
+import pytest
+
+from web_snatcher.worker import parse_args
+
+
+def test_concurrency_defaults_to_one():
+    assert parse_args(["http://example.com/"]).concurrency == 1
+    assert parse_args(["-", "-j", "4"]).concurrency == 4
+
+
+@pytest.mark.parametrize("value", ["0", "-2", "many"])
+def test_concurrency_must_be_at_least_one(value, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        parse_args(["-", "-j", value])
+
+    assert exit_info.value.code == 2
+    assert "--concurrency" in capsys.readouterr().err
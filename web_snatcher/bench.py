@@ -0,0 +1,648 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from web_snatcher.engine import ResourceLimits, Runner
+from web_snatcher.fetch import create_client
+from web_snatcher.jobstore import StoredJob
+from web_snatcher.pipeline import Pipeline
+from web_snatcher.snatcher import Snatcher
+
+console = Console()
+
+app = typer.Typer(rich_markup_mode="markdown")
+
+# The smallest file PDF readers accept, written by the stub renderer
+STUB_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+SECTIONS = ["rugby", "gaa", "soccer", "golf", "boxing", "athletics"]
+WORDS = (
+    "match ireland squad coach minutes half final league season injury "
+    "score points win loss team captain try goal performance championship"
+).split()
+
+
+def fixture_page(index: int, images: int) -> bytes:
+    """
+    Generate a synthetic sports article, shaped like a page on the42.ie.
+
+    Pages are generated from their index, so every run serves the same corpus.
+
+    Args:
+        index (int): The article number.
+        images (int): The number of inline images in the article.
+
+    Returns:
+        bytes: The HTML document.
+    """
+    rng = random.Random(index)
+    section = SECTIONS[index % len(SECTIONS)]
+    title = " ".join(rng.choice(WORDS) for _ in range(8)).capitalize()
+    paragraphs = "".join(
+        f"<p>{' '.join(rng.choice(WORDS) for _ in range(rng.randint(40, 90)))}.</p>"
+        for _ in range(rng.randint(12, 24))
+    )
+    figures = "".join(
+        f'<figure><img src="/images/{index}-{n}.jpg" width="640" height="360">'
+        f"<figcaption>{rng.choice(WORDS)}</figcaption></figure>"
+        for n in range(images)
+    )
+    related = "".join(
+        f'<li><a href="/{section}/article-{rng.randint(0, 10**6)}/">'
+        f"{rng.choice(WORDS)}</a></li>"
+        for _ in range(20)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{title} | The42</title>"
+        '<link rel="stylesheet" href="/static/site.css">'
+        f'<link rel="canonical" href="/{section}/article-{index}/">'
+        '<script src="/static/app.js" defer></script></head>'
+        '<body><header><nav><a href="/">The42</a> / <a '
+        f'href="/{section}/">{section}</a></nav></header>'
+        f"<main><article><h1>{title}</h1><p class='byline'>By Staff Reporter</p>"
+        f"{figures}{paragraphs}</article>"
+        f"<aside><h2>Related</h2><ul>{related}</ul></aside></main>"
+        "<footer>&copy; The42</footer></body></html>"
+    ).encode()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """
+    Serves the synthetic corpus: articles at /<section>/article-<n>/ plus their assets.
+    """
+
+    protocol_version = "HTTP/1.1"
+    images = 4
+    asset = b"\xff\xd8\xff\xe0" + bytes(4096)
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0]
+        if path.startswith("/images/"):
+            self._send(self.asset, "image/jpeg")
+        elif path == "/static/site.css":
+            self._send(
+                b"body{font-family:serif;max-width:40em;margin:auto}", "text/css"
+            )
+        elif path == "/static/app.js":
+            self._send(b"document.documentElement.className='js';", "text/javascript")
+        elif "/article-" in path:
+            index = int(path.rstrip("/").rpartition("-")[2])
+            self._send(fixture_page(index, self.images), "text/html; charset=utf-8")
+        else:
+            self.send_error(404)
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def start_fixture_server(images: int) -> tuple[multiprocessing.Process, str]:
+    """
+    Serve the fixture corpus from a child process, so it does not count towards
+    the CPU time and memory being measured.
+
+    Args:
+        images (int): The number of images in each article.
+
+    Returns:
+        tuple[multiprocessing.Process, str]: The server process and its base URL.
+    """
+    handler = type("Handler", (FixtureHandler,), {"images": images})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    host, port = server.server_address
+    process = multiprocessing.get_context("fork").Process(
+        target=server.serve_forever, daemon=True
+    )
+    process.start()
+    # The child has its own copy of the listening socket
+    server.server_close()
+    return process, f"http://{host}:{port}"
+
+
+class StubRenderer:
+    """
+    Stands in for wkhtmltopdf, so the tool's own overhead can be measured without
+    WebKit.
+
+    It waits for a fixed time, as a render would, and writes a minimal PDF.
+    """
+
+    def __init__(self, delay: float, concurrency: int):
+        """
+        Args:
+            delay (float): Seconds each render takes.
+            concurrency (int): The maximum number of renders at once, as with Runner.
+        """
+        self.delay = delay
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def convert(
+        self,
+        url: str,
+        output: str,
+        options: list[str] | None = None,
+        html: bytes | None = None,
+    ) -> None:
+        async with self._semaphore:
+            await asyncio.sleep(self.delay)
+            with open(output, "wb") as f:
+                f.write(STUB_PDF)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """
+    Get a percentile of a list of values.
+
+    Args:
+        values (list[float]): The values.
+        percent (int): The percentile, from 1 to 99.
+
+    Returns:
+        float: The percentile, or 0.0 if there are no values.
+    """
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def resource_usage() -> dict[str, float]:
+    """
+    Read the CPU time and peak memory used so far by this process and its children.
+
+    Returns:
+        dict[str, float]: CPU seconds and peak RSS in MiB, for "self" and "children".
+    """
+    usage = {}
+    for name, who in (
+        ("self", resource.RUSAGE_SELF),
+        ("children", resource.RUSAGE_CHILDREN),
+    ):
+        rusage = resource.getrusage(who)
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        scale = 1 if sys.platform == "darwin" else 1024
+        usage[f"{name}_cpu_seconds"] = rusage.ru_utime + rusage.ru_stime
+        usage[f"{name}_peak_rss_mib"] = rusage.ru_maxrss * scale / 2**20
+    return usage
+
+
+def git_revision() -> str | None:
+    """
+    Get the commit the benchmark is running against, if it runs from a git checkout.
+
+    Returns:
+        str | None: The commit hash, or None.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_pipeline(
+    urls: list[str], snatcher: Snatcher, output_dir: str, concurrency: int
+) -> tuple[list[float], int]:
+    """
+    Convert every URL through the Snatcher with a fixed number of workers.
+
+    Args:
+        urls (list[str]): The pages to convert.
+        snatcher (Snatcher): The Snatcher to convert them with.
+        output_dir (str): Where to write the PDFs.
+        concurrency (int): The number of workers.
+
+    Returns:
+        tuple[list[float], int]: The latency of each successful page in seconds,
+            and the number of failures.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    for index, url in enumerate(urls):
+        queue.put_nowait((index, url))
+    latencies = []
+    failures = 0
+
+    async def worker() -> None:
+        nonlocal failures
+        while not queue.empty():
+            index, url = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                await snatcher.snatch(url, os.path.join(output_dir, f"{index}.pdf"))
+            except Exception as e:
+                failures += 1
+                console.print(f"[bold red]FAILED[/bold red] {url}: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    async with snatcher:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, failures
+
+
+async def run_staged(
+    urls: list[str],
+    snatcher: Snatcher,
+    output_dir: str,
+    concurrency: int,
+    fetchers: int,
+) -> tuple[list[float], int]:
+    """
+    Convert every URL through a Pipeline, with separate fetch and render stages.
+
+    Args:
+        urls (list[str]): The pages to convert.
+        snatcher (Snatcher): The Snatcher to convert them with.
+        output_dir (str): Where to write the PDFs.
+        concurrency (int): The number of render workers.
+        fetchers (int): The number of fetchers.
+
+    Returns:
+        tuple[list[float], int]: The latency of each successful page in seconds,
+            and the number of failures.
+    """
+    latencies = []
+    failures = 0
+
+    def finish(job: StoredJob, error: Exception | None, duration: float) -> None:
+        nonlocal failures
+        if error is None:
+            latencies.append(duration)
+            return
+        failures += 1
+        console.print(f"[bold red]FAILED[/bold red] {job.url}: {error}")
+
+    jobs = [
+        StoredJob(None, url, os.path.join(output_dir, f"{index}.pdf"))
+        for index, url in enumerate(urls)
+    ]
+    pipeline = Pipeline(
+        snatcher, fetchers=fetchers, renderers=concurrency, on_finish=finish
+    )
+    async with snatcher:
+        await pipeline.run(jobs)
+    return latencies, failures
+
+
+# Entry points timed by the startup benchmark, and modules each must not import
+STARTUP_TARGETS = {
+    "web_snatcher.main": ("rich", "httpx"),
+    "web_snatcher.worker": ("rich", "typer", "httpx"),
+}
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, float, float]]:
+    """
+    Parse the report written to stderr by `python -X importtime`.
+
+    Args:
+        output (str): The report.
+
+    Returns:
+        list[tuple[str, int, float, float]]: For each import, in the order they
+            finished: the module name, its nesting depth (0 for imports made by
+            the script itself), and its own and cumulative time in milliseconds.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|", 2)
+        if not own.strip().isdigit():
+            continue  # The header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), depth, int(own) / 1000, int(cumulative) / 1000))
+    return imports
+
+
+def measure_startup(module: str, runs: int) -> dict:
+    """
+    Time importing a module in fresh interpreters.
+
+    Args:
+        module (str): The module to import.
+        runs (int): The number of interpreters to start. One extra run comes first
+            to warm the bytecode cache, and is not counted.
+
+    Returns:
+        dict: The fastest import time and the median process time in milliseconds,
+            the slowest direct imports in the fastest run, and every module the
+            import loaded.
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+
+    samples = []
+    for _ in range(runs + 1):
+        started = time.perf_counter()
+        process = subprocess.run(command, env=env, capture_output=True, text=True)
+        wall = (time.perf_counter() - started) * 1000
+        if process.returncode:
+            raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+        imports = parse_importtime(process.stderr)
+        total = next(
+            cumulative for name, depth, _, cumulative in imports if name == module
+        )
+        samples.append((total, wall, imports))
+    # Noise only ever adds time, so the fastest run is the most repeatable figure
+    samples = samples[1:]
+    total, _, imports = min(samples, key=lambda sample: sample[0])
+
+    direct = [item for item in imports if item[1] == 1]
+    return {
+        "import_ms": total,
+        "process_ms": statistics.median(wall for _, wall, _ in samples),
+        "slowest": [
+            {"module": name, "ms": cumulative}
+            for name, _, _, cumulative in sorted(direct, key=lambda item: -item[3])[:5]
+        ],
+        "modules": sorted({name for name, _, _, _ in imports}),
+    }
+
+
+@app.callback()
+def bench():
+    """
+    Benchmarks for web-snatcher.
+    """
+
+
+@app.command()
+def pipeline(
+    pages: int = typer.Option(
+        200, "--pages", "-n", min=1, help="Number of pages to convert"
+    ),
+    concurrency: int = typer.Option(
+        8, "--concurrency", "-j", min=1, help="Number of pages converted in parallel"
+    ),
+    renderer: str = typer.Option(
+        "stub",
+        "--renderer",
+        help="'stub' to measure orchestration alone, or 'wkhtmltopdf' for real renders",
+    ),
+    render_ms: int = typer.Option(
+        50,
+        "--render-ms",
+        min=0,
+        help="How long each stub render takes, in milliseconds",
+    ),
+    prefetch: bool = typer.Option(
+        True,
+        "--prefetch/--no-prefetch",
+        help="Pre-fetch pages with the shared HTTP client",
+    ),
+    images: int = typer.Option(
+        4, "--images", min=0, help="Images in each fixture article"
+    ),
+    fetchers: int = typer.Option(
+        0,
+        "--fetchers",
+        min=0,
+        help="Run fetch and render as separate stages with this many fetchers "
+        "(0 converts each page start to finish in one worker)",
+    ),
+    json_path: str = typer.Option(
+        None, "--json", help="Write the results to this JSON file"
+    ),
+):
+    """
+    Convert a synthetic corpus served from a local HTTP server and report throughput.
+
+    Args:
+        pages (int): Number of pages to convert (default: 200).
+        concurrency (int): Number of pages converted in parallel (default: 8).
+        renderer (str): "stub" or "wkhtmltopdf" (default: stub).
+        render_ms (int): Duration of each stub render in milliseconds (default: 50).
+        prefetch (bool): Pre-fetch pages with the shared HTTP client (default: True).
+        images (int): Images in each fixture article (default: 4).
+        fetchers (int): Fetchers for a staged pipeline, or 0 for one stage (default: 0).
+        json_path (str): Write the results to this JSON file (default: not written).
+    """
+    if renderer not in ("stub", "wkhtmltopdf"):
+        raise typer.BadParameter(
+            "expected 'stub' or 'wkhtmltopdf'", param_hint="--renderer"
+        )
+
+    server, base_url = start_fixture_server(images)
+    urls = [
+        f"{base_url}/{SECTIONS[i % len(SECTIONS)]}/article-{i}/" for i in range(pages)
+    ]
+    if renderer == "stub":
+        render = StubRenderer(render_ms / 1000, concurrency).convert
+    else:
+        render = Runner(concurrency, ResourceLimits()).convert
+    snatcher = Snatcher(
+        render=render,
+        client=create_client(max_connections=concurrency * 2) if prefetch else None,
+    )
+
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            before = resource_usage()
+            started = time.perf_counter()
+            if fetchers:
+                run = run_staged(urls, snatcher, output_dir, concurrency, fetchers)
+            else:
+                run = run_pipeline(urls, snatcher, output_dir, concurrency)
+            latencies, failures = asyncio.run(run)
+            elapsed = time.perf_counter() - started
+            after = resource_usage()
+    finally:
+        server.terminate()
+
+    results = {
+        "pages": pages,
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "pages_per_minute": len(latencies) / elapsed * 60 if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": max(latencies, default=0.0) * 1000,
+        },
+        "cpu_seconds": {
+            "self": after["self_cpu_seconds"] - before["self_cpu_seconds"],
+            "children": after["children_cpu_seconds"] - before["children_cpu_seconds"],
+        },
+        "peak_rss_mib": {
+            "self": after["self_peak_rss_mib"],
+            "children": after["children_peak_rss_mib"],
+        },
+    }
+    report = {
+        "benchmark": "pipeline",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "pages": pages,
+            "concurrency": concurrency,
+            "renderer": renderer,
+            "render_ms": render_ms if renderer == "stub" else None,
+            "prefetch": prefetch,
+            "images": images,
+            "fetchers": fetchers,
+        },
+        "results": results,
+    }
+
+    table = Table(
+        title=f"Pipeline: {pages} pages, {renderer} renderer, -j {concurrency}"
+    )
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    table.add_row("Pages/min", f"{results['pages_per_minute']:.0f}")
+    for name, value in results["latency_ms"].items():
+        table.add_row(f"Latency {name}", f"{value:.1f} ms")
+    table.add_row("CPU (self)", f"{results['cpu_seconds']['self']:.2f} s")
+    table.add_row("CPU (children)", f"{results['cpu_seconds']['children']:.2f} s")
+    table.add_row("Peak RSS (self)", f"{results['peak_rss_mib']['self']:.1f} MiB")
+    table.add_row(
+        "Peak RSS (children)", f"{results['peak_rss_mib']['children']:.1f} MiB"
+    )
+    table.add_row("Failures", str(failures))
+    console.print(table)
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        console.print(
+            f"[bold blue]Info:[/bold blue] Results written to [cyan]{json_path}[/cyan]"
+        )
+    if failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def startup(
+    runs: int = typer.Option(
+        10, "--runs", "-n", min=1, help="Interpreters to start per entry point"
+    ),
+    baseline: str = typer.Option(
+        None,
+        "--baseline",
+        help="Fail if imports are slower than in this earlier --json file",
+    ),
+    tolerance: float = typer.Option(
+        0.25,
+        "--tolerance",
+        min=0,
+        help="Slowdown allowed against the baseline, as a fraction",
+    ),
+    json_path: str = typer.Option(
+        None, "--json", help="Write the results to this JSON file"
+    ),
+):
+    """
+    Time how long each entry point takes to import, using `python -X importtime`.
+
+    Fails if the worker entry point imports typer or rich, or if an entry point
+    got slower than the baseline by more than the tolerance.
+
+    Args:
+        runs (int): Interpreters to start per entry point (default: 10).
+        baseline (str): An earlier --json file to compare against
+            (default: no comparison).
+        tolerance (float): Slowdown allowed against the baseline (default: 0.25).
+        json_path (str): Write the results to this JSON file (default: not written).
+    """
+    previous = {}
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    problems = []
+    table = Table(title=f"Startup: best of {runs} runs")
+    table.add_column("Entry point")
+    table.add_column("Import", justify="right")
+    table.add_column("Process", justify="right")
+    table.add_column("Baseline", justify="right")
+    table.add_column("Slowest imports")
+    for module, forbidden in STARTUP_TARGETS.items():
+        result = measure_startup(module, runs)
+        results[module] = result
+
+        loaded = [name for name in forbidden if name in result["modules"]]
+        if loaded:
+            problems.append(f"{module} imports {', '.join(loaded)}")
+        base = previous.get(module, {}).get("import_ms")
+        if base and result["import_ms"] > base * (1 + tolerance):
+            problems.append(
+                f"{module} takes {result['import_ms']:.1f} ms to import, "
+                f"up from {base:.1f} ms"
+            )
+        table.add_row(
+            module,
+            f"{result['import_ms']:.1f} ms",
+            f"{result['process_ms']:.1f} ms",
+            f"{base:.1f} ms" if base else "-",
+            ", ".join(
+                f"{item['module']} {item['ms']:.0f}ms" for item in result["slowest"]
+            ),
+        )
+    console.print(table)
+
+    if json_path:
+        report = {
+            "benchmark": "startup",
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {"runs": runs},
+            "results": results,
+        }
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        console.print(
+            f"[bold blue]Info:[/bold blue] Results written to [cyan]{json_path}[/cyan]"
+        )
+    for problem in problems:
+        console.print(f"[bold red]Regression:[/bold red] {problem}")
+    if problems:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
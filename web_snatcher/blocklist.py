@@ -0,0 +1,255 @@
+import html
+import re
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlparse
+
+# Ad networks, analytics beacons and social widgets common on news sites
+DEFAULT_BLOCKED = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "googletagservices.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "adsrvr.org",
+    "criteo.com",
+    "criteo.net",
+    "pubmatic.com",
+    "rubiconproject.com",
+    "openx.net",
+    "casalemedia.com",
+    "smartadserver.com",
+    "moatads.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "chartbeat.com",
+    "chartbeat.net",
+    "hotjar.com",
+    "newrelic.com",
+    "nr-data.net",
+    "connect.facebook.net",
+    "platform.twitter.com",
+    "syndication.twitter.com",
+    "disqus.com",
+    "disquscdn.com",
+    "*/ads/*",
+    "*/prebid*.js",
+)
+
+# Tags that make wkhtmltopdf fetch something, and the attribute holding the URL
+RESOURCE_PATTERN = re.compile(
+    rb"<(script|iframe)\b([^>]*)>.*?</\1\s*>|<(img|link|embed|source)\b([^>]*)>",
+    re.IGNORECASE | re.DOTALL,
+)
+URL_ATTRIBUTE_PATTERN = re.compile(
+    rb"""(?<=\s)(?:src|href|data)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""",
+    re.IGNORECASE,
+)
+# Absolute and protocol-relative URLs mentioned in inline scripts, such as the
+# snippets that load tag managers
+SCRIPT_URL_PATTERN = re.compile(
+    rb"""(?:https?:)?//[a-z0-9.-]+\.[a-z]{2,}[^\s"'<>]*""", re.IGNORECASE
+)
+
+
+@dataclass
+class BlockReport:
+    """
+    What blocking avoided for one page.
+
+    Attributes:
+        requests (int): Resources that were not requested.
+        bytes (int): Bytes of markup removed from the document.
+    """
+
+    requests: int = 0
+    bytes: int = 0
+
+    def add(self, other: "BlockReport") -> None:
+        self.requests += other.requests
+        self.bytes += other.bytes
+
+
+class SuffixTrie:
+    """
+    A set of domains matched by suffix, so a domain also matches its subdomains.
+
+    Domains are stored label by label from the right, so a lookup costs one step
+    per label of the host, however many domains are stored.
+    """
+
+    def __init__(self):
+        self._root: dict = {}
+        self._size = 0
+
+    def add(self, domain: str) -> None:
+        node = self._root
+        for label in reversed(domain.lower().strip(".").split(".")):
+            node = node.setdefault(label, {})
+        if not node.get(""):
+            node[""] = True
+            self._size += 1
+
+    def matches(self, host: str) -> bool:
+        """
+        Check whether a host is one of the domains or a subdomain of one.
+
+        Args:
+            host (str): The host, e.g. "stats.g.doubleclick.net".
+
+        Returns:
+            bool: True if a stored domain is a suffix of the host.
+        """
+        node = self._root
+        for label in reversed(host.lower().rstrip(".").split(".")):
+            node = node.get(label)
+            if node is None:
+                return False
+            if node.get(""):
+                return True
+        return False
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class Blocklist:
+    """
+    Hosts and URL patterns that pages are rendered without.
+
+    Entries are domains, which also block their subdomains, or URL patterns
+    containing "/" or "*", where "*" matches anything. Patterns are matched
+    against the whole URL without its scheme.
+    """
+
+    def __init__(self, entries: tuple[str, ...] | list[str] = ()):
+        """
+        Args:
+            entries (tuple[str, ...] | list[str]): Domains and URL patterns
+                (default: none).
+        """
+        self.hosts = SuffixTrie()
+        patterns = []
+        for entry in entries:
+            entry = entry.strip().lower()
+            if not entry:
+                continue
+            if "/" in entry or "*" in entry:
+                patterns.append(".*".join(re.escape(part) for part in entry.split("*")))
+            else:
+                self.hosts.add(entry)
+        self.patterns = len(patterns)
+        # One alternation, so each URL is scanned once whatever the number of patterns
+        self._pattern = re.compile("|".join(patterns)) if patterns else None
+
+    @classmethod
+    def from_lines(cls, lines: list[str], defaults: bool = True) -> "Blocklist":
+        """
+        Build a blocklist from the lines of a blocklist file.
+
+        Blank lines and "#" comments are skipped, and hosts-file lines such as
+        "0.0.0.0 ads.example.com" are read as the domain they name.
+
+        Args:
+            lines (list[str]): The lines.
+            defaults (bool): Also include the built-in list (default: True).
+
+        Returns:
+            Blocklist: The blocklist.
+        """
+        entries = list(DEFAULT_BLOCKED) if defaults else []
+        for line in lines:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) > 1 and fields[0] in ("0.0.0.0", "127.0.0.1", "::", "::1"):
+                entries.extend(fields[1:])
+            else:
+                entries.append(fields[0])
+        return cls(entries)
+
+    def blocks_host(self, host: str) -> bool:
+        """
+        Check whether every request to a host is blocked.
+
+        Args:
+            host (str): The host.
+
+        Returns:
+            bool: True if the host or one of its parent domains is blocked.
+        """
+        return self.hosts.matches(host)
+
+    def blocks(self, url: str) -> bool:
+        """
+        Check whether a URL is blocked.
+
+        Args:
+            url (str): The absolute URL.
+
+        Returns:
+            bool: True if its host is blocked or it matches a pattern.
+        """
+        parts = urlparse(url)
+        if parts.hostname and self.hosts.matches(parts.hostname):
+            return True
+        if self._pattern is None:
+            return False
+        return self._pattern.search(url.lower().partition("//")[2]) is not None
+
+    def __len__(self) -> int:
+        return len(self.hosts) + self.patterns
+
+
+def strip_blocked(
+    content: bytes, url: str, blocklist: Blocklist
+) -> tuple[bytes, BlockReport]:
+    """
+    Remove the tags that would make wkhtmltopdf fetch blocked resources.
+
+    Scripts, iframes, images, stylesheets and embeds pointing at blocked URLs are
+    removed, as are inline scripts that load something from a blocked URL.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from, to resolve relative URLs.
+        blocklist (Blocklist): The blocklist.
+
+    Returns:
+        tuple[bytes, BlockReport]: The document, and what removing the tags avoided.
+    """
+    report = BlockReport()
+
+    def blocked(reference: bytes) -> bool:
+        reference = html.unescape(reference.decode(errors="replace")).strip()
+        if not reference or reference.startswith(("data:", "#", "javascript:")):
+            return False
+        return blocklist.blocks(urljoin(url, reference))
+
+    def rewrite(match: re.Match) -> bytes:
+        tag = match.group()
+        attributes = match.group(2) if match.group(1) else match.group(4)
+        reference = URL_ATTRIBUTE_PATTERN.search(attributes)
+        if reference:
+            is_blocked = blocked(
+                next(value for value in reference.groups() if value is not None)
+            )
+        elif match.group(1) and match.group(1).lower() == b"script":
+            is_blocked = any(
+                blocked(found) for found in SCRIPT_URL_PATTERN.findall(tag)
+            )
+        else:
+            is_blocked = False
+        if not is_blocked:
+            return tag
+        report.requests += 1
+        report.bytes += len(tag)
+        return b""
+
+    return RESOURCE_PATTERN.sub(rewrite, content), report
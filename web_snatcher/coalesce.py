@@ -0,0 +1,106 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Flight:
+    """
+    A piece of work in progress and the number of callers waiting on it.
+
+    Attributes:
+        task (asyncio.Task): The task doing the work.
+        waiters (int): The number of callers currently waiting on or using the result.
+    """
+
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    De-duplicates concurrent work with the same key.
+
+    The first caller for a key starts the work in its own task. Callers that
+    arrive while it is running wait on the same task and receive the same
+    result or exception. The work is only cancelled once every waiter has
+    given up on it.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, Flight] = {}
+        self.coalesced = 0
+
+    @asynccontextmanager
+    async def join(
+        self,
+        key: Hashable,
+        work: Callable[[], Awaitable],
+        cleanup: Callable[[object], None] | None = None,
+    ) -> AsyncIterator:
+        """
+        Wait for the work for a key, starting it if nobody else has.
+
+        The result is yielded to the body of the `async with` block, and `cleanup`
+        runs once the last waiter has left its block. This suits results such as
+        temporary files that every waiter must consume before they are removed.
+
+        Args:
+            key (Hashable): Identifies equivalent work.
+            work (Callable[[], Awaitable]): Starts the work. Only called for the first
+                caller.
+            cleanup (Callable[[object], None] | None): Called with the result after
+                the last waiter is done with it (default: None).
+
+        Yields:
+            The result of the work.
+
+        Raises:
+            Exception: Whatever the work raised.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+        else:
+            self.coalesced += 1
+            logger.debug(f"Joining in-flight work for {key}")
+
+        flight.waiters += 1
+        try:
+            yield await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                if not flight.task.done():
+                    flight.task.cancel()
+                elif (
+                    cleanup
+                    and not flight.task.cancelled()
+                    and flight.task.exception() is None
+                ):
+                    cleanup(flight.task.result())
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable]) -> object:
+        """
+        Run the work for a key, or wait for the identical work already in flight.
+
+        Args:
+            key (Hashable): Identifies equivalent work.
+            work (Callable[[], Awaitable]): Starts the work. Only called for the first
+                caller.
+
+        Returns:
+            The result of the work.
+        """
+        async with self.join(key, work) as result:
+            return result
+
+    def _finished(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
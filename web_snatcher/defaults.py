@@ -0,0 +1,11 @@
+# Defaults shared by the CLI, the worker and the modules doing the work. They
+# live here so the entry points can use them without importing those modules.
+
+# Default wall-clock limit for a single conversion, in seconds
+DEFAULT_TIMEOUT = 120.0
+
+# Conventional exit status for a command that timed out
+TIMEOUT_EXIT_CODE = 124
+
+# Fetches are mostly waiting on the network, so many can run per render worker
+DEFAULT_FETCHERS = 16
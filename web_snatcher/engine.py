@@ -0,0 +1,331 @@
+import asyncio
+import functools
+import logging
+import os
+import re
+import resource
+import signal
+import subprocess
+import time
+from dataclasses import dataclass
+
+from web_snatcher.defaults import DEFAULT_TIMEOUT
+from web_snatcher.metrics import RENDER_SECONDS, RENDER_SLOTS, RENDER_SLOTS_BUSY
+from web_snatcher.profiles import RenderProfile
+from web_snatcher.readiness import Readiness
+from web_snatcher.tracing import active_tracer, span
+
+logger = logging.getLogger(__name__)
+
+
+# Layout options passed to every wkhtmltopdf conversion, from the default profile
+BASE_OPTIONS = RenderProfile().wkhtmltopdf_options()
+
+# The default options: the base layout plus the default adaptive readiness wait
+WKHTMLTOPDF_OPTIONS = [*BASE_OPTIONS, *Readiness().options()]
+
+# The input wkhtmltopdf reads the document from stdin
+STDIN_INPUT = "-"
+
+# The stage headings wkhtmltopdf prints, such as "Loading pages (1/6)"
+PHASE_PATTERN = re.compile(r"^(.+?) \(\d+/\d+\)$")
+
+
+class RenderTimeoutError(subprocess.TimeoutExpired):
+    """
+    Raised when wkhtmltopdf does not finish within its wall-clock timeout.
+    """
+
+    def __str__(self) -> str:
+        return f"wkhtmltopdf timed out after {self.timeout:g} seconds"
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Limits applied to each wkhtmltopdf process.
+
+    Attributes:
+        timeout (float | None): Wall-clock seconds before the process group is killed.
+        memory_bytes (int | None): Address-space limit (RLIMIT_AS) in bytes.
+        cpu_seconds (int | None): CPU-time limit (RLIMIT_CPU) in seconds.
+    """
+
+    timeout: float | None = DEFAULT_TIMEOUT
+    memory_bytes: int | None = None
+    cpu_seconds: int | None = None
+
+
+def apply_rlimits(memory_bytes: int | None, cpu_seconds: int | None) -> None:
+    """
+    Set resource limits in a freshly forked child, before it execs wkhtmltopdf.
+
+    Args:
+        memory_bytes (int | None): Address-space limit in bytes, or None for no limit.
+        cpu_seconds (int | None): CPU-time limit in seconds, or None for no limit.
+    """
+    if memory_bytes is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    if cpu_seconds is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+
+
+def kill_process_group(process: asyncio.subprocess.Process) -> None:
+    """
+    Kill a process started in its own session, along with any children it spawned.
+
+    Args:
+        process (asyncio.subprocess.Process): The process leading the group.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def spawn(
+    cmd: list[str],
+    limits: ResourceLimits | None = None,
+    cpu_limit: bool = True,
+    **kwargs,
+) -> asyncio.subprocess.Process:
+    """
+    Start a wkhtmltopdf process in its own process group with resource limits applied.
+
+    Args:
+        cmd (list[str]): The argv to execute.
+        limits (ResourceLimits | None): The limits to apply (default: None).
+        cpu_limit (bool): Whether to apply the CPU-time limit. Long-lived processes
+            accumulate CPU time across jobs, so they skip it (default: True).
+        **kwargs: Passed on to asyncio.create_subprocess_exec.
+
+    Returns:
+        asyncio.subprocess.Process: The started process.
+    """
+    preexec_fn = None
+    if limits and (limits.memory_bytes or (cpu_limit and limits.cpu_seconds)):
+        preexec_fn = functools.partial(
+            apply_rlimits,
+            limits.memory_bytes,
+            limits.cpu_seconds if cpu_limit else None,
+        )
+    return await asyncio.create_subprocess_exec(
+        *cmd, start_new_session=True, preexec_fn=preexec_fn, **kwargs
+    )
+
+
+def build_command(url: str, output: str, options: list[str] | None = None) -> list[str]:
+    """
+    Build the wkhtmltopdf command line for a single conversion.
+
+    Args:
+        url (str): The URL of the webpage to convert.
+        output (str): The path where the PDF will be saved.
+        options (list[str] | None): The wkhtmltopdf options
+            (default: WKHTMLTOPDF_OPTIONS).
+
+    Returns:
+        list[str]: The full argv, starting with the wkhtmltopdf executable.
+    """
+    if options is None:
+        options = WKHTMLTOPDF_OPTIONS
+    return ["wkhtmltopdf", *options, url, output]
+
+
+async def convert(
+    url: str,
+    output: str,
+    options: list[str] | None = None,
+    html: bytes | None = None,
+    limits: ResourceLimits | None = None,
+) -> None:
+    """
+    Convert a webpage to PDF in a wkhtmltopdf subprocess without blocking the event
+    loop.
+
+    The process runs in its own process group, which is killed once the
+    conversion ends so that no stray children outlive it.
+
+    Args:
+        url (str): The URL of the webpage to convert.
+        output (str): The path where the PDF will be saved.
+        options (list[str] | None): The wkhtmltopdf options
+            (default: WKHTMLTOPDF_OPTIONS).
+        html (bytes | None): A pre-fetched document to render instead of letting
+            wkhtmltopdf fetch the URL itself. It is piped to wkhtmltopdf's stdin.
+        limits (ResourceLimits | None): The timeout and resource limits (default: None).
+
+    Raises:
+        RenderTimeoutError: If wkhtmltopdf does not finish within the timeout.
+        subprocess.CalledProcessError: If wkhtmltopdf execution fails.
+    """
+    cmd = build_command(url if html is None else STDIN_INPUT, output, options)
+    timeout = limits.timeout if limits else None
+
+    logger.debug(f"Executing command: {' '.join(cmd)}")
+
+    with span("spawn"):
+        process = await spawn(
+            cmd,
+            limits,
+            stdin=(
+                asyncio.subprocess.DEVNULL if html is None else asyncio.subprocess.PIPE
+            ),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+    started = time.monotonic()
+    # Reading stderr as it arrives costs a little, so only do it when tracing
+    communicate = (
+        communicate_traced(process, html)
+        if active_tracer()
+        else process.communicate(html)
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(communicate, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"wkhtmltopdf timed out after {timeout:g}s converting {url}")
+        kill_process_group(process)
+        await process.wait()
+        raise RenderTimeoutError(cmd, timeout)
+    finally:
+        kill_process_group(process)
+        RENDER_SECONDS.observe(time.monotonic() - started)
+
+    stdout = stdout.decode(errors="replace")
+    stderr = stderr.decode(errors="replace")
+
+    if stdout:
+        logger.info(f"wkhtmltopdf stdout: {stdout.strip()}")
+    if stderr:
+        logger.warning(f"wkhtmltopdf stderr: {stderr.strip()}")
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, output=stderr)
+
+
+class PhaseTracker:
+    """
+    Turns wkhtmltopdf's stage headings into trace spans.
+
+    "Loading pages" covers fetching the page, its assets and the JavaScript
+    wait; the later stages cover laying out and printing the PDF.
+    """
+
+    def __init__(self):
+        self.tracer = active_tracer()
+        self._phase: str | None = None
+        self._started = 0.0
+
+    def segment(self, text: str) -> None:
+        """
+        Note a line of wkhtmltopdf's stderr, starting a new phase at each stage heading.
+
+        Args:
+            text (str): The line, split on carriage returns as well as newlines.
+        """
+        if self.tracer is None:
+            return
+        match = PHASE_PATTERN.match(text)
+        if match:
+            self.finish()
+            self._phase = f"wkhtmltopdf: {match.group(1)}"
+            self._started = self.tracer.now()
+
+    def finish(self) -> None:
+        """
+        End the current phase.
+        """
+        if self.tracer is not None and self._phase is not None:
+            self.tracer.record(self._phase, self._started, self.tracer.now())
+            self._phase = None
+
+
+async def communicate_traced(
+    process: asyncio.subprocess.Process, html: bytes | None
+) -> tuple[bytes, bytes]:
+    """
+    Like `process.communicate`, but records wkhtmltopdf's stages as they are printed.
+
+    Args:
+        process (asyncio.subprocess.Process): The wkhtmltopdf process.
+        html (bytes | None): The document to write to its stdin, if any.
+
+    Returns:
+        tuple[bytes, bytes]: Its stdout and stderr.
+    """
+    phases = PhaseTracker()
+
+    async def feed() -> None:
+        if html is None:
+            return
+        try:
+            process.stdin.write(html)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        process.stdin.close()
+
+    async def read_stderr() -> bytes:
+        chunks = []
+        while chunk := await process.stderr.read(4096):
+            chunks.append(chunk)
+            for segment in re.split(r"[\r\n]", chunk.decode(errors="replace")):
+                phases.segment(segment.strip())
+        phases.finish()
+        return b"".join(chunks)
+
+    _, stdout, stderr = await asyncio.gather(
+        feed(), process.stdout.read(), read_stderr()
+    )
+    await process.wait()
+    return stdout, stderr
+
+
+class Runner:
+    """
+    Runs conversions on the event loop with a cap on how many are in flight.
+    """
+
+    def __init__(self, concurrency: int, limits: ResourceLimits | None = None):
+        """
+        Args:
+            concurrency (int): The maximum number of conversions to run at once.
+            limits (ResourceLimits | None): The timeout and resource limits applied
+                to every conversion (default: None).
+        """
+        self.concurrency = concurrency
+        self.limits = limits
+        self._semaphore = asyncio.Semaphore(concurrency)
+        RENDER_SLOTS.set(concurrency)
+
+    async def convert(
+        self,
+        url: str,
+        output: str,
+        options: list[str] | None = None,
+        html: bytes | None = None,
+    ) -> None:
+        """
+        Convert a webpage to PDF once a slot is free.
+
+        Args:
+            url (str): The URL of the webpage to convert.
+            output (str): The path where the PDF will be saved.
+            options (list[str] | None): The wkhtmltopdf options
+                (default: WKHTMLTOPDF_OPTIONS).
+            html (bytes | None): A pre-fetched document to render (default: None).
+
+        Raises:
+            RenderTimeoutError: If wkhtmltopdf does not finish within the timeout.
+            subprocess.CalledProcessError: If wkhtmltopdf execution fails.
+        """
+        with span("wait for render slot"):
+            await self._semaphore.acquire()
+        RENDER_SLOTS_BUSY.inc()
+        try:
+            await convert(url, output, options, html, self.limits)
+        finally:
+            RENDER_SLOTS_BUSY.dec()
+            self._semaphore.release()
@@ -0,0 +1,395 @@
+import html
+import re
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+# Elements whose content is never part of an article
+SKIPPED_TAGS = set(
+    "script style noscript template iframe object embed form button input select "
+    "textarea svg canvas nav aside footer".split()
+)
+VOID_TAGS = set(
+    "area base br col embed hr img input link meta param source track wbr".split()
+)
+# Elements kept in the extracted body; everything else is unwrapped to its content
+KEPT_TAGS = set(
+    "p h2 h3 h4 h5 h6 ul ol li blockquote pre code em strong b i a br img figure "
+    "figcaption table thead tbody tr th td sup sub".split()
+)
+BLOCK_TAGS = {"div", "section", "article", "main", "body", "td"}
+
+# class/id names of page furniture: comments, sharing, ads, carousels and the like.
+# Elements named like this are left out even if they also look like content,
+# as with "related-articles"
+FURNITURE_NAMES = re.compile(
+    r"comment|share|sharing|social|related|recommend|advert|\bads?\b|\bad-|sponsor|"
+    r"outbrain|taboola|newsletter|subscribe|carousel|cookie|popup|author-bio",
+    re.IGNORECASE,
+)
+# Names that usually mean furniture, unless they also look like content, as
+# with "content-with-sidebar"
+UNLIKELY_NAMES = re.compile(
+    r"sidebar|widget|promo|banner|breadcrumb|\bnav|menu|footer|masthead|\btags?\b",
+    re.IGNORECASE,
+)
+POSITIVE_NAMES = re.compile(
+    r"article|body|content|entry|main|post|story|text|blog", re.IGNORECASE
+)
+BYLINE_NAMES = re.compile(r"byline|author|writer", re.IGNORECASE)
+BY_PREFIX = re.compile(r"^by\s+", re.IGNORECASE)
+
+# Paragraphs shorter than this are captions, labels and teasers rather than prose
+MIN_PARAGRAPH_CHARS = 25
+# Below this much text, extraction is assumed to have missed the article
+MIN_ARTICLE_CHARS = 400
+
+PRINT_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<base href="{url}">
+<title>{title}</title>
+<style>
+body {{ font: 12pt/1.5 Georgia, "Times New Roman", serif; color: #111; margin: 0; }}
+h1 {{ font-size: 22pt; line-height: 1.2; margin: 0 0 6pt; }}
+.meta {{ color: #555; font: 9pt sans-serif; margin-bottom: 18pt; }}
+img {{ max-width: 100%; height: auto; }}
+figure {{ margin: 12pt 0; }}
+figcaption {{ color: #555; font-size: 9pt; }}
+blockquote {{ border-left: 3pt solid #ccc; margin-left: 0; padding-left: 12pt; }}
+pre {{ white-space: pre-wrap; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<div class="meta">{meta}</div>
+{lead}{body}
+</body>
+</html>
+"""
+
+
+@dataclass
+class Article:
+    """
+    The readable parts of a page, as found by `extract_article`.
+
+    Attributes:
+        url (str): The URL the page was fetched from.
+        title (str): The headline.
+        byline (str | None): The author, if the page names one.
+        body (str): The article's content as simplified HTML.
+        lead_image (str | None): The page's main image, if it is not in the body.
+    """
+
+    url: str
+    title: str
+    byline: str | None
+    body: str
+    lead_image: str | None = None
+
+
+@dataclass
+class Node:
+    tag: str
+    attrs: dict[str, str]
+    parent: "Node | None" = None
+    children: list["Node | str"] = field(default_factory=list)
+    score: float = 0.0
+
+    def text(self) -> str:
+        return "".join(
+            child if isinstance(child, str) else child.text() for child in self.children
+        )
+
+    def names(self) -> str:
+        return f"{self.attrs.get('class', '')} {self.attrs.get('id', '')}"
+
+
+class TreeBuilder(HTMLParser):
+    """
+    Builds a forgiving element tree, leaving out elements that are never content.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = Node("root", {})
+        self.current = self.root
+        self.meta: dict[str, str] = {}
+        self.title = ""
+        self._in_title = False
+        # The element being left out, and how deeply elements of its kind are
+        # nested inside it, so its own end tag can be told apart
+        self._skip_tag: str | None = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        values = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            key = values.get("property") or values.get("name")
+            if key and "content" in values:
+                self.meta.setdefault(key.lower(), values["content"])
+            return
+        if tag == "title":
+            self._in_title = True
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if tag in SKIPPED_TAGS or is_furniture(tag, values):
+            if tag not in VOID_TAGS:
+                self._skip_tag, self._skip_depth = tag, 1
+            return
+        node = Node(tag, values, self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag == "title":
+            self._in_title = False
+        if self._skip_tag:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    self._skip_tag = None
+            return
+        if tag in VOID_TAGS:
+            return
+        # Close the nearest matching element, tolerating unclosed tags in between
+        node = self.current
+        while node is not self.root and node.tag != tag:
+            node = node.parent
+        if node is not self.root:
+            self.current = node.parent
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skip_tag:
+            self.current.children.append(data)
+
+
+def is_furniture(tag: str, attrs: dict[str, str]) -> bool:
+    """
+    Check whether an element is page furniture, judging by its class, id and role.
+
+    Args:
+        tag (str): The element's tag name.
+        attrs (dict[str, str]): The element's attributes.
+
+    Returns:
+        bool: True if the element should be left out of the article.
+    """
+    if tag in ("html", "body", "main", "article"):
+        return False
+    names = f"{attrs.get('class', '')} {attrs.get('id', '')} {attrs.get('role', '')}"
+    if FURNITURE_NAMES.search(names):
+        return True
+    return bool(UNLIKELY_NAMES.search(names)) and not POSITIVE_NAMES.search(names)
+
+
+def walk(node: Node):
+    """
+    Yield every element under a node, depth first.
+    """
+    for child in node.children:
+        if isinstance(child, Node):
+            yield child
+            yield from walk(child)
+
+
+def score_candidates(root: Node) -> Node | None:
+    """
+    Find the element most likely to hold the article, readability-style.
+
+    Each paragraph adds to the score of its parent, and half as much to its
+    grandparent, by how much prose it has. Containers named like article
+    bodies get a boost.
+
+    Args:
+        root (Node): The document tree.
+
+    Returns:
+        Node | None: The best container, or None if the page has no paragraphs.
+    """
+    candidates: list[Node] = []
+    for node in walk(root):
+        if node.tag not in ("p", "pre", "blockquote"):
+            continue
+        text = " ".join(node.text().split())
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        points = 1 + text.count(",") + min(len(text) / 100, 3)
+        for ancestor, share in (
+            (node.parent, 1.0),
+            (node.parent and node.parent.parent, 0.5),
+        ):
+            if ancestor is None or ancestor is root:
+                continue
+            if ancestor.score == 0:
+                candidates.append(ancestor)
+                if POSITIVE_NAMES.search(ancestor.names()) or ancestor.tag == "article":
+                    ancestor.score += 25
+            ancestor.score += points * share
+    if not candidates:
+        return None
+    # Favour containers that are mostly prose over ones that are mostly links
+    return max(candidates, key=lambda node: node.score * (1 - link_density(node)))
+
+
+def link_density(node: Node) -> float:
+    text = len(node.text()) or 1
+    linked = sum(len(child.text()) for child in walk(node) if child.tag == "a")
+    return min(linked / text, 1.0)
+
+
+def serialize(node: Node, url: str, left_out: set[int] = frozenset()) -> str:
+    """
+    Write out an element's content as simplified HTML, keeping only content tags
+    and the attributes they need.
+
+    Headlines are left out, as the print template shows the title on its own.
+
+    Args:
+        node (Node): The element.
+        url (str): The page's URL, to make links and image sources absolute.
+        left_out (set[int]): The ids of elements to leave out, such as the byline
+            (default: none).
+
+    Returns:
+        str: The HTML.
+    """
+    parts = []
+    for child in node.children:
+        if isinstance(child, str):
+            parts.append(html.escape(child, quote=False))
+            continue
+        if child.tag == "h1" or id(child) in left_out:
+            continue
+        inner = serialize(child, url, left_out)
+        if child.tag == "img":
+            src = child.attrs.get("src")
+            if src and not src.startswith("data:"):
+                alt = html.escape(child.attrs.get("alt", ""))
+                parts.append(
+                    f'<img src="{html.escape(urljoin(url, src))}" alt="{alt}">'
+                )
+        elif child.tag == "br":
+            parts.append("<br>")
+        elif child.tag == "a":
+            href = child.attrs.get("href", "")
+            if href and not href.startswith(("javascript:", "#")):
+                parts.append(f'<a href="{html.escape(urljoin(url, href))}">{inner}</a>')
+            else:
+                parts.append(inner)
+        elif child.tag in KEPT_TAGS:
+            if inner.strip() or child.tag in ("figure", "td", "th"):
+                parts.append(f"<{child.tag}>{inner}</{child.tag}>")
+        elif child.tag in BLOCK_TAGS:
+            parts.append(f"\n{inner}\n")
+        else:
+            parts.append(inner)
+    return "".join(parts)
+
+
+def find_byline(builder: TreeBuilder) -> tuple[str | None, Node | None]:
+    """
+    Find the article's author.
+
+    Args:
+        builder (TreeBuilder): The parsed document.
+
+    Returns:
+        tuple[str | None, Node | None]: The author without any leading "By", and
+            the element naming them, if the byline came from the page's body.
+    """
+    author = builder.meta.get("author") or builder.meta.get("article:author")
+    byline = None
+    for node in walk(builder.root):
+        if node.attrs.get("rel") == "author" or (
+            node.tag != "body" and BYLINE_NAMES.search(node.names())
+        ):
+            text = " ".join(node.text().split())
+            if 0 < len(text) <= 100:
+                byline = node
+                author = author or text
+                break
+    if author and not author.startswith("http"):
+        return BY_PREFIX.sub("", author.strip()), byline
+    return None, byline
+
+
+def find_title(builder: TreeBuilder) -> str:
+    title = builder.meta.get("og:title")
+    if title:
+        return title.strip()
+    for node in walk(builder.root):
+        if node.tag == "h1":
+            text = " ".join(node.text().split())
+            if text:
+                return text
+    return " ".join(builder.title.split())
+
+
+def extract_article(content: bytes, url: str) -> Article | None:
+    """
+    Pull the title, byline, body and images of an article out of a full page.
+
+    Navigation, comments, sharing buttons, ads and related-article carousels
+    are left behind, recognised by their tags and class names.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from.
+
+    Returns:
+        Article | None: The article, or None if the page does not look like one,
+            in which case the full page should be rendered instead.
+    """
+    builder = TreeBuilder()
+    builder.feed(content.decode("utf-8", errors="replace"))
+    builder.close()
+
+    container = score_candidates(builder.root)
+    if container is None:
+        return None
+    if len(" ".join(container.text().split())) < MIN_ARTICLE_CHARS:
+        return None
+    byline, byline_node = find_byline(builder)
+    left_out = {id(byline_node)} if byline_node else set()
+    body = serialize(container, url, left_out).strip()
+
+    lead_image = builder.meta.get("og:image")
+    if lead_image:
+        lead_image = urljoin(url, lead_image)
+        if html.escape(lead_image) in body:
+            lead_image = None
+    return Article(url, find_title(builder), byline, body, lead_image)
+
+
+def render_article(article: Article) -> bytes:
+    """
+    Lay an article out with the minimal print template.
+
+    Args:
+        article (Article): The article.
+
+    Returns:
+        bytes: The HTML document to render.
+    """
+    meta = [f"By {html.escape(article.byline)}"] if article.byline else []
+    meta.append(html.escape(article.url))
+    lead = (
+        f'<figure><img src="{html.escape(article.lead_image)}" alt=""></figure>\n'
+        if article.lead_image
+        else ""
+    )
+    return PRINT_TEMPLATE.format(
+        url=html.escape(article.url),
+        title=html.escape(article.title),
+        meta=" &middot; ".join(meta),
+        lead=lead,
+        body=article.body,
+    ).encode()
@@ -0,0 +1,316 @@
+import logging
+import os
+
+from web_snatcher.blocklist import Blocklist
+from web_snatcher.defaults import DEFAULT_TIMEOUT
+from web_snatcher.engine import WKHTMLTOPDF_OPTIONS, ResourceLimits, Runner
+from web_snatcher.fetch import create_client
+from web_snatcher.http_cache import HttpCache, default_cache_dir
+from web_snatcher.pdf_cache import PdfCache
+from web_snatcher.persistent import PersistentPool
+from web_snatcher.profiles import ProfilePolicy, load_profiles
+from web_snatcher.proxy import AssetProxy
+from web_snatcher.ratelimit import DomainLimiter
+from web_snatcher.readiness import (
+    ReadinessPolicy,
+    parse_domain_overrides,
+    parse_readiness,
+)
+from web_snatcher.retry import CircuitBreaker, RetryPolicy
+from web_snatcher.seen import SeenIndex
+from web_snatcher.snatcher import Snatcher
+
+logger = logging.getLogger(__name__)
+
+
+def build_limits(
+    timeout: float, memory_limit: int | None, cpu_limit: int | None
+) -> ResourceLimits:
+    """
+    Build the per-job resource limits from the CLI options.
+
+    Args:
+        timeout (float): Wall-clock timeout in seconds, or 0 for no timeout.
+        memory_limit (int | None): Memory limit in MiB, or None for no limit.
+        cpu_limit (int | None): CPU-time limit in seconds, or None for no limit.
+
+    Returns:
+        ResourceLimits: The limits to apply to each wkhtmltopdf process.
+    """
+    return ResourceLimits(
+        timeout=timeout or None,
+        memory_bytes=memory_limit * 1024 * 1024 if memory_limit else None,
+        cpu_seconds=cpu_limit or None,
+    )
+
+
+def open_http_cache(enabled: bool, cache_dir: str | None) -> HttpCache | None:
+    """
+    Open the on-disk HTTP response cache if it is enabled.
+
+    Args:
+        enabled (bool): Whether the cache should be used.
+        cache_dir (str | None): The base cache directory
+            (default: the XDG cache directory).
+
+    Returns:
+        HttpCache | None: The cache, or None if it is disabled.
+    """
+    if not enabled:
+        return None
+    return HttpCache(os.path.join(cache_dir or default_cache_dir(), "http"))
+
+
+def open_pdf_cache(enabled: bool, cache_dir: str | None) -> PdfCache | None:
+    """
+    Open the content-addressed PDF cache if it is enabled.
+
+    Args:
+        enabled (bool): Whether the cache should be used.
+        cache_dir (str | None): The base cache directory
+            (default: the XDG cache directory).
+
+    Returns:
+        PdfCache | None: The cache, or None if it is disabled.
+    """
+    if not enabled:
+        return None
+    return PdfCache(os.path.join(cache_dir or default_cache_dir(), "pdf"))
+
+
+def build_readiness(
+    spec: str | None, domain_specs: list[str] | None
+) -> ReadinessPolicy:
+    """
+    Build the readiness policy from the CLI options.
+
+    Args:
+        spec (str | None): The default readiness mode, as MODE[:MILLISECONDS], or
+            None to leave it to each page's render profile.
+        domain_specs (list[str] | None): Per-domain overrides, as
+            DOMAIN=MODE[:MILLISECONDS].
+
+    Returns:
+        ReadinessPolicy: The policy deciding how long each page is waited on.
+
+    Raises:
+        ValueError: If a spec is malformed.
+    """
+    return ReadinessPolicy(
+        parse_readiness(spec) if spec else None,
+        parse_domain_overrides(domain_specs or []),
+    )
+
+
+def load_blocklist(enabled: bool, path: str | None) -> Blocklist | None:
+    """
+    Load the blocklist if blocking is enabled.
+
+    Args:
+        enabled (bool): Whether to block the built-in list of ad, analytics and
+            social widget hosts.
+        path (str | None): A file of extra hosts and URL patterns, one per line.
+            Giving one enables blocking.
+
+    Returns:
+        Blocklist | None: The blocklist, or None if blocking is disabled.
+
+    Raises:
+        ValueError: If the file can't be read.
+    """
+    if not enabled and not path:
+        return None
+    if not path:
+        return Blocklist.from_lines([])
+    try:
+        with open(path) as f:
+            return Blocklist.from_lines(f.read().splitlines())
+    except OSError as e:
+        raise ValueError(f"Could not read blocklist: {e}")
+
+
+def open_asset_proxy(
+    enabled: bool,
+    http_cache: bool,
+    cache_dir: str | None,
+    concurrency: int,
+    blocklist: Blocklist | None = None,
+) -> AssetProxy | None:
+    """
+    Create the caching asset proxy if it is enabled.
+
+    Args:
+        enabled (bool): Whether wkhtmltopdf should fetch assets through the proxy.
+        http_cache (bool): Whether assets are also kept on disk between runs, rather
+            than only in memory.
+        cache_dir (str | None): The base cache directory
+            (default: the XDG cache directory).
+        concurrency (int): The number of wkhtmltopdf processes that will share it.
+        blocklist (Blocklist | None): Hosts and URL patterns the proxy refuses to
+            fetch (default: None).
+
+    Returns:
+        AssetProxy | None: The proxy, or None if it is disabled. It starts
+            listening with the first job.
+    """
+    if not enabled:
+        return None
+    cache = (
+        HttpCache(os.path.join(cache_dir or default_cache_dir(), "assets"))
+        if http_cache
+        else None
+    )
+    return AssetProxy(cache, max_connections=concurrency * 4, blocklist=blocklist)
+
+
+def build_snatcher(
+    concurrency: int = 1,
+    persistent: bool = False,
+    prefetch: bool = True,
+    http_cache: HttpCache | None = None,
+    pdf_cache: PdfCache | None = None,
+    limits: ResourceLimits | None = None,
+    readiness: ReadinessPolicy | None = None,
+    limiter: DomainLimiter | None = None,
+    retry: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    seen: SeenIndex | None = None,
+    proxy: AssetProxy | None = None,
+    extract: bool = False,
+    blocklist: Blocklist | None = None,
+    profiles: ProfilePolicy | None = None,
+) -> Snatcher:
+    """
+    Build the Snatcher shared by every conversion in a run.
+
+    Args:
+        concurrency (int): The maximum number of wkhtmltopdf processes to run at once.
+        persistent (bool): Feed jobs to long-lived wkhtmltopdf processes instead of
+            starting one per page (default: False).
+        prefetch (bool): Fetch pages through one shared, pooled HTTP client and pipe
+            them into wkhtmltopdf (default: True). Persistent processes read their
+            arguments from stdin, so pages are never pre-fetched in that mode.
+        http_cache (HttpCache | None): The on-disk response cache used by the
+            pre-fetch (default: None).
+        pdf_cache (PdfCache | None): The store of rendered PDFs, used to skip
+            rendering pre-fetched pages that have not changed (default: None).
+        limits (ResourceLimits | None): The timeout and resource limits applied to
+            every wkhtmltopdf process (default: None).
+        readiness (ReadinessPolicy | None): How long wkhtmltopdf waits before
+            printing each page (default: adaptive).
+        limiter (DomainLimiter | None): Per-domain rate limits (default: no limits).
+        retry (RetryPolicy | None): How transient failures are retried
+            (default: 3 attempts).
+        breaker (CircuitBreaker | None): The per-domain circuit breaker
+            (default: opens after 5 consecutive failures).
+        seen (SeenIndex | None): The index of pages already archived (default: None).
+        proxy (AssetProxy | None): The caching proxy wkhtmltopdf fetches assets
+            through (default: None).
+        extract (bool): Render the article extracted from each pre-fetched page
+            with a print template instead of the full page (default: False).
+        blocklist (Blocklist | None): Hosts and URL patterns stripped from
+            pre-fetched pages (default: None).
+        profiles (ProfilePolicy | None): The render profile for each page
+            (default: the built-in default profile).
+
+    Returns:
+        Snatcher: The Snatcher. The caller is responsible for closing it.
+    """
+    pool = (
+        PersistentPool(concurrency, WKHTMLTOPDF_OPTIONS, limits) if persistent else None
+    )
+    client = (
+        create_client(max_connections=concurrency * 2)
+        if prefetch and not pool
+        else None
+    )
+    if extract and client is None:
+        logger.warning(
+            "Article extraction needs the pre-fetch, rendering full pages instead"
+        )
+    return Snatcher(
+        render=Runner(concurrency, limits).convert,
+        client=client,
+        http_cache=http_cache,
+        pdf_cache=pdf_cache,
+        readiness=readiness,
+        pool=pool,
+        limiter=limiter,
+        retry=retry,
+        breaker=breaker,
+        seen=seen,
+        proxy=proxy,
+        extract=extract,
+        blocklist=blocklist,
+        profiles=profiles,
+    )
+
+
+def conversion_settings(values: dict) -> dict:
+    """
+    Turn the values of the conversion options into the settings a Snatcher is built
+    from.
+
+    Args:
+        values (dict): The option values, keyed by CLI parameter name.
+
+    Returns:
+        dict: The settings, as read by snatcher_from_settings and stored in a
+            batch's state file.
+    """
+    settings = dict(values)
+    if settings.pop("disable_javascript", False):
+        settings["readiness"] = "static"
+    return settings
+
+
+def snatcher_from_settings(settings: dict) -> Snatcher:
+    """
+    Build a Snatcher from the conversion options of a batch, as saved in its job store.
+
+    Args:
+        settings (dict): The batch's conversion options, keyed by CLI parameter name.
+
+    Returns:
+        Snatcher: The Snatcher. The caller is responsible for closing it.
+
+    Raises:
+        ValueError: If a readiness spec is malformed, the blocklist can't be read,
+            or the render profiles are invalid.
+    """
+    cache_dir = settings.get("cache_dir")
+    blocklist = load_blocklist(settings.get("block", False), settings.get("blocklist"))
+    return build_snatcher(
+        settings.get("concurrency", 1),
+        settings.get("persistent", False),
+        settings.get("prefetch", True),
+        open_http_cache(settings.get("http_cache", True), cache_dir),
+        open_pdf_cache(settings.get("pdf_cache", True), cache_dir),
+        build_limits(
+            settings.get("timeout", DEFAULT_TIMEOUT),
+            settings.get("memory_limit"),
+            settings.get("cpu_limit"),
+        ),
+        build_readiness(
+            settings.get("readiness"),
+            settings.get("domain_readiness"),
+        ),
+        DomainLimiter(
+            settings.get("rate"), settings.get("burst"), settings.get("max_per_domain")
+        ),
+        RetryPolicy(attempts=settings.get("retries", 2) + 1),
+        CircuitBreaker(
+            settings.get("breaker_threshold", 5), settings.get("breaker_cooldown", 30.0)
+        ),
+        SeenIndex(settings["seen"]) if settings.get("seen") else None,
+        open_asset_proxy(
+            settings.get("asset_proxy", False),
+            settings.get("http_cache", True),
+            cache_dir,
+            settings.get("concurrency", 1),
+            blocklist,
+        ),
+        settings.get("extract", False),
+        blocklist,
+        load_profiles(settings.get("profiles"), settings.get("profile")),
+    )
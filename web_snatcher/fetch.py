@@ -0,0 +1,227 @@
+import html
+import importlib.util
+import logging
+import re
+import time
+from dataclasses import dataclass
+from urllib.parse import urljoin
+
+import httpx
+
+from web_snatcher.http_cache import HttpCache
+from web_snatcher.metrics import DOWNLOADED_BYTES, FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "web-snatcher/0.1.0"
+
+# Matches the opening <head> tag so a <base> element can be inserted after it
+HEAD_PATTERN = re.compile(rb"<head(\s[^>]*)?>", re.IGNORECASE)
+BASE_PATTERN = re.compile(rb"<base\s", re.IGNORECASE)
+
+# <link> tags and their attributes, for finding rel="canonical"
+LINK_PATTERN = re.compile(rb"<link\s[^>]*>", re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(
+    rb"""([a-z-]+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE
+)
+# A srcset candidate's URL runs up to whitespace and may contain commas; its
+# descriptor runs up to the next comma outside parentheses
+SRCSET_URL_PATTERN = re.compile(rb"[\s,]*([^\s,]\S*)")
+SRCSET_DESCRIPTOR_PATTERN = re.compile(rb"(?:[^,(]|\([^)]*\)?)*")
+# Canonical links belong in <head>; only this much of a document is searched
+CANONICAL_SEARCH_BYTES = 64 * 1024
+
+
+@dataclass
+class FetchedPage:
+    """
+    A document fetched ahead of rendering.
+
+    Attributes:
+        url (str): The final URL of the document, after redirects.
+        content (bytes): The raw response body.
+        content_type (str): The Content-Type header of the response.
+    """
+
+    url: str
+    content: bytes
+    content_type: str = ""
+
+
+def http2_available() -> bool:
+    """
+    Check whether the optional h2 package needed for HTTP/2 is installed.
+
+    Returns:
+        bool: True if httpx can negotiate HTTP/2, False otherwise.
+    """
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_client(max_connections: int = 20) -> httpx.AsyncClient:
+    """
+    Create a shared HTTP client with connection pooling and keep-alive.
+
+    HTTP/2 is enabled when the h2 package is installed, and httpx advertises
+    brotli support on its own when the brotli package is installed.
+
+    Args:
+        max_connections (int): The maximum number of open connections (default: 20).
+
+    Returns:
+        httpx.AsyncClient: The client. The caller is responsible for closing it.
+    """
+    http2 = http2_available()
+    if not http2:
+        logger.debug("h2 is not installed, falling back to HTTP/1.1")
+
+    return httpx.AsyncClient(
+        http2=http2,
+        follow_redirects=True,
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0,
+        ),
+        headers={"User-Agent": USER_AGENT},
+    )
+
+
+def inject_base(content: bytes, url: str) -> bytes:
+    """
+    Add a <base> element so relative links still resolve when rendering from stdin.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from.
+
+    Returns:
+        bytes: The document with a <base> element, or unchanged if it already has one.
+    """
+    if BASE_PATTERN.search(content):
+        return content
+
+    base = f'<base href="{html.escape(url, quote=True)}">'.encode()
+    match = HEAD_PATTERN.search(content)
+    if match:
+        return content[: match.end()] + base + content[match.end() :]
+    return base + content
+
+
+def parse_attributes(tag: bytes) -> dict[bytes, bytes]:
+    """
+    Read the attributes of a tag, whether their values are double-quoted,
+    single-quoted or bare.
+
+    Args:
+        tag (bytes): The tag, e.g. b'<img src="a.jpg" alt="">'.
+
+    Returns:
+        dict[bytes, bytes]: The attribute values keyed by lowercased name.
+    """
+    return {
+        match.group(1).lower(): match.group(match.lastindex)
+        for match in ATTRIBUTE_PATTERN.finditer(tag)
+    }
+
+
+def parse_srcset(srcset: bytes) -> list[tuple[bytes, bytes]]:
+    """
+    Split a srcset into its candidates the way browsers do, so URLs containing
+    commas (as image CDNs' often do) are kept whole.
+
+    Args:
+        srcset (bytes): The srcset, e.g. b"small.jpg 400w, large.jpg 1200w".
+
+    Returns:
+        list[tuple[bytes, bytes]]: The URL and descriptor (b"" if there is none)
+            of each candidate, in order.
+    """
+    candidates = []
+    position = 0
+    while match := SRCSET_URL_PATTERN.match(srcset, position):
+        url = match.group(1)
+        position = match.end()
+        if url.endswith(b","):
+            candidates.append((url.rstrip(b","), b""))
+            continue
+        match = SRCSET_DESCRIPTOR_PATTERN.match(srcset, position)
+        candidates.append((url, match.group().strip()))
+        position = match.end()
+    return candidates
+
+
+def find_canonical(content: bytes, url: str) -> str | None:
+    """
+    Find the URL a document declares as its canonical address with <link
+    rel="canonical">.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from, to resolve a relative link.
+
+    Returns:
+        str | None: The absolute canonical URL, or None if the document has none.
+    """
+    for tag in LINK_PATTERN.finditer(content, 0, CANONICAL_SEARCH_BYTES):
+        attributes = parse_attributes(tag.group())
+        rel = attributes.get(b"rel", b"").lower().split()
+        href = attributes.get(b"href", b"").strip()
+        if b"canonical" in rel and href:
+            return urljoin(url, html.unescape(href.decode(errors="replace")))
+    return None
+
+
+async def fetch_page(
+    client: httpx.AsyncClient, url: str, cache: HttpCache | None = None
+) -> FetchedPage:
+    """
+    Fetch a document with the shared client.
+
+    When a cache is given and already holds the URL, the request is made
+    conditional so an unchanged page costs a 304 and no download.
+
+    Args:
+        client (httpx.AsyncClient): The shared HTTP client.
+        url (str): The URL to fetch.
+        cache (HttpCache | None): The on-disk response cache (default: None).
+
+    Returns:
+        FetchedPage: The fetched document.
+
+    Raises:
+        httpx.HTTPError: If the request fails or returns an error status.
+    """
+    entry = cache.get(url) if cache else None
+    headers = entry.conditional_headers() if entry else {}
+
+    logger.debug(f"Fetching {url}")
+    started = time.monotonic()
+    try:
+        response = await client.get(url, headers=headers)
+    finally:
+        FETCH_SECONDS.observe(time.monotonic() - started)
+
+    if entry and response.status_code == httpx.codes.NOT_MODIFIED:
+        logger.debug(f"Not modified, using cached copy of {url}")
+        cache.refresh(entry, response.headers)
+        return FetchedPage(
+            url=entry.final_url,
+            content=cache.read_body(entry),
+            content_type=entry.content_type,
+        )
+
+    response.raise_for_status()
+    DOWNLOADED_BYTES.inc(len(response.content))
+    if cache:
+        cache.put(url, str(response.url), response.headers, response.content)
+    logger.debug(
+        f"Fetched {response.url} ({response.http_version}, "
+        f"{len(response.content)} bytes)"
+    )
+    return FetchedPage(
+        url=str(response.url),
+        content=response.content,
+        content_type=response.headers.get("Content-Type", ""),
+    )
@@ -0,0 +1,322 @@
+import logging
+import zlib
+from dataclasses import dataclass, field
+from typing import Callable
+from urllib.parse import urljoin, urlparse
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import httpx
+
+from web_snatcher.jobstore import JobStore
+from web_snatcher.seen import SeenIndex
+from web_snatcher.urls import canonicalize_url, validate_url
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Elements holding a single entry: an RSS item, an Atom entry, a sitemap
+# <url>, or a <sitemap> in a sitemap index
+RECORDS = {"item", "entry", "url", "sitemap"}
+
+# Sitemap indexes can nest; stop following them past this depth
+MAX_SITEMAP_DEPTH = 3
+
+
+def local_name(tag: str) -> str:
+    """
+    Strip the namespace from an ElementTree tag.
+
+    Args:
+        tag (str): The tag, e.g. "{http://www.w3.org/2005/Atom}entry".
+
+    Returns:
+        str: The tag without its namespace, e.g. "entry".
+    """
+    return tag.rpartition("}")[2]
+
+
+class FeedParser:
+    """
+    An incremental parser for RSS, Atom, sitemap and sitemap index documents.
+
+    Data is fed in as it downloads, and each entry is discarded as soon as its
+    link has been read, so memory stays bounded however large the document is.
+    Gzipped sitemaps are decompressed on the fly.
+    """
+
+    def __init__(self, base_url: str):
+        """
+        Args:
+            base_url (str): The URL of the document, used to resolve relative links.
+        """
+        self.base_url = base_url
+        self.sitemaps: list[str] = []
+        self._parser = XMLPullParser(events=("start", "end"))
+        self._stack: list = []
+        self._link: str | None = None
+        self._decompressor = None
+        self._started = False
+
+    def feed(self, data: bytes) -> list[str]:
+        """
+        Parse the next chunk of the document.
+
+        Args:
+            data (bytes): The chunk.
+
+        Returns:
+            list[str]: The page links completed by this chunk.
+
+        Raises:
+            xml.etree.ElementTree.ParseError: If the document is not well-formed XML.
+        """
+        if not self._started:
+            self._started = True
+            if data.startswith(GZIP_MAGIC):
+                self._decompressor = zlib.decompressobj(wbits=31)
+        if self._decompressor:
+            data = self._decompressor.decompress(data)
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self) -> list[str]:
+        """
+        Finish parsing.
+
+        Returns:
+            list[str]: Any page links completed by the end of the document.
+
+        Raises:
+            xml.etree.ElementTree.ParseError: If the document is truncated.
+        """
+        if self._decompressor:
+            self._parser.feed(self._decompressor.flush())
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self) -> list[str]:
+        pages = []
+        for event, element in self._parser.read_events():
+            if event == "start":
+                self._stack.append(element)
+                continue
+
+            self._stack.pop()
+            name = local_name(element.tag)
+            parent = local_name(self._stack[-1].tag) if self._stack else None
+            if parent in RECORDS and self._link is None:
+                self._link = self._link_from(name, parent, element)
+            if name in RECORDS:
+                if self._link:
+                    if name == "sitemap":
+                        self.sitemaps.append(self._link)
+                    else:
+                        pages.append(self._link)
+                self._link = None
+                # Drop the finished entry so the tree never grows
+                element.clear()
+                if self._stack:
+                    self._stack[-1].remove(element)
+        return pages
+
+    def _link_from(self, name: str, parent: str, element) -> str | None:
+        if name == "loc" and parent in ("url", "sitemap"):
+            link = element.text
+        elif name == "link" and parent == "item":
+            link = element.text
+        elif name == "link" and parent == "entry":
+            if element.get("rel", "alternate") != "alternate":
+                return None
+            link = element.get("href")
+        elif name == "guid" and parent == "item":
+            if element.get("isPermaLink", "true") != "true":
+                return None
+            link = element.text
+        else:
+            return None
+
+        if not link or not link.strip():
+            return None
+        try:
+            link = urljoin(self.base_url, link.strip())
+        except ValueError:
+            return None
+        if not validate_url(link) or urlparse(link).scheme not in ("http", "https"):
+            return None
+        return link
+
+
+@dataclass
+class FeedResult:
+    """
+    The links read from a feed or sitemap.
+
+    Attributes:
+        url (str): The feed's URL.
+        pages (list[str]): The page links it lists.
+        sitemaps (list[str]): Further sitemaps it lists, if it is a sitemap index.
+        validators (dict): The ETag and Last-Modified headers to revalidate it with.
+        not_modified (bool): True if the feed was unchanged since it was last read,
+            in which case `pages` is empty.
+    """
+
+    url: str
+    pages: list[str] = field(default_factory=list)
+    sitemaps: list[str] = field(default_factory=list)
+    validators: dict = field(default_factory=dict)
+    not_modified: bool = False
+
+
+async def read_feed(
+    client: httpx.AsyncClient, url: str, validators: dict | None = None
+) -> FeedResult:
+    """
+    Download and parse a feed or sitemap, streaming it through the parser.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        url (str): The feed's URL.
+        validators (dict | None): The validators saved from the last read, used to
+            make the request conditional (default: None).
+
+    Returns:
+        FeedResult: The links in the feed.
+
+    Raises:
+        httpx.HTTPError: If the request fails or returns an error status.
+        xml.etree.ElementTree.ParseError: If the feed is not well-formed XML.
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    logger.debug(f"Reading feed {url}")
+    async with client.stream("GET", url, headers=headers) as response:
+        if headers and response.status_code == httpx.codes.NOT_MODIFIED:
+            logger.debug(f"Feed not modified: {url}")
+            return FeedResult(url, validators=validators, not_modified=True)
+        response.raise_for_status()
+
+        result = FeedResult(
+            url,
+            validators={
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+            },
+        )
+        parser = FeedParser(str(response.url))
+        async for chunk in response.aiter_bytes():
+            result.pages.extend(parser.feed(chunk))
+        result.pages.extend(parser.close())
+        result.sitemaps = parser.sitemaps
+    return result
+
+
+@dataclass
+class HarvestReport:
+    """
+    What a harvest found.
+
+    Attributes:
+        feeds (int): Feeds and sitemaps read, including unchanged ones.
+        unchanged (int): Feeds that answered 304 Not Modified.
+        links (int): Page links seen in changed feeds.
+        queued (int): Links that had not been archived before and were queued.
+        errors (list[str]): A description of each feed that could not be read.
+    """
+
+    feeds: int = 0
+    unchanged: int = 0
+    links: int = 0
+    queued: int = 0
+    errors: list[str] = field(default_factory=list)
+
+
+async def harvest_feeds(
+    client: httpx.AsyncClient,
+    feeds: list[str],
+    store: JobStore,
+    enqueue: Callable[[list[str]], None],
+    seen: SeenIndex | None = None,
+) -> HarvestReport:
+    """
+    Read feeds and sitemaps and queue every page that is not in the job store yet.
+
+    Each feed's validators are saved in the store so the next harvest makes
+    conditional requests, and an unchanged feed costs a single 304. Sitemap
+    indexes are followed, and the sitemaps they list are remembered so they
+    are still checked when the index itself is unchanged.
+
+    Args:
+        client (httpx.AsyncClient): The HTTP client.
+        feeds (list[str]): The URLs of the feeds and sitemaps.
+        store (JobStore): The job store recording every URL ever queued.
+        enqueue (Callable[[list[str]], None]): Adds new pages to the store.
+        seen (SeenIndex | None): The index of pages already archived, which also
+            catches pages listed under a different spelling of their URL
+                (default: None).
+
+    Returns:
+        HarvestReport: What was found.
+    """
+    report = HarvestReport()
+    pending = [(url, 0) for url in feeds]
+    visited = set()
+    listed = set()
+    while pending:
+        url, depth = pending.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+        report.feeds += 1
+        if not validate_url(url):
+            report.errors.append(f"{url}: Invalid URL")
+            continue
+
+        key = f"feed:{url}"
+        saved = store.get_meta(key, {})
+        try:
+            result = await read_feed(client, url, saved)
+        except (httpx.HTTPError, ParseError) as e:
+            logger.warning(f"Could not read feed {url}: {e}")
+            report.errors.append(f"{url}: {e}")
+            continue
+
+        if result.not_modified:
+            report.unchanged += 1
+            sitemaps = saved.get("sitemaps", [])
+        else:
+            sitemaps = result.sitemaps
+            report.links += len(result.pages)
+            links = []
+            for link in result.pages:
+                try:
+                    canonical = canonicalize_url(link)
+                except ValueError:
+                    logger.warning(f"Skipping invalid link {link!r} in {url}")
+                    continue
+                if canonical not in listed:
+                    listed.add(canonical)
+                    links.append(link)
+            known = store.known(links)
+            new = [
+                link
+                for link in links
+                if link not in known and not (seen and link in seen)
+            ]
+            if new:
+                enqueue(new)
+                report.queued += len(new)
+            # Saved only after the new pages are stored, so an interrupted
+            # harvest reads the feed in full again rather than losing them
+            store.set_meta(key, {**result.validators, "sitemaps": sitemaps})
+
+        if depth < MAX_SITEMAP_DEPTH:
+            pending.extend((sitemap, depth + 1) for sitemap in sitemaps)
+        elif sitemaps:
+            logger.warning(f"Not following sitemaps nested deeper than {url}")
+    return report
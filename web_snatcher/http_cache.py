@@ -0,0 +1,316 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+
+from web_snatcher.urls import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Default size budget for the on-disk response cache
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+META_SUFFIX = ".json"
+BODY_SUFFIX = ".body"
+
+
+def default_cache_dir() -> str:
+    """
+    Get the base cache directory, honouring XDG_CACHE_HOME.
+
+    Returns:
+        str: The path to the web-snatcher cache directory.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "web-snatcher")
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Write a file so readers never see it half-written.
+
+    Args:
+        path (str): The destination path.
+        data (bytes): The file contents.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@dataclass
+class CacheEntry:
+    """
+    The stored metadata for a cached response.
+
+    Attributes:
+        key (str): The cache key, derived from the normalized URL.
+        url (str): The normalized URL the entry was stored under.
+        final_url (str): The URL the response came from, after redirects.
+        content_type (str): The Content-Type of the response.
+        etag (str | None): The ETag validator, if the server sent one.
+        last_modified (str | None): The Last-Modified validator, if the server sent one.
+        stored_at (float): When the entry was stored or last revalidated.
+        size (int): The size of the body in bytes.
+        max_age (float | None): How long after `stored_at` the entry may be used
+            without revalidating it, in seconds, or None to always revalidate.
+        headers (dict[str, str]): Other response headers to replay with the body.
+    """
+
+    key: str
+    url: str
+    final_url: str
+    content_type: str = ""
+    etag: str | None = None
+    last_modified: str | None = None
+    stored_at: float = field(default_factory=time.time)
+    size: int = 0
+    max_age: float | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+
+    def is_fresh(self) -> bool:
+        """
+        Check whether the entry can still be used without revalidating it.
+
+        Returns:
+            bool: True if the entry is within its max age.
+        """
+        return self.max_age is not None and time.time() - self.stored_at < self.max_age
+
+    def conditional_headers(self) -> dict[str, str]:
+        """
+        Build the request headers used to revalidate this entry.
+
+        Returns:
+            dict[str, str]: If-None-Match and/or If-Modified-Since headers.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    A disk-backed HTTP response cache with a size budget and LRU eviction.
+
+    Each entry is a JSON metadata file plus a body file, named after a hash of
+    the normalized URL. Recency is tracked through the metadata file's mtime,
+    so it survives restarts without a separate index.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): The directory to store entries in. Created if missing.
+            max_bytes (int): The total body size to keep before evicting
+                (default: 512 MiB).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._sizes: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self.total_bytes = 0
+        self._load_index()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _load_index(self) -> None:
+        for name in os.listdir(self.directory):
+            if not name.endswith(META_SUFFIX):
+                continue
+            key = name[: -len(META_SUFFIX)]
+            try:
+                self._last_used[key] = os.path.getmtime(self._path(key, META_SUFFIX))
+                self._set_size(key, os.path.getsize(self._path(key, BODY_SUFFIX)))
+            except OSError:
+                self._remove(key)
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        """
+        Get the cache key for a URL.
+
+        Args:
+            url (str): The URL, normalized before hashing.
+
+        Returns:
+            str: The hex digest used to name the entry's files.
+        """
+        return hashlib.sha256(normalize_url(url).encode()).hexdigest()
+
+    def get(self, url: str) -> CacheEntry | None:
+        """
+        Look up the entry for a URL, marking it as recently used.
+
+        Args:
+            url (str): The URL to look up.
+
+        Returns:
+            CacheEntry | None: The entry, or None if the URL is not cached.
+        """
+        key = self.key_for(url)
+        if key not in self._sizes:
+            return None
+        try:
+            with open(self._path(key, META_SUFFIX), encoding="utf-8") as f:
+                entry = CacheEntry(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Dropping unreadable cache entry for {url}: {e}")
+            self._remove(key)
+            return None
+        self._touch(key)
+        return entry
+
+    def read_body(self, entry: CacheEntry) -> bytes:
+        """
+        Read the stored body of an entry.
+
+        Args:
+            entry (CacheEntry): The entry to read.
+
+        Returns:
+            bytes: The response body.
+        """
+        with open(self._path(entry.key, BODY_SUFFIX), "rb") as f:
+            return f.read()
+
+    def body_path(self, entry: CacheEntry) -> str:
+        """
+        Get the path of an entry's body file, for callers that stream it from disk.
+
+        Args:
+            entry (CacheEntry): The entry.
+
+        Returns:
+            str: The path to the body file.
+        """
+        return self._path(entry.key, BODY_SUFFIX)
+
+    def put(
+        self,
+        url: str,
+        final_url: str,
+        headers: dict[str, str],
+        content: bytes,
+        max_age: float | None = None,
+        extra_headers: dict[str, str] | None = None,
+    ) -> CacheEntry | None:
+        """
+        Store a response, evicting the least recently used entries if over budget.
+
+        Responses with neither a max age nor an ETag or Last-Modified validator,
+        marked Cache-Control: no-store, or larger than the whole budget are not
+        stored, since they could never be reused or kept.
+
+        Args:
+            url (str): The URL that was requested.
+            final_url (str): The URL the response came from, after redirects.
+            headers (dict[str, str]): The response headers (case-insensitive mapping).
+            content (bytes): The response body.
+            max_age (float | None): How long the response may be reused without
+                revalidating it, in seconds (default: always revalidate).
+            extra_headers (dict[str, str] | None): Other response headers to keep
+                with the entry (default: None).
+
+        Returns:
+            CacheEntry | None: The stored entry, or None if the response was not
+                cacheable.
+        """
+        if (
+            max_age is None
+            and not headers.get("ETag")
+            and not headers.get("Last-Modified")
+        ):
+            return None
+        if "no-store" in headers.get("Cache-Control", "").lower():
+            return None
+        if len(content) > self.max_bytes:
+            return None
+
+        key = self.key_for(url)
+        entry = CacheEntry(
+            key=key,
+            url=normalize_url(url),
+            final_url=final_url,
+            content_type=headers.get("Content-Type", ""),
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            size=len(content),
+            max_age=max_age,
+            headers=extra_headers or {},
+        )
+        write_atomic(self._path(key, BODY_SUFFIX), content)
+        self._write_meta(entry)
+        self._set_size(key, entry.size)
+        self._last_used[key] = time.time()
+        self._evict()
+        return entry
+
+    def refresh(
+        self, entry: CacheEntry, headers: dict[str, str], max_age: float | None = None
+    ) -> None:
+        """
+        Update an entry after a 304 Not Modified, keeping any new validators.
+
+        Args:
+            entry (CacheEntry): The entry that was revalidated.
+            headers (dict[str, str]): The headers of the 304 response.
+            max_age (float | None): The entry's new max age, in seconds
+                (default: always revalidate).
+        """
+        entry.etag = headers.get("ETag") or entry.etag
+        entry.last_modified = headers.get("Last-Modified") or entry.last_modified
+        entry.stored_at = time.time()
+        entry.max_age = max_age
+        self._write_meta(entry)
+        self._last_used[entry.key] = entry.stored_at
+
+    def _write_meta(self, entry: CacheEntry) -> None:
+        write_atomic(
+            self._path(entry.key, META_SUFFIX), json.dumps(asdict(entry)).encode()
+        )
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        self._last_used[key] = now
+        try:
+            os.utime(self._path(key, META_SUFFIX), (now, now))
+        except OSError:
+            pass
+
+    def _set_size(self, key: str, size: int) -> None:
+        self.total_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self._sizes.pop(key, 0)
+        self._last_used.pop(key, None)
+        for suffix in (META_SUFFIX, BODY_SUFFIX):
+            try:
+                os.unlink(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._last_used, key=self._last_used.get):
+            if self.total_bytes <= self.max_bytes:
+                break
+            logger.debug(f"Evicting cache entry {key}")
+            self._remove(key)
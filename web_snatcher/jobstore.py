@@ -0,0 +1,308 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+
+from web_snatcher.urls import page_key
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    canonical TEXT,
+    output TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+@dataclass
+class StoredJob:
+    """
+    A conversion job, as recorded in the job store.
+
+    Attributes:
+        id (int | None): The job's row id, or None if the job is not stored.
+        url (str): The URL to convert.
+        output (str): The path the PDF is written to.
+        state (str): One of "pending", "running", "done" or "failed".
+        attempts (int): How many times the job has been started.
+    """
+
+    id: int | None
+    url: str
+    output: str
+    state: str = PENDING
+    attempts: int = 0
+
+
+class JobStore:
+    """
+    A durable SQLite record of the jobs in a batch, so an interrupted batch can be
+    resumed.
+
+    State changes are buffered and written in batched transactions, either
+    every `flush_every` updates or `flush_interval` seconds after the first
+    buffered update, so the bookkeeping stays cheap at high job rates. The
+    interval is kept by a timer on the running event loop; without one, it is
+    checked as updates are queued. After a crash, at most the last unflushed
+    updates are lost, and those jobs are simply run again.
+    """
+
+    def __init__(self, path: str, flush_every: int = 100, flush_interval: float = 1.0):
+        """
+        Args:
+            path (str): The SQLite database file. Created if missing.
+            flush_every (int): Flush after this many buffered updates (default: 100).
+            flush_interval (float): Flush when the oldest buffered update is this
+                many seconds old (default: 1.0).
+        """
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._add_canonical_column()
+        self._pending: list[tuple[str, tuple]] = []
+        self._last_flush = time.monotonic()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _add_canonical_column(self) -> None:
+        # Stores created before jobs were matched by page lack the column
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")]
+        with self._conn:
+            if "canonical" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN canonical TEXT")
+                rows = self._conn.execute("SELECT id, url FROM jobs").fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET canonical = ? WHERE id = ?",
+                    [(page_key(url), id) for id, url in rows],
+                )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_canonical ON jobs (canonical)"
+            )
+
+    def add(self, urls: list[str], outputs: list[str]) -> list[StoredJob]:
+        """
+        Record new pending jobs.
+
+        Args:
+            urls (list[str]): The URLs to convert.
+            outputs (list[str]): The output path for each URL.
+
+        Returns:
+            list[StoredJob]: The stored jobs, with their ids.
+        """
+        now = time.time()
+        jobs = []
+        with self._conn:
+            for url, output in zip(urls, outputs):
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (url, canonical, output, created) "
+                    "VALUES (?, ?, ?, ?)",
+                    (url, page_key(url), output, now),
+                )
+                jobs.append(StoredJob(cursor.lastrowid, url, output))
+        return jobs
+
+    def unfinished(self, include_failed: bool = False) -> list[StoredJob]:
+        """
+        Get the jobs that still need to run.
+
+        Jobs left "running" by a crashed batch count as unfinished.
+
+        Args:
+            include_failed (bool): Also return jobs that failed (default: False).
+
+        Returns:
+            list[StoredJob]: The jobs, in the order they were added.
+        """
+        states = [PENDING, RUNNING] + ([FAILED] if include_failed else [])
+        placeholders = ", ".join("?" for _ in states)
+        rows = self._conn.execute(
+            f"SELECT id, url, output, state, attempts FROM jobs "
+            f"WHERE state IN ({placeholders}) ORDER BY id",
+            states,
+        )
+        return [StoredJob(*row) for row in rows]
+
+    def known(self, urls: list[str]) -> set[str]:
+        """
+        Find which of the given URLs already have a job, in any state and under
+        any spelling of the same page.
+
+        Args:
+            urls (list[str]): The URLs to look up.
+
+        Returns:
+            set[str]: The URLs whose page is already stored.
+        """
+        keys = list({page_key(url) for url in urls})
+        stored = set()
+        # Stay well under SQLite's limit on the number of query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self._conn.execute(
+                f"SELECT canonical FROM jobs WHERE canonical IN ({placeholders})",
+                chunk,
+            )
+            stored.update(row[0] for row in rows)
+        return {url for url in urls if page_key(url) in stored}
+
+    def counts(self) -> dict[str, int]:
+        """
+        Count the jobs in each state.
+
+        Returns:
+            dict[str, int]: The number of jobs keyed by state.
+        """
+        self.flush()
+        rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        return dict(rows.fetchall())
+
+    def set_meta(self, key: str, value: object) -> None:
+        """
+        Store a JSON-serialisable value alongside the jobs.
+
+        Args:
+            key (str): The name of the value.
+            value (object): The value.
+        """
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, json.dumps(value)),
+            )
+
+    def get_meta(self, key: str, default: object = None) -> object:
+        """
+        Read a value stored with set_meta.
+
+        Args:
+            key (str): The name of the value.
+            default (object): Returned if the value is missing (default: None).
+
+        Returns:
+            object: The value.
+        """
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def mark_running(self, job: StoredJob) -> None:
+        """
+        Record that a job has started.
+
+        Args:
+            job (StoredJob): The job.
+        """
+        job.state = RUNNING
+        job.attempts += 1
+        self._queue(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, started = ? "
+            "WHERE id = ?",
+            (RUNNING, time.time(), job.id),
+        )
+
+    def mark_done(self, job: StoredJob, duration: float) -> None:
+        """
+        Record that a job succeeded.
+
+        Args:
+            job (StoredJob): The job.
+            duration (float): How long the job took, in seconds.
+        """
+        job.state = DONE
+        self._queue(
+            "UPDATE jobs SET state = ?, error = NULL, finished = ?, duration = ? "
+            "WHERE id = ?",
+            (DONE, time.time(), duration, job.id),
+        )
+
+    def mark_failed(self, job: StoredJob, error: str, duration: float) -> None:
+        """
+        Record that a job failed.
+
+        Args:
+            job (StoredJob): The job.
+            error (str): A description of the failure.
+            duration (float): How long the job took, in seconds.
+        """
+        job.state = FAILED
+        self._queue(
+            "UPDATE jobs SET state = ?, error = ?, finished = ?, duration = ? "
+            "WHERE id = ?",
+            (FAILED, error, time.time(), duration, job.id),
+        )
+
+    def _queue(self, sql: str, params: tuple) -> None:
+        self._pending.append((sql, params))
+        if (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+        elif self._timer is None:
+            self._start_timer()
+
+    def _start_timer(self) -> None:
+        # Flush even if no further update comes to trigger it
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._timer = loop.call_later(self.flush_interval, self.flush)
+
+    def flush(self) -> None:
+        """
+        Write all buffered updates in a single transaction.
+        """
+        self._last_flush = time.monotonic()
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        with self._conn:
+            for sql, params in pending:
+                self._conn.execute(sql, params)
+        logger.debug(f"Flushed {len(pending)} job updates")
+
+    def close(self) -> None:
+        """
+        Flush buffered updates and close the database.
+        """
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self) -> "JobStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
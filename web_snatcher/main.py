@@ -1,14 +1,59 @@
+import asyncio
 import logging
 import os
-import re
 import subprocess
-from datetime import datetime
-from urllib.parse import urlparse
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable
 
 import typer
-from rich.console import Console
 
-console = Console()
+from web_snatcher.defaults import DEFAULT_FETCHERS, TIMEOUT_EXIT_CODE
+from web_snatcher.metrics import JOBS_FINISHED, JOBS_QUEUED, JOBS_STARTED, REGISTRY
+from web_snatcher.options import (
+    DEBUG_OPTION,
+    DOMAIN_OPTIONS,
+    METRICS_FILE_OPTION,
+    PIPELINE_OPTIONS,
+    POOL_OPTIONS,
+    RENDER_OPTIONS,
+    TRACE_OPTION,
+    conversion_options,
+)
+from web_snatcher.tracing import Tracer, span, start_tracing, stop_tracing
+from web_snatcher.urls import canonicalize_url, generate_output_name, validate_url
+
+# The modules doing the work, and httpx with them, are imported by the commands
+# that use them, so `--help` and option errors don't wait for them
+if TYPE_CHECKING:
+    from web_snatcher.harvest import HarvestReport
+    from web_snatcher.jobstore import JobStore, StoredJob
+    from web_snatcher.proxy import AssetProxy
+    from web_snatcher.seen import SeenIndex
+    from web_snatcher.snatcher import Snatcher
+
+
+class LazyConsole:
+    """
+    Stands in for a rich Console, importing rich the first time something is printed.
+
+    rich takes longer to import than the rest of the CLI, so commands only
+    pay for it once they have output to show.
+    """
+
+    def __init__(self):
+        self._console = None
+
+    def __getattr__(self, name: str):
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return getattr(self._console, name)
+
+
+console = LazyConsole()
 
 # Create a logger at the module level
 logger = logging.getLogger(__name__)
@@ -16,138 +61,491 @@ logger = logging.getLogger(__name__)
 app = typer.Typer(rich_markup_mode="markdown")
 
 
-def validate_url(value: str) -> bool:
+def configure_logging(debug: bool):
     """
-    Validate if the given string is a valid URL.
+    Configure logging based on the debug flag.
 
     Args:
-        value (str): The URL to validate.
-
-    Returns:
-        bool: True if the URL is valid, False otherwise.
+        debug (bool): Whether to enable debug logging.
     """
-    try:
-        result = urlparse(value)
-        return all([result.scheme, result.netloc])
-    except ValueError:
-        return False
+    if debug:
+        logging.basicConfig(level=logging.DEBUG)
+    else:
+        logging.basicConfig(level=logging.INFO)
 
 
-def generate_output_name(url: str) -> str:
+def start_trace(path: str | None) -> Tracer | None:
     """
-    Generate a meaningful output name based on the URL, always including the domain name.
+    Start tracing the stages of each conversion, if a trace file was requested.
 
     Args:
-        url (str): The URL to generate the output name from.
+        path (str | None): The trace file to write, or None to not trace.
 
     Returns:
-        str: A string representing the output name.
+        Tracer | None: The tracer, or None if tracing is off.
     """
-    parsed_url = urlparse(url)
-    domain = parsed_url.netloc
-    path_parts = parsed_url.path.split("/")
+    return start_tracing() if path else None
 
-    # Remove empty parts and the first part (which is usually empty)
-    path_parts = [part for part in path_parts if part]
 
-    if path_parts:
-        # Use the last part of the path as the base name
-        base_name = path_parts[-1]
-    else:
-        # If no path parts, use 'index' as the base name
-        base_name = "index"
+def finish_trace(tracer: Tracer | None, path: str | None) -> None:
+    """
+    Stop tracing, write the trace file and print the time spent in each stage.
 
-    # Remove any file extension
-    base_name = os.path.splitext(base_name)[0]
+    Args:
+        tracer (Tracer | None): The tracer returned by start_trace.
+        path (str | None): The trace file to write.
+    """
+    if tracer is None:
+        return
+    stop_tracing()
+    tracer.write(path)
+
+    from rich.table import Table
+
+    table = Table(title="Time by stage")
+    table.add_column("Stage")
+    table.add_column("Count", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("Max", justify="right")
+    for name, count, total, mean, longest in tracer.summary():
+        table.add_row(
+            name,
+            str(count),
+            f"{total:.3f}s",
+            f"{mean * 1000:.1f}ms",
+            f"{longest * 1000:.1f}ms",
+        )
+    console.print(table)
+    console.print(
+        f"[bold blue]Info:[/bold blue] Trace written to [cyan]{path}[/cyan] "
+        "(open it in https://ui.perfetto.dev)"
+    )
 
-    # Replace any non-alphanumeric characters with underscores
-    base_name = re.sub(r"\W+", "_", base_name)
 
-    # Add a timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def write_metrics(path: str | None) -> None:
+    """
+    Write the run's metrics in the Prometheus text format, if a path was given.
 
-    return f"{domain}_{base_name}_{timestamp}.pdf"
+    The file is replaced atomically, so node-exporter's textfile collector
+    never reads it half-written.
 
+    Args:
+        path (str | None): The file to write. The collector only reads files
+            ending in ".prom".
+    """
+    if not path:
+        return
+    from web_snatcher.http_cache import write_atomic
+
+    path = os.path.abspath(path)
+    write_atomic(path, REGISTRY.render().encode())
+    os.chmod(path, 0o644)
+    console.print(
+        f"[bold blue]Info:[/bold blue] Metrics written to [cyan]{path}[/cyan]"
+    )
 
-def configure_logging(debug: bool):
+
+def snatcher_from_settings(settings: dict) -> "Snatcher":
     """
-    Configure logging based on the debug flag.
+    Build a Snatcher from a command's conversion options.
 
     Args:
-        debug (bool): Whether to enable debug logging.
+        settings (dict): The conversion options, keyed by CLI parameter name, as
+            built by options.conversion_settings or saved in a batch's job store.
+
+    Returns:
+        Snatcher: The Snatcher. The caller is responsible for closing it.
+
+    Raises:
+        typer.BadParameter: If a readiness spec is malformed, the blocklist can't be
+            read, or the render profiles are invalid.
     """
-    if debug:
-        logging.basicConfig(level=logging.DEBUG)
-    else:
-        logging.basicConfig(level=logging.INFO)
+    from web_snatcher import factory
+
+    try:
+        return factory.snatcher_from_settings(settings)
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
 
 
-def execute_wkhtmltopdf(url: str, output: str) -> None:
+async def fetch_and_convert(url: str, output: str, snatcher: "Snatcher") -> None:
     """
-    Execute wkhtmltopdf to convert the HTML to PDF.
+    Convert a single page, closing the Snatcher afterwards.
 
     Args:
         url (str): The URL of the webpage to convert.
         output (str): The path where the PDF will be saved.
+        snatcher (Snatcher): The resources to convert the page with.
 
     Raises:
+        httpx.HTTPError: If fetching the page fails.
+        RenderTimeoutError: If wkhtmltopdf does not finish within the timeout.
         subprocess.CalledProcessError: If wkhtmltopdf execution fails.
     """
-    cmd = [
-        "wkhtmltopdf",
-        "--page-size",
-        "A4",
-        "--margin-top",
-        "0.75in",
-        "--margin-right",
-        "0.75in",
-        "--margin-bottom",
-        "0.75in",
-        "--margin-left",
-        "0.75in",
-        "--encoding",
-        "UTF-8",
-        "--no-stop-slow-scripts",
-        "--javascript-delay",
-        "1000",
-        url,
-        output,
+    async with snatcher:
+        await snatcher.snatch(url, output)
+
+
+def read_urls(source: str) -> list[str]:
+    """
+    Read URLs from a file, one per line, or from stdin when the source is "-".
+
+    Blank lines and lines starting with "#" are ignored.
+
+    Args:
+        source (str): Path to a file containing URLs, or "-" for stdin.
+
+    Returns:
+        list[str]: The URLs in the order they were read.
+    """
+    if source == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    return [
+        line.strip()
+        for line in lines
+        if line.strip() and not line.strip().startswith("#")
     ]
 
-    logger.debug(f"Executing command: {' '.join(cmd)}")
 
-    process = subprocess.Popen(
-        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+def dedupe_urls(urls: list[str]) -> list[str]:
+    """
+    Drop URLs that are variants of an earlier URL in the list.
+
+    Invalid URLs can't be canonicalized, so they are only dropped when repeated
+    exactly, and left for run_batch to report.
+
+    Args:
+        urls (list[str]): The URLs.
+
+    Returns:
+        list[str]: The first URL of each canonical page, in the original order.
+    """
+    unique = {}
+    for url in urls:
+        unique.setdefault(canonicalize_url(url) if validate_url(url) else url, url)
+    return list(unique.values())
+
+
+async def run_harvest(
+    feeds: list[str],
+    store: "JobStore",
+    enqueue: Callable[[list[str]], None],
+    seen: "SeenIndex | None" = None,
+) -> "HarvestReport":
+    """
+    Read feeds and sitemaps with a fresh HTTP client, queueing the pages not seen
+    before.
+
+    Args:
+        feeds (list[str]): The URLs of the feeds and sitemaps.
+        store (JobStore): The job store of the archive.
+        enqueue (Callable[[list[str]], None]): Adds new pages to the store.
+        seen (SeenIndex | None): The index of pages already archived (default: None).
+
+    Returns:
+        HarvestReport: What was found.
+    """
+    from web_snatcher.fetch import create_client
+    from web_snatcher.harvest import harvest_feeds
+
+    async with create_client() as client:
+        return await harvest_feeds(client, feeds, store, enqueue, seen)
+
+
+def assign_output_paths(
+    urls: list[str], output_dir: str, taken: set[str] | None = None
+) -> list[str]:
+    """
+    Generate an output path for each URL, making sure no two jobs share a path.
+
+    Args:
+        urls (list[str]): The URLs to generate output paths for.
+        output_dir (str): The directory the PDFs will be written to.
+        taken (set[str] | None): File names already assigned by earlier calls. It is
+            updated with the new names (default: None).
+
+    Returns:
+        list[str]: One output path per URL, in the same order.
+    """
+    seen = taken if taken is not None else set()
+    paths = []
+    for url in urls:
+        name = generate_output_name(url)
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        # Names only have a one-second timestamp, so similar URLs can collide
+        while name in seen:
+            name = f"{stem}_{counter}{ext}"
+            counter += 1
+        seen.add(name)
+        paths.append(os.path.join(output_dir, name))
+    return paths
+
+
+@dataclass
+class BatchResult:
+    """
+    The outcome of a single conversion job in a batch.
+
+    Attributes:
+        url (str): The URL that was converted.
+        output (str): The path the PDF was (or would have been) written to.
+        error (str | None): The error message if the job failed, None otherwise.
+    """
+
+    url: str
+    output: str
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def start_job(job: "StoredJob", store: "JobStore | None" = None) -> None:
+    """
+    Record that a batch job has been picked up.
+
+    Args:
+        job (StoredJob): The job.
+        store (JobStore | None): The job store to record progress in (default: None).
+    """
+    JOBS_QUEUED.dec()
+    JOBS_STARTED.inc()
+    if store:
+        store.mark_running(job)
+
+
+def finish_job(
+    job: "StoredJob",
+    error: Exception | None,
+    duration: float,
+    store: "JobStore | None" = None,
+) -> BatchResult:
+    """
+    Record the outcome of a batch job.
+
+    Args:
+        job (StoredJob): The job.
+        error (Exception | None): The exception the job failed with, or None.
+        duration (float): How long the job took, in seconds.
+        store (JobStore | None): The job store to record progress in (default: None).
+
+    Returns:
+        BatchResult: The outcome of the job.
+    """
+    import httpx
+
+    from web_snatcher.retry import CircuitOpenError
+    from web_snatcher.snatcher import describe_error, failure_reason
+
+    if error is None:
+        result = BatchResult(job.url, job.output)
+        JOBS_FINISHED.inc(labels=("succeeded", ""))
+    elif isinstance(
+        error, (httpx.HTTPError, subprocess.SubprocessError, CircuitOpenError)
+    ):
+        result = BatchResult(job.url, job.output, error=describe_error(error))
+        JOBS_FINISHED.inc(labels=("failed", failure_reason(error)))
+    else:
+        logger.error(f"Unexpected error converting {job.url}", exc_info=error)
+        result = BatchResult(job.url, job.output, error=str(error))
+        JOBS_FINISHED.inc(labels=("failed", "unexpected"))
+
+    if store:
+        if result.ok:
+            store.mark_done(job, duration)
+        else:
+            store.mark_failed(job, result.error, duration)
+    return result
+
+
+async def run_batch(
+    jobs: list["StoredJob"],
+    snatcher: "Snatcher",
+    store: "JobStore | None" = None,
+    renderers: int = 1,
+    fetchers: int = DEFAULT_FETCHERS,
+    fetch_ahead: int | None = None,
+) -> list[BatchResult]:
+    """
+    Run many jobs through a fetch/render pipeline, closing the Snatcher afterwards.
+
+    Args:
+        jobs (list[StoredJob]): The jobs to run.
+        snatcher (Snatcher): The resources shared by every job.
+        store (JobStore | None): The job store to record progress in (default: None).
+        renderers (int): The number of pages rendered at once (default: 1).
+        fetchers (int): The number of pages fetched at once (default: 16).
+        fetch_ahead (int | None): Fetched pages allowed to wait for a renderer
+            (default: twice the number of renderers).
+
+    Returns:
+        list[BatchResult]: The outcome of each job, in completion order.
+    """
+    from web_snatcher.pipeline import Pipeline
+
+    results = []
+    JOBS_QUEUED.inc(len(jobs))
+
+    def report(result: BatchResult) -> None:
+        if result.ok:
+            console.print(
+                f"[bold green]OK[/bold green] [yellow]{result.url}[/yellow] -> "
+                f"[cyan]{result.output}[/cyan]"
+            )
+        else:
+            console.print(
+                f"[bold red]FAILED[/bold red] [yellow]{result.url}[/yellow]: "
+                f"{result.error}"
+            )
+        results.append(result)
+
+    valid = []
+    for job in jobs:
+        if validate_url(job.url):
+            valid.append(job)
+            continue
+        JOBS_QUEUED.dec()
+        JOBS_FINISHED.inc(labels=("failed", "invalid_url"))
+        result = BatchResult(job.url, job.output, error="Invalid URL")
+        if store:
+            store.mark_failed(job, result.error, 0.0)
+        report(result)
+
+    pipeline = Pipeline(
+        snatcher,
+        fetchers=fetchers,
+        renderers=renderers,
+        fetch_ahead=fetch_ahead,
+        on_start=lambda job: start_job(job, store),
+        on_finish=lambda job, error, duration: report(
+            finish_job(job, error, duration, store)
+        ),
     )
+    async with snatcher:
+        await pipeline.run(valid)
 
-    stdout, stderr = process.communicate()
+    return results
 
-    if stdout:
-        logger.info(f"wkhtmltopdf stdout: {stdout.strip()}")
-    if stderr:
-        logger.warning(f"wkhtmltopdf stderr: {stderr.strip()}")
 
-    if process.returncode != 0:
-        raise subprocess.CalledProcessError(process.returncode, cmd, output=stderr)
+def pipeline_options(settings: dict) -> dict:
+    """
+    Get run_batch's stage sizes from a batch's settings.
 
+    Args:
+        settings (dict): The batch's settings, as stored in its state file.
 
-@app.command()
-def html_to_pdf(
-    url: str = typer.Argument(..., help="URL of the webpage to convert"),
-    output: str = typer.Option(None, "--output", "-o", help="Output PDF file path"),
-    debug: bool = typer.Option(False, "--debug", "-d", help="Enable debug logging"),
-):
+    Returns:
+        dict: The renderers, fetchers and fetch_ahead arguments of run_batch.
     """
-    Convert HTML to PDF using wkhtmltopdf.
+    return {
+        "renderers": settings.get("concurrency", 1),
+        "fetchers": settings.get("fetchers", DEFAULT_FETCHERS),
+        "fetch_ahead": settings.get("fetch_ahead"),
+    }
+
+
+def report_proxy(proxy: "AssetProxy") -> None:
+    """
+    Print how many of wkhtmltopdf's requests the asset proxy answered from its cache.
+
+    Args:
+        proxy (AssetProxy): The proxy.
+    """
+    stats = proxy.stats
+    console.print(
+        f"[bold]Asset proxy:[/bold] {stats.hits + stats.revalidated} of "
+        f"{stats.requests} requests served from cache ({stats.hit_rate:.0%}, "
+        f"{stats.cached_bytes / 2**20:.1f} MiB), "
+        f"{stats.tunnels} HTTPS connections passed through"
+        + (f", {stats.blocked} blocked" if stats.blocked else "")
+    )
+
+
+def report_blocked(snatcher: "Snatcher") -> None:
+    """
+    Print how many requests the blocklist avoided.
+
+    Args:
+        snatcher (Snatcher): The Snatcher the pages were converted with.
+    """
+    blocked = snatcher.blocked
+    console.print(
+        f"[bold]Blocked:[/bold] {blocked.requests} requests on "
+        f"{snatcher.blocked_pages} pages "
+        f"({blocked.bytes / 1024:.1f} KiB of markup removed)"
+    )
+
+
+def report_batch(results: list[BatchResult], snatcher: "Snatcher") -> None:
+    """
+    Print the summary of a batch run and exit with an error if any job failed.
+
+    Args:
+        results (list[BatchResult]): The outcome of each job.
+        snatcher (Snatcher): The Snatcher the batch ran with.
+
+    Raises:
+        typer.Exit: If any job failed.
+    """
+    failed = [result for result in results if not result.ok]
+    console.print(
+        f"[bold]Done:[/bold] [green]{len(results) - len(failed)} succeeded[/green], "
+        f"[red]{len(failed)} failed[/red]"
+    )
+    pdf_cache = snatcher.pdf_cache
+    if pdf_cache and (pdf_cache.hits or pdf_cache.misses):
+        console.print(
+            f"[bold]PDF cache:[/bold] {pdf_cache.hits} hits, {pdf_cache.misses} misses"
+        )
+    if snatcher.flights.coalesced:
+        console.print(
+            f"[bold]Coalesced:[/bold] {snatcher.flights.coalesced} duplicate "
+            "conversions shared an in-flight render"
+        )
+    if snatcher.seen and snatcher.seen.skipped:
+        console.print(
+            f"[bold]Already archived:[/bold] {snatcher.seen.skipped} pages reused "
+            "their earlier PDF"
+        )
+    if snatcher.retries:
+        console.print(f"[bold]Retries:[/bold] {snatcher.retries}")
+    if snatcher.blocked_pages:
+        report_blocked(snatcher)
+    if snatcher.proxy:
+        report_proxy(snatcher.proxy)
+    if failed:
+        raise typer.Exit(code=1)
+
+
+def convert_page(url: str, output: str | None, settings: dict) -> None:
+    """
+    Convert a single page and print the outcome.
 
     Args:
         url (str): The URL of the webpage to convert.
-        output (str): The path where the PDF will be saved (default: generated based on URL).
-        debug (bool): Enable debug logging (default: False).
+        output (str | None): The path where the PDF will be saved
+            (default: generated based on URL).
+        settings (dict): The conversion options.
+
+    Raises:
+        typer.Exit: If the URL is invalid or the conversion fails, with
+            wkhtmltopdf's exit code or 124 for a timeout.
+        typer.BadParameter: If the conversion options are invalid.
     """
-    configure_logging(debug)
+    import httpx
 
-    if not validate_url(url):
+    from web_snatcher.engine import RenderTimeoutError
+
+    with span("validate"):
+        valid = validate_url(url)
+    if not valid:
         console.print(
             f"[bold red]Error:[/bold red] Invalid URL '[yellow]{url}[/yellow]'"
         )
@@ -156,14 +554,34 @@ def html_to_pdf(
     if output is None:
         output = generate_output_name(url)
         console.print(
-            f"[bold blue]Info:[/bold blue] Using generated output name: [cyan]{output}[/cyan]"
+            "[bold blue]Info:[/bold blue] Using generated output name: "
+            f"[cyan]{output}[/cyan]"
         )
 
+    snatcher = snatcher_from_settings(settings)
+    pdf_cache_store = snatcher.pdf_cache
     try:
-        execute_wkhtmltopdf(url, output)
+        asyncio.run(fetch_and_convert(url, output, snatcher))
+        if pdf_cache_store and pdf_cache_store.hits:
+            console.print(
+                "[bold blue]Info:[/bold blue] Page unchanged, reused the cached PDF"
+            )
         console.print(
-            f"[bold green]Success![/bold green] PDF successfully generated: [cyan]{output}[/cyan]"
+            "[bold green]Success![/bold green] PDF successfully generated: "
+            f"[cyan]{output}[/cyan]"
         )
+        if snatcher.blocked_pages:
+            report_blocked(snatcher)
+        if snatcher.proxy:
+            report_proxy(snatcher.proxy)
+    except httpx.HTTPError as e:
+        console.print(f"[bold red]Fetch error:[/bold red] {e}")
+        logger.error(f"Fetch error: {e}")
+        raise typer.Exit(code=1)
+    except RenderTimeoutError as e:
+        console.print(f"[bold red]Timeout:[/bold red] {e}")
+        logger.error(str(e))
+        raise typer.Exit(code=TIMEOUT_EXIT_CODE)
     except subprocess.CalledProcessError as cpe:
         console.print(f"[bold red]wkhtmltopdf error:[/bold red] {cpe.output}")
         logger.error(f"wkhtmltopdf error: {cpe.output}")
@@ -174,5 +592,359 @@ def html_to_pdf(
         raise typer.Exit(code=1)
 
 
+@app.command()
+@conversion_options(RENDER_OPTIONS)
+def html_to_pdf(
+    url: str = typer.Argument(..., help="URL of the webpage to convert"),
+    output: str = typer.Option(None, "--output", "-o", help="Output PDF file path"),
+    settings: dict = None,
+    trace: str = TRACE_OPTION,
+    debug: bool = DEBUG_OPTION,
+):
+    """
+    Convert HTML to PDF using wkhtmltopdf.
+
+    Args:
+        url (str): The URL of the webpage to convert.
+        output (str): The path where the PDF will be saved
+            (default: generated based on URL).
+        settings (dict): The conversion options shared with the other commands,
+            see web_snatcher.options.RENDER_OPTIONS.
+        trace (str): Chrome trace-event file to write (default: not traced).
+        debug (bool): Enable debug logging (default: False).
+    """
+    configure_logging(debug)
+    tracer = start_trace(trace)
+    try:
+        convert_page(url, output, settings)
+    finally:
+        finish_trace(tracer, trace)
+
+
+@app.command()
+@conversion_options(PIPELINE_OPTIONS, POOL_OPTIONS, RENDER_OPTIONS, DOMAIN_OPTIONS)
+def batch(
+    source: str = typer.Argument(
+        ..., help="File containing URLs, one per line, or '-' to read from stdin"
+    ),
+    output_dir: str = typer.Option(
+        ".", "--output-dir", "-o", help="Directory to write the PDFs to"
+    ),
+    settings: dict = None,
+    seen: str = typer.Option(
+        None,
+        "--seen",
+        help="SQLite index of archived pages; "
+        "pages already in it are not rendered again",
+    ),
+    state: str = typer.Option(
+        None,
+        "--state",
+        help="SQLite file recording each job's progress, so the batch can be resumed",
+    ),
+    trace: str = TRACE_OPTION,
+    metrics_file: str = METRICS_FILE_OPTION,
+    debug: bool = DEBUG_OPTION,
+):
+    """
+    Convert a batch of URLs to PDFs in parallel.
+
+    Args:
+        source (str): File containing URLs, one per line, or '-' for stdin.
+        output_dir (str): Directory to write the PDFs to (default: current directory).
+        settings (dict): The conversion options shared with the other commands,
+            see web_snatcher.options.
+        seen (str): SQLite index of pages already archived (default: no index).
+        state (str): SQLite file recording each job's progress (default: not recorded).
+        trace (str): Chrome trace-event file to write (default: not traced).
+        metrics_file (str): File to write Prometheus metrics to when done
+            (default: not written).
+        debug (bool): Enable debug logging (default: False).
+    """
+    from web_snatcher.jobstore import JobStore, StoredJob
+
+    configure_logging(debug)
+
+    try:
+        urls = read_urls(source)
+    except OSError as e:
+        console.print(f"[bold red]Error:[/bold red] Could not read URLs: {e}")
+        raise typer.Exit(code=1)
+
+    if not urls:
+        console.print("[bold yellow]Warning:[/bold yellow] No URLs to convert")
+        return
+
+    if state and os.path.exists(state):
+        console.print(
+            f"[bold red]Error:[/bold red] State file '{state}' already exists, "
+            "use the resume command to continue it"
+        )
+        raise typer.Exit(code=1)
+
+    settings["seen"] = seen
+    snatcher = snatcher_from_settings(settings)
+
+    unique = dedupe_urls(urls)
+    if len(unique) < len(urls):
+        console.print(
+            f"[bold blue]Info:[/bold blue] Skipping {len(urls) - len(unique)} "
+            "duplicate URLs"
+        )
+        urls = unique
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = assign_output_paths(urls, output_dir)
+
+    console.print(
+        f"[bold blue]Info:[/bold blue] Converting {len(urls)} URLs with concurrency "
+        f"{settings['concurrency']}"
+    )
+    tracer = start_trace(trace)
+    try:
+        if state is None:
+            jobs = [StoredJob(None, url, output) for url, output in zip(urls, outputs)]
+            results = asyncio.run(
+                run_batch(jobs, snatcher, **pipeline_options(settings))
+            )
+        else:
+            with JobStore(state) as store:
+                store.set_meta("settings", settings)
+                jobs = store.add(urls, outputs)
+                console.print(
+                    "[bold blue]Info:[/bold blue] Recording progress in "
+                    f"[cyan]{state}[/cyan]"
+                )
+                results = asyncio.run(
+                    run_batch(jobs, snatcher, store, **pipeline_options(settings))
+                )
+    finally:
+        finish_trace(tracer, trace)
+    write_metrics(metrics_file)
+    report_batch(results, snatcher)
+
+
+@app.command()
+def resume(
+    state: str = typer.Argument(..., help="SQLite file written by 'batch --state'"),
+    retry_failed: bool = typer.Option(
+        False, "--retry-failed", help="Also run jobs that failed last time"
+    ),
+    concurrency: int = typer.Option(
+        None,
+        "--concurrency",
+        "-j",
+        min=1,
+        help="Maximum number of pages rendered in parallel (default: as in the "
+        "original batch)",
+    ),
+    debug: bool = DEBUG_OPTION,
+):
+    """
+    Resume an interrupted batch, running only the jobs that did not finish.
+
+    The batch's conversion options are read back from the state file.
+
+    Args:
+        state (str): SQLite file written by 'batch --state'.
+        retry_failed (bool): Also run jobs that failed (default: False).
+        concurrency (int): Maximum number of parallel renders (default: as before).
+        debug (bool): Enable debug logging (default: False).
+    """
+    from web_snatcher.jobstore import JobStore
+
+    configure_logging(debug)
+
+    if not os.path.exists(state):
+        console.print(f"[bold red]Error:[/bold red] No such state file '{state}'")
+        raise typer.Exit(code=1)
+
+    with JobStore(state) as store:
+        jobs = store.unfinished(include_failed=retry_failed)
+        if not jobs:
+            console.print(
+                "[bold green]Nothing to do:[/bold green] every job has finished"
+            )
+            return
+
+        settings = store.get_meta("settings", {})
+        if concurrency:
+            settings["concurrency"] = concurrency
+        snatcher = snatcher_from_settings(settings)
+        for directory in {os.path.dirname(job.output) for job in jobs}:
+            os.makedirs(directory or ".", exist_ok=True)
+
+        console.print(
+            f"[bold blue]Info:[/bold blue] Resuming {len(jobs)} unfinished jobs "
+            f"with concurrency {settings.get('concurrency', 1)}"
+        )
+        results = asyncio.run(
+            run_batch(jobs, snatcher, store, **pipeline_options(settings))
+        )
+    report_batch(results, snatcher)
+
+
+@app.command()
+@conversion_options(PIPELINE_OPTIONS, POOL_OPTIONS, RENDER_OPTIONS, DOMAIN_OPTIONS)
+def harvest(
+    feeds: list[str] = typer.Argument(..., help="URLs of RSS/Atom feeds or sitemaps"),
+    state: str = typer.Option(
+        "harvest.db",
+        "--state",
+        help="SQLite file recording every page ever queued, shared between harvests",
+    ),
+    output_dir: str = typer.Option(
+        ".", "--output-dir", "-o", help="Directory to write the PDFs to"
+    ),
+    retry_failed: bool = typer.Option(
+        False, "--retry-failed", help="Also rerun pages that failed in earlier harvests"
+    ),
+    settings: dict = None,
+    metrics_file: str = METRICS_FILE_OPTION,
+    debug: bool = DEBUG_OPTION,
+):
+    """
+    Archive every page listed in feeds or sitemaps that has not been archived yet.
+
+    Feeds are read with conditional requests, so an unchanged feed costs a
+    single 304. Run it on a schedule with the same state file to pick up
+    new articles as they are published.
+
+    Args:
+        feeds (list[str]): URLs of RSS/Atom feeds or sitemaps.
+        state (str): SQLite file recording every page ever queued (default: harvest.db).
+        output_dir (str): Directory to write the PDFs to (default: current directory).
+        retry_failed (bool): Also rerun pages that failed before (default: False).
+        settings (dict): The conversion options shared with the other commands,
+            see web_snatcher.options.
+        metrics_file (str): File to write Prometheus metrics to when done
+            (default: not written).
+        debug (bool): Enable debug logging (default: False).
+    """
+    from web_snatcher.jobstore import JobStore
+    from web_snatcher.seen import SeenIndex
+
+    configure_logging(debug)
+
+    settings["seen"] = state
+    os.makedirs(output_dir, exist_ok=True)
+    taken = set(os.listdir(output_dir))
+
+    with JobStore(state) as store:
+        store.set_meta("settings", settings)
+        with SeenIndex(state) as seen:
+            report = asyncio.run(
+                run_harvest(
+                    feeds,
+                    store,
+                    lambda urls: store.add(
+                        urls, assign_output_paths(urls, output_dir, taken)
+                    ),
+                    seen,
+                )
+            )
+        console.print(
+            f"[bold blue]Info:[/bold blue] Read {report.feeds} feeds "
+            f"({report.unchanged} unchanged), {report.queued} new pages "
+            f"out of {report.links} links"
+        )
+        for error in report.errors:
+            console.print(f"[bold red]Feed error:[/bold red] {error}")
+
+        jobs = store.unfinished(include_failed=retry_failed)
+        if not jobs:
+            console.print("[bold green]Nothing to do:[/bold green] no new pages")
+            write_metrics(metrics_file)
+            if report.errors:
+                raise typer.Exit(code=1)
+            return
+
+        snatcher = snatcher_from_settings(settings)
+        console.print(
+            f"[bold blue]Info:[/bold blue] Converting {len(jobs)} pages with "
+            f"concurrency {settings['concurrency']}"
+        )
+        results = asyncio.run(
+            run_batch(jobs, snatcher, store, **pipeline_options(settings))
+        )
+    write_metrics(metrics_file)
+    report_batch(results, snatcher)
+    if report.errors:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+@conversion_options(POOL_OPTIONS, RENDER_OPTIONS, DOMAIN_OPTIONS)
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on"),
+    port: int = typer.Option(8000, "--port", help="Port to listen on"),
+    workers: int = typer.Option(
+        os.cpu_count() or 1,
+        "--workers",
+        "-j",
+        min=1,
+        help="Number of conversions to run in parallel",
+    ),
+    queue_size: int = typer.Option(
+        100,
+        "--queue-size",
+        min=1,
+        help="Jobs allowed to wait for a worker before requests are rejected with 429",
+    ),
+    output_dir: str = typer.Option(
+        None,
+        "--output-dir",
+        "-o",
+        help="Directory to keep PDFs in until they are fetched (default: a temporary "
+        "directory)",
+    ),
+    settings: dict = None,
+    trace: str = TRACE_OPTION,
+    debug: bool = DEBUG_OPTION,
+):
+    """
+    Run an HTTP service that converts pages on a warm worker pool.
+
+    POST a JSON body such as `{"url": "https://www.the42.ie/..."}` to `/convert`
+    to get the PDF back, or add `"wait": false` to get a job id to poll at
+    `/jobs/{id}` and download from `/jobs/{id}/pdf`.
+
+    Args:
+        host (str): Interface to listen on (default: 127.0.0.1).
+        port (int): Port to listen on (default: 8000).
+        workers (int): Number of parallel conversions (default: CPU count).
+        queue_size (int): Jobs allowed to wait for a worker (default: 100).
+        output_dir (str): Directory to keep PDFs in (default: a temporary directory).
+        settings (dict): The conversion options shared with the other commands,
+            see web_snatcher.options.
+        trace (str): Chrome trace-event file to write (default: not traced).
+        debug (bool): Enable debug logging (default: False).
+    """
+    from web_snatcher.service import RenderService
+
+    configure_logging(debug)
+
+    settings["concurrency"] = workers
+    snatcher = snatcher_from_settings(settings)
+    service = RenderService(
+        snatcher,
+        output_dir or tempfile.mkdtemp(prefix="web-snatcher-"),
+        workers,
+        queue_size,
+    )
+
+    console.print(
+        f"[bold blue]Info:[/bold blue] Serving on [cyan]http://{host}:{port}[/cyan] "
+        f"with {workers} workers"
+    )
+    tracer = start_trace(trace)
+    try:
+        asyncio.run(service.serve(host, port))
+    except KeyboardInterrupt:
+        console.print("[bold blue]Info:[/bold blue] Shutting down")
+    finally:
+        finish_trace(tracer, trace)
+
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,345 @@
+import abc
+import bisect
+import math
+from typing import Callable
+
+# Latency buckets, in seconds, from a cached fetch up to a render near the timeout
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# PDF size buckets, in bytes: 10 KiB up to 50 MiB
+SIZE_BUCKETS = tuple(
+    size * 1024 for size in (10, 50, 100, 250, 500, 1024, 2048, 5120, 10240, 51200)
+)
+
+
+def format_value(value: float) -> str:
+    """
+    Format a sample value, writing whole numbers without a decimal point.
+
+    Args:
+        value (float): The value.
+
+    Returns:
+        str: The formatted value.
+    """
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    """
+    Format a set of labels as {name="value",...}, escaping the values.
+
+    Args:
+        names (tuple[str, ...]): The label names.
+        values (tuple[str, ...]): The label values, in the same order.
+
+    Returns:
+        str: The formatted labels, or "" if there are none.
+    """
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric(abc.ABC):
+    """
+    The parts shared by every metric: a name, help text and label names.
+
+    Subclasses define the metric type in `kind` and implement `samples` and
+    `reset`.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        """
+        Args:
+            name (str): The metric name, e.g. "web_snatcher_jobs_total".
+            documentation (str): The HELP text.
+            labels (tuple[str, ...]): The label names (default: no labels).
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        """
+        Render the metric's current values.
+
+        Returns:
+            list[str]: One line per sample, in the Prometheus text format.
+        """
+
+    @abc.abstractmethod
+    def reset(self) -> None:
+        """
+        Forget every value recorded so far.
+        """
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, such as the number of jobs that failed.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, labels: tuple[str, ...] = ()) -> None:
+        """
+        Add to the counter.
+
+        Args:
+            amount (float): How much to add (default: 1).
+            labels (tuple[str, ...]): The label values, in the order of the label
+                names (default: no labels).
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: tuple[str, ...] = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> list[str]:
+        if not self.labels and not self._values:
+            return [f"{self.name} 0"]
+        return [
+            f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+    def reset(self) -> None:
+        self._values.clear()
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, such as the number of jobs waiting.
+
+    A gauge can instead read its value from a function when it is exported.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._value -= amount
+
+    def set_function(self, function: Callable[[], float] | None) -> None:
+        """
+        Read the gauge's value from a function whenever it is exported.
+
+        Args:
+            function (Callable[[], float] | None): Returns the current value, or
+                None to go back to the value set with set/inc/dec.
+        """
+        self._function = function
+
+    def value(self) -> float:
+        return self._function() if self._function else self._value
+
+    def samples(self) -> list[str]:
+        return [f"{self.name} {format_value(self.value())}"]
+
+    def reset(self) -> None:
+        self._value = 0.0
+        self._function = None
+
+
+class Histogram(Metric):
+    """
+    Counts observations, such as durations, in cumulative buckets.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple[float, ...]):
+        """
+        Args:
+            name (str): The metric name.
+            documentation (str): The HELP text.
+            buckets (tuple[float, ...]): The upper bounds of the buckets, in
+                ascending order. A +Inf bucket is added.
+        """
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        # Only the bucket the value falls in is counted here; the exported
+        # buckets are made cumulative when the metrics are rendered
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def samples(self) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, math.inf), self._counts):
+            cumulative += count
+            lines.append(
+                f'{self.name}_bucket{{le="{format_value(bound)}"}} {cumulative}'
+            )
+        lines.append(f"{self.name}_sum {format_value(self._sum)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+    def reset(self) -> None:
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+
+class Registry:
+    """
+    A set of metrics exported together in the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics, ready to serve from /metrics or write to a textfile.
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = Registry()
+
+# The content type of Registry.render's output
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+JOBS_STARTED = REGISTRY.register(
+    Counter("web_snatcher_jobs_started_total", "Conversion jobs started.")
+)
+JOBS_FINISHED = REGISTRY.register(
+    Counter(
+        "web_snatcher_jobs_finished_total",
+        "Conversion jobs finished, by outcome and failure reason.",
+        ("outcome", "reason"),
+    )
+)
+JOBS_QUEUED = REGISTRY.register(
+    Gauge("web_snatcher_jobs_queued", "Jobs waiting to start.")
+)
+PAGES_AWAITING_RENDER = REGISTRY.register(
+    Gauge(
+        "web_snatcher_pages_awaiting_render",
+        "Fetched pages waiting for a render worker.",
+    )
+)
+RENDER_SLOTS = REGISTRY.register(
+    Gauge("web_snatcher_render_slots", "wkhtmltopdf processes allowed to run at once.")
+)
+RENDER_SLOTS_BUSY = REGISTRY.register(
+    Gauge(
+        "web_snatcher_render_slots_busy", "wkhtmltopdf processes currently rendering."
+    )
+)
+FETCH_SECONDS = REGISTRY.register(
+    Histogram(
+        "web_snatcher_fetch_duration_seconds",
+        "Time to fetch a page, including cache revalidation.",
+        DURATION_BUCKETS,
+    )
+)
+RENDER_SECONDS = REGISTRY.register(
+    Histogram(
+        "web_snatcher_render_duration_seconds",
+        "Time wkhtmltopdf spent rendering a page.",
+        DURATION_BUCKETS,
+    )
+)
+DOWNLOADED_BYTES = REGISTRY.register(
+    Counter("web_snatcher_downloaded_bytes_total", "Bytes of pages downloaded.")
+)
+PDF_BYTES = REGISTRY.register(
+    Histogram("web_snatcher_pdf_size_bytes", "Size of the PDFs produced.", SIZE_BUCKETS)
+)
+EXTRACTIONS = REGISTRY.register(
+    Counter(
+        "web_snatcher_extractions_total",
+        "Pre-fetched pages run through article extraction, "
+        "by whether an article was found.",
+        ("result",),
+    )
+)
+BLOCKED_REQUESTS = REGISTRY.register(
+    Counter(
+        "web_snatcher_blocked_requests_total",
+        "Requests to blocked hosts and URLs avoided, by where they were stopped.",
+        ("where",),
+    )
+)
+BLOCKED_BYTES = REGISTRY.register(
+    Counter(
+        "web_snatcher_blocked_markup_bytes_total",
+        "Bytes of markup removed from pages for loading blocked resources.",
+    )
+)
+PROXY_REQUESTS = REGISTRY.register(
+    Counter(
+        "web_snatcher_proxy_requests_total",
+        "Requests made by wkhtmltopdf through the asset proxy, "
+        "by how they were served.",
+        ("result",),
+    )
+)
+PROXY_BYTES = REGISTRY.register(
+    Counter(
+        "web_snatcher_proxy_bytes_total",
+        "Bytes the asset proxy sent to wkhtmltopdf, by where they came from.",
+        ("source",),
+    )
+)
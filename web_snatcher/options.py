@@ -0,0 +1,340 @@
+import functools
+import inspect
+import os
+from typing import Callable
+
+import typer
+
+from web_snatcher.defaults import DEFAULT_FETCHERS, DEFAULT_TIMEOUT
+
+# Each option group maps a parameter name to its type and typer option.
+# Commands take groups through `conversion_options`, so every command that
+# converts pages declares, documents and stores these options the same way.
+
+# How each page is fetched and rendered
+RENDER_OPTIONS = {
+    "prefetch": (
+        bool,
+        typer.Option(
+            True,
+            "--prefetch/--no-prefetch",
+            help="Fetch pages over a shared keep-alive HTTP client and pipe them "
+            "into wkhtmltopdf",
+        ),
+    ),
+    "http_cache": (
+        bool,
+        typer.Option(
+            True,
+            "--http-cache/--no-http-cache",
+            help="Keep fetched pages on disk and revalidate them with conditional "
+            "requests",
+        ),
+    ),
+    "pdf_cache": (
+        bool,
+        typer.Option(
+            True,
+            "--pdf-cache/--no-pdf-cache",
+            help="Reuse previously rendered PDFs when the page and options are "
+            "unchanged",
+        ),
+    ),
+    "cache_dir": (
+        str,
+        typer.Option(
+            None,
+            "--cache-dir",
+            help="Base directory for caches (default: ~/.cache/web-snatcher)",
+        ),
+    ),
+    "asset_proxy": (
+        bool,
+        typer.Option(
+            False,
+            "--asset-proxy/--no-asset-proxy",
+            help="Fetch page assets through a local caching proxy shared by every "
+            "render. HTTPS assets are only cached when referenced by the pre-fetched "
+            "HTML, not from stylesheets, scripts, --no-prefetch or --persistent",
+        ),
+    ),
+    "extract": (
+        bool,
+        typer.Option(
+            False,
+            "--extract/--no-extract",
+            help="Render only the article's title, byline, text and images with a "
+            "minimal print template, falling back to the full page when no article "
+            "is found",
+        ),
+    ),
+    "block": (
+        bool,
+        typer.Option(
+            False,
+            "--block/--no-block",
+            help="Render pages without ads, analytics beacons and social widgets "
+            "from a built-in list of hosts",
+        ),
+    ),
+    "blocklist": (
+        str,
+        typer.Option(
+            None,
+            "--blocklist",
+            help="File of extra hosts and URL patterns to block, one per line "
+            "(implies --block)",
+        ),
+    ),
+    "profile": (
+        str,
+        typer.Option(
+            None,
+            "--profile",
+            help="Render profile for pages without a per-domain mapping: 'default', "
+            "'fast-text', 'full-fidelity', 'mobile' or one defined in the profiles "
+            "file",
+        ),
+    ),
+    "profiles": (
+        str,
+        typer.Option(
+            None,
+            "--profiles",
+            help="TOML file of render profiles and per-domain mappings "
+            "(default: ~/.config/web-snatcher/profiles.toml, if it exists)",
+        ),
+    ),
+    "timeout": (
+        float,
+        typer.Option(
+            DEFAULT_TIMEOUT,
+            "--timeout",
+            min=0,
+            help="Seconds before a wkhtmltopdf job is killed (0 disables the timeout)",
+        ),
+    ),
+    "memory_limit": (
+        int,
+        typer.Option(
+            None,
+            "--memory-limit",
+            min=1,
+            help="Address-space limit per wkhtmltopdf job, in MiB",
+        ),
+    ),
+    "cpu_limit": (
+        int,
+        typer.Option(
+            None,
+            "--cpu-limit",
+            min=1,
+            help="CPU-time limit per wkhtmltopdf job, in seconds",
+        ),
+    ),
+    "readiness": (
+        str,
+        typer.Option(
+            None,
+            "--readiness",
+            help="How long to wait before printing: 'adaptive[:MAX_MS]' prints once "
+            "the page and its images have loaded, 'fixed[:MS]' always waits the full "
+            "delay, 'static' disables JavaScript and prints once the page has loaded "
+            "(default: the render profile's mode, or adaptive:1000)",
+        ),
+    ),
+    "domain_readiness": (
+        list[str],
+        typer.Option(
+            None,
+            "--domain-readiness",
+            help="Per-domain readiness override as DOMAIN=MODE[:MS]; can be repeated",
+        ),
+    ),
+    "disable_javascript": (
+        bool,
+        typer.Option(
+            False,
+            "--disable-javascript",
+            help="Render pages with JavaScript disabled, after giving lazy-loaded "
+            "images a real src and inlining <noscript> fallbacks "
+            "(same as --readiness static)",
+        ),
+    ),
+    "retries": (
+        int,
+        typer.Option(
+            2,
+            "--retries",
+            min=0,
+            help="Times to retry a page after a network error, 5xx response or "
+            "timeout",
+        ),
+    ),
+}
+
+# Politeness towards each site, for commands converting many pages
+DOMAIN_OPTIONS = {
+    "rate": (
+        float,
+        typer.Option(
+            None,
+            "--rate",
+            min=0,
+            help="Maximum pages per second requested from each domain",
+        ),
+    ),
+    "burst": (
+        int,
+        typer.Option(
+            None,
+            "--burst",
+            min=1,
+            help="Requests a domain may receive at once after being idle "
+            "(default: --rate rounded up)",
+        ),
+    ),
+    "max_per_domain": (
+        int,
+        typer.Option(
+            None,
+            "--max-per-domain",
+            min=1,
+            help="Maximum pages requested from each domain at once",
+        ),
+    ),
+    "breaker_threshold": (
+        int,
+        typer.Option(
+            5,
+            "--breaker-threshold",
+            min=0,
+            help="Consecutive failures after which a domain is paused (0 never pauses)",
+        ),
+    ),
+    "breaker_cooldown": (
+        float,
+        typer.Option(
+            30.0,
+            "--breaker-cooldown",
+            min=0,
+            help="Seconds a paused domain waits before one job is let through as a "
+            "probe",
+        ),
+    ),
+}
+
+# How wkhtmltopdf processes are run, for commands converting many pages
+POOL_OPTIONS = {
+    "persistent": (
+        bool,
+        typer.Option(
+            False,
+            "--persistent",
+            "-p",
+            help="Reuse long-lived wkhtmltopdf processes instead of starting one per "
+            "page",
+        ),
+    ),
+}
+
+# The fetch and render stages of batch runs
+PIPELINE_OPTIONS = {
+    "concurrency": (
+        int,
+        typer.Option(
+            os.cpu_count() or 1,
+            "--concurrency",
+            "-j",
+            min=1,
+            help="Maximum number of pages rendered in parallel",
+        ),
+    ),
+    "fetchers": (
+        int,
+        typer.Option(
+            DEFAULT_FETCHERS,
+            "--fetchers",
+            min=1,
+            help="Maximum number of pages fetched in parallel, ahead of the renderers",
+        ),
+    ),
+    "fetch_ahead": (
+        int,
+        typer.Option(
+            None,
+            "--fetch-ahead",
+            min=1,
+            help="Fetched pages allowed to wait for a renderer before fetching pauses "
+            "(default: twice --concurrency)",
+        ),
+    ),
+}
+
+# Options that are not conversion settings but are shared by several commands
+TRACE_OPTION = typer.Option(
+    None,
+    "--trace",
+    help="Write a Chrome trace of each conversion's stages to this file",
+)
+METRICS_FILE_OPTION = typer.Option(
+    None,
+    "--metrics-file",
+    help="Write Prometheus metrics to this file when done "
+    "(e.g. for node-exporter's textfile collector)",
+)
+DEBUG_OPTION = typer.Option(False, "--debug", "-d", help="Enable debug logging")
+
+# Parameters listed after the shared options in --help
+TRAILING = ("trace", "metrics_file", "debug")
+
+
+def conversion_options(*groups: dict) -> Callable[[Callable], Callable]:
+    """
+    Add groups of shared options to a typer command.
+
+    The command declares a `settings` parameter instead of the options
+    themselves, and receives their values through factory.conversion_settings. The
+    options are listed in --help after the command's own, before --trace,
+    --metrics-file and --debug.
+
+    Args:
+        *groups (dict): Option groups, such as RENDER_OPTIONS.
+
+    Returns:
+        Callable[[Callable], Callable]: The decorator.
+    """
+    options = {name: spec for group in groups for name, spec in group.items()}
+
+    def decorate(command: Callable) -> Callable:
+        signature = inspect.signature(command)
+        own = [
+            parameter.replace(kind=inspect.Parameter.KEYWORD_ONLY)
+            for parameter in signature.parameters.values()
+            if parameter.name != "settings"
+        ]
+        shared = [
+            inspect.Parameter(
+                name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=option,
+                annotation=annotation,
+            )
+            for name, (annotation, option) in options.items()
+        ]
+        trailing = [parameter for parameter in own if parameter.name in TRAILING]
+        leading = [parameter for parameter in own if parameter.name not in TRAILING]
+
+        @functools.wraps(command)
+        def wrapper(**kwargs):
+            from web_snatcher.factory import conversion_settings
+
+            values = {name: kwargs.pop(name) for name in options}
+            return command(settings=conversion_settings(values), **kwargs)
+
+        wrapper.__signature__ = signature.replace(
+            parameters=[*leading, *shared, *trailing]
+        )
+        return wrapper
+
+    return decorate
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from web_snatcher.http_cache import DEFAULT_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+def link_or_copy(source: str, destination: str) -> None:
+    """
+    Hardlink a file into place, falling back to a copy across filesystems.
+
+    The destination is replaced atomically if it already exists.
+
+    Args:
+        source (str): The existing file.
+        destination (str): The path to create.
+    """
+    # Renaming onto another link to the same file is a no-op, so skip it
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".pdf")
+    os.close(fd)
+    os.unlink(tmp_path)
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class PdfCache:
+    """
+    A content-addressed store of rendered PDFs.
+
+    PDFs are keyed by a hash of the exact document that was rendered together
+    with the wkhtmltopdf options, so an unchanged page rendered with the same
+    settings can be reused without invoking wkhtmltopdf at all. Like HttpCache,
+    it has a size budget and evicts the least recently used PDFs first, with
+    recency tracked through each file's mtime.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): The directory to store PDFs in. Created if missing.
+            max_bytes (int): The total size of PDFs to keep before evicting
+                (default: 512 MiB).
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._sizes: dict[str, int] = {}
+        self._last_used: dict[str, float] = {}
+        self.total_bytes = 0
+        self._load_index()
+
+    def _load_index(self) -> None:
+        for name in os.listdir(self.directory):
+            # Skip link_or_copy's temporary files
+            if not name.endswith(".pdf") or name.startswith("."):
+                continue
+            key = name[: -len(".pdf")]
+            try:
+                stat = os.stat(self._path(key))
+            except OSError:
+                continue
+            self._last_used[key] = stat.st_mtime
+            self._set_size(key, stat.st_size)
+
+    @staticmethod
+    def key_for(html: bytes, options: list[str]) -> str:
+        """
+        Get the cache key for a document rendered with the given options.
+
+        Args:
+            html (bytes): The exact document passed to wkhtmltopdf.
+            options (list[str]): The effective wkhtmltopdf options.
+
+        Returns:
+            str: The hex digest identifying the rendered PDF.
+        """
+        digest = hashlib.sha256(json.dumps(options).encode())
+        digest.update(b"\0")
+        digest.update(html)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def restore(self, key: str, output: str) -> bool:
+        """
+        Place a cached PDF at the output path if one exists for the key.
+
+        Args:
+            key (str): The cache key.
+            output (str): The path where the PDF should be placed.
+
+        Returns:
+            bool: True on a cache hit, False on a miss.
+        """
+        path = self._path(key)
+        try:
+            link_or_copy(path, output)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        except OSError as e:
+            logger.warning(f"Could not restore {output} from the PDF cache: {e}")
+            self.misses += 1
+            return False
+        self.hits += 1
+        if key not in self._sizes:
+            # Stored by another process since the index was loaded
+            self._set_size(key, os.path.getsize(path))
+        self._touch(key)
+        logger.debug(f"PDF cache hit for {output}")
+        return True
+
+    def store(self, key: str, output: str) -> None:
+        """
+        Add a freshly rendered PDF to the cache.
+
+        Args:
+            key (str): The cache key.
+            output (str): The path of the rendered PDF.
+        """
+        try:
+            size = os.path.getsize(output)
+            if size > self.max_bytes:
+                return
+            link_or_copy(output, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not add {output} to the PDF cache: {e}")
+            return
+        self._set_size(key, size)
+        self._last_used[key] = time.time()
+        self._evict()
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        self._last_used[key] = now
+        try:
+            os.utime(self._path(key), (now, now))
+        except OSError:
+            pass
+
+    def _set_size(self, key: str, size: int) -> None:
+        self.total_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+    def _remove(self, key: str) -> None:
+        self.total_bytes -= self._sizes.pop(key, 0)
+        self._last_used.pop(key, None)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self._last_used, key=self._last_used.get):
+            if self.total_bytes <= self.max_bytes:
+                break
+            logger.debug(f"Evicting cached PDF {key}")
+            self._remove(key)
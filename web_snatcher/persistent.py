@@ -0,0 +1,297 @@
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import time
+
+from web_snatcher.engine import (
+    PhaseTracker,
+    RenderTimeoutError,
+    ResourceLimits,
+    kill_process_group,
+    spawn,
+)
+from web_snatcher.metrics import RENDER_SECONDS, RENDER_SLOTS, RENDER_SLOTS_BUSY
+from web_snatcher.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# wkhtmltopdf prints this on stderr once it has finished a conversion
+DONE_MARKER = "Done"
+
+# Options that silence the progress output, "Done" included. --log-level takes a
+# value; anything below info hides the marker too.
+QUIET_OPTIONS = {"-q", "--quiet"}
+LOG_LEVEL_OPTION = "--log-level"
+
+# Progress output such as "Loading pages (1/6)" or "[=====>     ] 50%"
+PROGRESS_PATTERN = re.compile(r"^(\[.*\]|.*\(\d+/\d+\))")
+
+
+def quote_arg(arg: str) -> str:
+    """
+    Quote an argument for wkhtmltopdf's --read-args-from-stdin parser.
+
+    Args:
+        arg (str): The argument to quote.
+
+    Returns:
+        str: The argument wrapped in double quotes, with quotes and backslashes escaped.
+    """
+    escaped = arg.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def format_args_line(args: list[str]) -> str:
+    """
+    Format one set of wkhtmltopdf arguments as a single stdin line.
+
+    Args:
+        args (list[str]): The arguments for one conversion.
+
+    Returns:
+        str: The newline-terminated line to write to wkhtmltopdf's stdin.
+    """
+    if any("\n" in arg for arg in args):
+        raise ValueError("wkhtmltopdf arguments cannot contain newlines")
+    return " ".join(quote_arg(arg) for arg in args) + "\n"
+
+
+def strip_quiet_options(options: list[str]) -> list[str]:
+    """
+    Remove the options that would stop wkhtmltopdf reporting the end of each job.
+
+    Args:
+        options (list[str]): The wkhtmltopdf options.
+
+    Returns:
+        list[str]: The options without -q, --quiet or --log-level and its value.
+    """
+    stripped = []
+    arguments = iter(options)
+    for option in arguments:
+        if option == LOG_LEVEL_OPTION:
+            next(arguments, None)
+        elif option not in QUIET_OPTIONS:
+            stripped.append(option)
+    if len(stripped) < len(options):
+        logger.debug("Ignoring quiet options in persistent mode")
+    return stripped
+
+
+class PersistentWorker:
+    """
+    A long-lived wkhtmltopdf process that converts one job at a time.
+
+    The process is started with --read-args-from-stdin, so the Qt/WebKit
+    engine is only initialised once and each job is a single line on stdin.
+    If the process dies, or is killed because a job overran its timeout, it is
+    restarted on the next job. Quiet options are dropped, since the end of each
+    job is read from wkhtmltopdf's progress output.
+    """
+
+    def __init__(self, options: list[str], limits: ResourceLimits | None = None):
+        """
+        Args:
+            options (list[str]): The wkhtmltopdf options to use for every job.
+            limits (ResourceLimits | None): The per-job timeout and the memory limit.
+                CPU time accumulates over the life of the process, so the CPU
+                limit is not applied (default: None).
+        """
+        self.options = options
+        self.limits = limits
+        self.process: asyncio.subprocess.Process | None = None
+
+    async def _ensure_started(self) -> asyncio.subprocess.Process:
+        if self.process is None or self.process.returncode is not None:
+            cmd = ["wkhtmltopdf", "--read-args-from-stdin"]
+            logger.debug(f"Starting persistent process: {' '.join(cmd)}")
+            self.process = await spawn(
+                cmd,
+                self.limits,
+                cpu_limit=False,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        return self.process
+
+    async def convert(
+        self, url: str, output: str, options: list[str] | None = None
+    ) -> None:
+        """
+        Convert a single URL using the long-lived process.
+
+        Args:
+            url (str): The URL of the webpage to convert.
+            output (str): The path where the PDF will be saved.
+            options (list[str] | None): Options for this job only
+                (default: the worker's options).
+
+        Raises:
+            RenderTimeoutError: If the job does not finish within the timeout.
+            subprocess.CalledProcessError: If the conversion fails or the process
+                crashes.
+        """
+        options = self.options if options is None else options
+        args = [*strip_quiet_options(options), url, output]
+        timeout = self.limits.timeout if self.limits else None
+        process = await self._ensure_started()
+
+        # Remove stale output so its presence afterwards means this job succeeded
+        if os.path.exists(output):
+            os.remove(output)
+
+        try:
+            process.stdin.write(format_args_line(args).encode())
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            await self.close()
+            raise subprocess.CalledProcessError(
+                process.returncode or 1, args, output="wkhtmltopdf process exited"
+            )
+
+        started = time.monotonic()
+        try:
+            messages = await asyncio.wait_for(
+                self._wait_for_done(process, args, url), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"wkhtmltopdf timed out after {timeout:g}s converting {url}")
+            await self._kill()
+            raise RenderTimeoutError(args, timeout)
+        except asyncio.CancelledError:
+            # The process is part-way through a job, so it can't be reused
+            await self._kill()
+            raise
+        finally:
+            RENDER_SECONDS.observe(time.monotonic() - started)
+
+        if messages:
+            logger.debug(f"wkhtmltopdf stderr: {' '.join(messages)}")
+
+        if not os.path.exists(output) or os.path.getsize(output) == 0:
+            raise subprocess.CalledProcessError(
+                1, args, output="\n".join(messages) or "No PDF was produced"
+            )
+
+    async def _wait_for_done(
+        self, process: asyncio.subprocess.Process, args: list[str], url: str
+    ) -> list[str]:
+        messages = []
+        phases = PhaseTracker()
+        done = False
+        while not done:
+            line = await process.stderr.readline()
+            if not line:
+                # The process exited, or closed stderr and can't report the end
+                # of the job; either way it is of no more use
+                await self._kill()
+                returncode = process.returncode
+                logger.warning(
+                    f"Persistent wkhtmltopdf exited with code {returncode} while "
+                    f"converting {url}"
+                )
+                raise subprocess.CalledProcessError(
+                    returncode or 1,
+                    args,
+                    output="\n".join(messages)
+                    or f"wkhtmltopdf exited with code {returncode}",
+                )
+            # Progress bars redraw themselves with \r rather than starting new lines
+            for segment in line.decode(errors="replace").split("\r"):
+                segment = segment.strip()
+                phases.segment(segment)
+                if segment == DONE_MARKER:
+                    phases.finish()
+                    done = True
+                elif segment and not PROGRESS_PATTERN.match(segment):
+                    messages.append(segment)
+        return messages
+
+    async def _kill(self) -> None:
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        kill_process_group(process)
+        await process.wait()
+
+    async def close(self) -> None:
+        """
+        Shut the process down, killing it if it does not exit promptly.
+        """
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        if process.returncode is not None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            pass
+        kill_process_group(process)
+        await process.wait()
+
+
+class PersistentPool:
+    """
+    A fixed-size pool of persistent wkhtmltopdf workers shared between tasks.
+    """
+
+    def __init__(
+        self, size: int, options: list[str], limits: ResourceLimits | None = None
+    ):
+        """
+        Args:
+            size (int): The number of wkhtmltopdf processes to keep alive.
+            options (list[str]): The wkhtmltopdf options to use for every job.
+            limits (ResourceLimits | None): The per-job timeout and memory limit
+                (default: None).
+        """
+        self._workers: asyncio.Queue[PersistentWorker] = asyncio.Queue()
+        self._all = [PersistentWorker(options, limits) for _ in range(size)]
+        for worker in self._all:
+            self._workers.put_nowait(worker)
+        RENDER_SLOTS.set(size)
+
+    async def convert(
+        self, url: str, output: str, options: list[str] | None = None
+    ) -> None:
+        """
+        Convert a URL on the next free worker, waiting until one is available.
+
+        Args:
+            url (str): The URL of the webpage to convert.
+            output (str): The path where the PDF will be saved.
+            options (list[str] | None): Options for this job only
+                (default: the pool's options).
+
+        Raises:
+            RenderTimeoutError: If the job does not finish within the timeout.
+            subprocess.CalledProcessError: If the conversion fails.
+        """
+        with span("wait for render slot"):
+            worker = await self._workers.get()
+        RENDER_SLOTS_BUSY.inc()
+        try:
+            await worker.convert(url, output, options)
+        finally:
+            RENDER_SLOTS_BUSY.dec()
+            self._workers.put_nowait(worker)
+
+    async def close(self) -> None:
+        """
+        Shut down every worker in the pool.
+        """
+        await asyncio.gather(*(worker.close() for worker in self._all))
+
+    async def __aenter__(self) -> "PersistentPool":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterable, Protocol
+
+from web_snatcher.defaults import DEFAULT_FETCHERS
+from web_snatcher.metrics import PAGES_AWAITING_RENDER
+from web_snatcher.ratelimit import DomainPermit, domain_of
+from web_snatcher.snatcher import PreparedPage, Snatcher
+from web_snatcher.tracing import (
+    active_tracer,
+    current_track,
+    new_track,
+    span,
+    use_track,
+)
+
+logger = logging.getLogger(__name__)
+
+# Jobs read ahead of the fetchers per fetcher, so that jobs for other domains
+# can overtake those waiting on a throttled domain
+BACKLOG_PER_FETCHER = 8
+
+
+class Job(Protocol):
+    url: str
+    output: str
+
+
+@dataclass
+class _Fetched:
+    job: Job
+    page: PreparedPage
+    started: float
+    queued: float
+    track: int
+    permit: DomainPermit | None
+
+
+class Pipeline:
+    """
+    Converts jobs in two stages, each with its own concurrency.
+
+    Fetchers download pages and check the caches; render workers run wkhtmltopdf
+    on what they hand over. A bounded queue between the stages provides
+    backpressure: once `fetch_ahead` pages are waiting to be rendered, fetchers
+    stop taking new jobs, so fetching faster than the CPU can render does not
+    pile documents up in memory.
+
+    Jobs reach the fetchers through a lane per domain, which waits for the
+    domain's rate limit before handing over its next job. A throttled domain
+    therefore holds back its own jobs without taking up fetchers or render
+    workers, while jobs for other domains in the backlog keep flowing.
+    """
+
+    def __init__(
+        self,
+        snatcher: Snatcher,
+        fetchers: int = DEFAULT_FETCHERS,
+        renderers: int | None = None,
+        fetch_ahead: int | None = None,
+        backlog: int | None = None,
+        on_start: Callable[[Job], None] | None = None,
+        on_finish: Callable[[Job, Exception | None, float], None] | None = None,
+    ):
+        """
+        Args:
+            snatcher (Snatcher): The resources the jobs are converted with.
+            fetchers (int): The number of pages fetched at once (default: 16).
+            renderers (int | None): The number of render workers (default: CPU count).
+            fetch_ahead (int | None): The number of fetched pages allowed to wait
+                for a render worker (default: twice the number of render workers).
+            backlog (int | None): The number of jobs read ahead of the fetchers,
+                sorted into per-domain lanes (default: 8 per fetcher).
+            on_start (Callable[[Job], None] | None): Called when a fetcher picks
+                up a job (default: None).
+            on_finish (Callable[[Job, Exception | None, float], None] | None): Called
+                with the job, the exception it failed with or None, and the seconds
+                since it started (default: None).
+        """
+        if fetchers < 1:
+            raise ValueError("At least one fetcher is needed")
+        self.snatcher = snatcher
+        self.fetchers = fetchers
+        self.renderers = max(renderers or os.cpu_count() or 1, 1)
+        self.fetch_ahead = max(fetch_ahead or self.renderers * 2, 1)
+        self.backlog = max(backlog or self.fetchers * BACKLOG_PER_FETCHER, 1)
+        self.on_start = on_start
+        self.on_finish = on_finish
+
+    async def run(self, jobs: Iterable[Job]) -> None:
+        """
+        Convert every job, returning once all of them have finished.
+
+        Failures are reported through `on_finish` rather than raised.
+
+        Args:
+            jobs (Iterable[Job]): The jobs, each with a url and an output path.
+        """
+        # Jobs are handed out one at a time, right after their domain's permit is
+        # granted, so only pages being worked on are held
+        pending: asyncio.Queue[tuple[Job, DomainPermit] | None] = asyncio.Queue(
+            maxsize=1
+        )
+        fetched: asyncio.Queue[_Fetched | None] = asyncio.Queue(
+            maxsize=self.fetch_ahead
+        )
+        PAGES_AWAITING_RENDER.set_function(fetched.qsize)
+
+        async def fetch_all() -> None:
+            async with asyncio.TaskGroup() as fetchers:
+                for _ in range(self.fetchers):
+                    fetchers.create_task(self._fetch_worker(pending, fetched))
+                await self._dispatch(jobs, pending)
+                for _ in range(self.fetchers):
+                    await pending.put(None)
+            for _ in range(self.renderers):
+                await fetched.put(None)
+
+        try:
+            async with asyncio.TaskGroup() as stages:
+                stages.create_task(fetch_all())
+                for _ in range(self.renderers):
+                    stages.create_task(self._render_worker(fetched))
+        finally:
+            PAGES_AWAITING_RENDER.set_function(None)
+
+    async def _dispatch(self, jobs: Iterable[Job], pending: asyncio.Queue) -> None:
+        backlog = asyncio.Semaphore(self.backlog)
+        lanes: dict[str, deque[Job]] = {}
+        async with asyncio.TaskGroup() as dispatchers:
+            for job in jobs:
+                await backlog.acquire()
+                try:
+                    domain = domain_of(job.url)
+                except ValueError:
+                    domain = ""
+                lane = lanes.get(domain)
+                if lane is None:
+                    lane = lanes[domain] = deque()
+                    dispatchers.create_task(
+                        self._drain_lane(domain, lanes, pending, backlog)
+                    )
+                lane.append(job)
+
+    async def _drain_lane(
+        self,
+        domain: str,
+        lanes: dict[str, deque[Job]],
+        pending: asyncio.Queue,
+        backlog: asyncio.Semaphore,
+    ) -> None:
+        lane = lanes[domain]
+        while lane:
+            job = lane.popleft()
+            backlog.release()
+            try:
+                permit = await self.snatcher.limiter.acquire(job.url)
+            except Exception as e:
+                self._finish(job, e, time.monotonic())
+                continue
+            await pending.put((job, permit))
+        # The lane is dropped as soon as it runs dry, and recreated by the next job
+        del lanes[domain]
+
+    async def _fetch_worker(
+        self, pending: asyncio.Queue, fetched: asyncio.Queue
+    ) -> None:
+        while (item := await pending.get()) is not None:
+            job, permit = item
+            new_track(job.url)
+            if self.on_start:
+                self.on_start(job)
+            started = time.monotonic()
+            try:
+                with span("prepare", url=job.url):
+                    page = await self.snatcher.prepare(
+                        job.url, job.output, permit=permit
+                    )
+            except Exception as e:
+                permit.release()
+                self._finish(job, e, started)
+                continue
+            if page.done or page.html is not None:
+                # The page's request is done; otherwise wkhtmltopdf makes it
+                permit.release()
+                permit = None
+            if page.done:
+                self._finish(job, None, started)
+                continue
+            tracer = active_tracer()
+            queued = tracer.now() if tracer else 0.0
+            # Blocks while the render queue is full, holding this fetcher back
+            await fetched.put(
+                _Fetched(job, page, started, queued, current_track(), permit)
+            )
+
+    async def _render_worker(self, fetched: asyncio.Queue) -> None:
+        while (item := await fetched.get()) is not None:
+            use_track(item.track)
+            tracer = active_tracer()
+            if tracer:
+                tracer.record("awaiting render", item.queued, tracer.now())
+            try:
+                await self.snatcher.render_prepared(item.page, item.permit)
+            except Exception as e:
+                self._finish(item.job, e, item.started)
+                continue
+            finally:
+                if item.permit:
+                    item.permit.release()
+            self._finish(item.job, None, item.started)
+
+    def _finish(self, job: Job, error: Exception | None, started: float) -> None:
+        if self.on_finish:
+            self.on_finish(job, error, time.monotonic() - started)
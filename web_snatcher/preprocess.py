@@ -0,0 +1,164 @@
+import html
+import re
+
+from web_snatcher.fetch import parse_attributes, parse_srcset
+
+IMG_PATTERN = re.compile(rb"<img\b[^>]*>", re.IGNORECASE)
+NOSCRIPT_PATTERN = re.compile(
+    rb"<noscript\b[^>]*>(.*?)</noscript\s*>", re.IGNORECASE | re.DOTALL
+)
+# An existing src attribute, but not data-src and the like
+SRC_PATTERN = re.compile(
+    rb"""(?<=\s)src\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE
+)
+
+# Attributes lazy-loading scripts keep the real image URL in, most common first
+LAZY_SRC_ATTRIBUTES = (
+    b"data-src",
+    b"data-lazy-src",
+    b"data-original",
+    b"data-lazy",
+    b"data-url",
+)
+LAZY_SRCSET_ATTRIBUTES = (b"data-srcset", b"data-lazy-srcset", b"srcset")
+
+# The width, in CSS pixels, images are printed at on an A4 page with our margins.
+# The smallest srcset candidate at least this wide is picked.
+PRINT_WIDTH = 800
+
+
+def pick_from_srcset(srcset: bytes) -> bytes | None:
+    """
+    Pick the image to print from a srcset.
+
+    Args:
+        srcset (bytes): The srcset, e.g. b"small.jpg 400w, large.jpg 1200w".
+
+    Returns:
+        bytes | None: The smallest candidate at least PRINT_WIDTH wide, the widest
+            candidate if none is, or None if the srcset is empty.
+    """
+    candidates = []
+    for url, descriptor in parse_srcset(srcset):
+        descriptor = descriptor.lower()
+        if descriptor.endswith(b"w") and descriptor[:-1].isdigit():
+            width = int(descriptor[:-1])
+        elif descriptor.endswith(b"x"):
+            try:
+                width = int(float(descriptor[:-1]) * PRINT_WIDTH)
+            except ValueError:
+                width = 0
+        else:
+            width = 0
+        candidates.append((width, url))
+    if not candidates:
+        return None
+    wide_enough = [candidate for candidate in candidates if candidate[0] >= PRINT_WIDTH]
+    if wide_enough:
+        return min(wide_enough)[1]
+    return max(candidates)[1]
+
+
+def lazy_source(attributes: dict[bytes, bytes]) -> bytes | None:
+    """
+    Find the real image URL of a lazy-loaded <img>.
+
+    Args:
+        attributes (dict[bytes, bytes]): The image's attributes.
+
+    Returns:
+        bytes | None: The URL that belongs in src, or None if src is already right.
+    """
+    for name in LAZY_SRC_ATTRIBUTES:
+        value = attributes.get(name, b"").strip()
+        if value and value != attributes.get(b"src"):
+            return value
+    src = attributes.get(b"src", b"").strip()
+    if src and not src.startswith(b"data:"):
+        return None
+    # No src, or only an inline placeholder: fall back to the srcset, which
+    # wkhtmltopdf's WebKit does not understand
+    for name in LAZY_SRCSET_ATTRIBUTES:
+        value = attributes.get(name, b"").strip()
+        if value:
+            return pick_from_srcset(
+                html.unescape(value.decode(errors="replace")).encode()
+            )
+    return None
+
+
+def promote_lazy_images(content: bytes) -> tuple[bytes, set[bytes]]:
+    """
+    Move lazy-loaded image URLs into src, so images appear without JavaScript.
+
+    Args:
+        content (bytes): The HTML document.
+
+    Returns:
+        tuple[bytes, set[bytes]]: The rewritten document, and the image URLs that
+            were promoted.
+    """
+    promoted: set[bytes] = set()
+
+    def rewrite(match: re.Match) -> bytes:
+        tag = match.group()
+        source = lazy_source(parse_attributes(tag))
+        if source is None:
+            return tag
+        promoted.add(source)
+        tag = SRC_PATTERN.sub(b"", tag)
+        quoted = html.escape(html.unescape(source.decode(errors="replace")), quote=True)
+        return tag[:4] + f' src="{quoted}"'.encode() + tag[4:]
+
+    return IMG_PATTERN.sub(rewrite, content), promoted
+
+
+def inline_noscript(content: bytes, promoted: set[bytes] = frozenset()) -> bytes:
+    """
+    Replace <noscript> elements with their content, as a browser with JavaScript
+    disabled would show it.
+
+    A <noscript> that only repeats images already promoted from lazy attributes
+    is dropped instead, so those images are not printed twice.
+
+    Args:
+        content (bytes): The HTML document.
+        promoted (set[bytes]): Image URLs already promoted (default: none).
+
+    Returns:
+        bytes: The rewritten document.
+    """
+
+    def rewrite(match: re.Match) -> bytes:
+        inner = match.group(1)
+        images = IMG_PATTERN.findall(inner)
+        if images and not IMG_PATTERN.sub(b"", inner).strip():
+            sources = {
+                parse_attributes(image).get(b"src", b"").strip() for image in images
+            }
+            if sources <= promoted:
+                return b""
+        return inner
+
+    return NOSCRIPT_PATTERN.sub(rewrite, content)
+
+
+def preprocess(content: bytes, javascript: bool = True) -> bytes:
+    """
+    Prepare a fetched document for rendering.
+
+    Lazy-loaded images are given a real src. When the page will be rendered with
+    JavaScript disabled, <noscript> fallbacks are inlined as well.
+
+    Args:
+        content (bytes): The HTML document.
+        javascript (bool): Whether the page will be rendered with JavaScript enabled
+            (default: True).
+
+    Returns:
+        bytes: The rewritten document.
+    """
+    content, promoted = promote_lazy_images(content)
+    if not javascript:
+        content = inline_noscript(content, promoted)
+    return content
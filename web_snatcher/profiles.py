@@ -0,0 +1,283 @@
+import dataclasses
+import os
+import tomllib
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+from web_snatcher.readiness import Readiness, domain_matches, parse_readiness
+
+DEFAULT_PROFILE = "default"
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    """
+    A named set of wkhtmltopdf settings.
+
+    Attributes:
+        name (str): The profile's name, e.g. "fast-text".
+        page_size (str): The paper size (default: A4).
+        margin (str): The margin on every side (default: 0.75in).
+        javascript (bool): Whether to run the page's scripts. Profiles without
+            JavaScript use the "static" readiness mode (default: True).
+        images (bool): Whether to load and print images (default: True).
+        lowquality (bool): Render at a lower resolution, for smaller, faster PDFs
+            (default: False).
+        image_dpi (int | None): The resolution embedded images are downsampled to
+            (default: wkhtmltopdf's default).
+        image_quality (int | None): The JPEG quality of embedded images
+            (default: wkhtmltopdf's default).
+        viewport (str | None): The browser window size as WIDTHxHEIGHT, for sites
+            with a different layout on small screens (default: wkhtmltopdf's default).
+        readiness (str | None): The readiness mode as MODE[:MS], or None to use
+            the run's readiness setting (default: None).
+        options (tuple[str, ...]): Further wkhtmltopdf options, appended as given
+            (default: none).
+    """
+
+    name: str = DEFAULT_PROFILE
+    page_size: str = "A4"
+    margin: str = "0.75in"
+    javascript: bool = True
+    images: bool = True
+    lowquality: bool = False
+    image_dpi: int | None = None
+    image_quality: int | None = None
+    viewport: str | None = None
+    readiness: str | None = None
+    options: tuple[str, ...] = ()
+
+    def wkhtmltopdf_options(self) -> list[str]:
+        """
+        Build the wkhtmltopdf options for this profile, other than readiness.
+
+        Returns:
+            list[str]: The options.
+        """
+        options = ["--page-size", self.page_size]
+        for side in ("top", "right", "bottom", "left"):
+            options += [f"--margin-{side}", self.margin]
+        options += ["--encoding", "UTF-8"]
+        if self.javascript:
+            options.append("--no-stop-slow-scripts")
+        if not self.images:
+            options.append("--no-images")
+        if self.lowquality:
+            options.append("--lowquality")
+        if self.image_dpi:
+            options += ["--image-dpi", str(self.image_dpi)]
+        if self.image_quality:
+            options += ["--image-quality", str(self.image_quality)]
+        if self.viewport:
+            options += ["--viewport-size", self.viewport]
+        return [*options, *self.options]
+
+    def readiness_mode(self) -> Readiness | None:
+        """
+        Get the readiness mode this profile requires.
+
+        Returns:
+            Readiness | None: The static mode for profiles without JavaScript, the
+                profile's own mode, or None to use the run's readiness setting.
+        """
+        if not self.javascript:
+            return Readiness("static")
+        return parse_readiness(self.readiness) if self.readiness else None
+
+
+BUILTIN_PROFILES = {
+    profile.name: profile
+    for profile in (
+        RenderProfile(),
+        RenderProfile("fast-text", javascript=False, images=False, lowquality=True),
+        RenderProfile(
+            "full-fidelity", image_dpi=300, image_quality=94, readiness="adaptive:3000"
+        ),
+        RenderProfile("mobile", page_size="A5", margin="0.4in", viewport="414x896"),
+    )
+}
+
+# TOML keys and the RenderProfile fields they set
+PROFILE_KEYS = {
+    "page-size": ("page_size", str),
+    "margin": ("margin", str),
+    "javascript": ("javascript", bool),
+    "images": ("images", bool),
+    "lowquality": ("lowquality", bool),
+    "image-dpi": ("image_dpi", int),
+    "image-quality": ("image_quality", int),
+    "viewport": ("viewport", str),
+    "readiness": ("readiness", str),
+    "options": ("options", list),
+}
+
+
+@dataclass
+class ProfilePolicy:
+    """
+    The render profile to use for each page, with per-domain defaults.
+
+    Attributes:
+        profiles (dict[str, RenderProfile]): The profiles, keyed by name.
+        default (str): The profile used when no domain mapping matches.
+        domains (dict[str, str]): Profile names keyed by domain. A domain also
+            matches its subdomains, and the most specific match wins.
+    """
+
+    profiles: dict[str, RenderProfile] = field(
+        default_factory=lambda: dict(BUILTIN_PROFILES)
+    )
+    default: str = DEFAULT_PROFILE
+    domains: dict[str, str] = field(default_factory=dict)
+
+    def get(self, name: str) -> RenderProfile:
+        """
+        Get a profile by name.
+
+        Args:
+            name (str): The profile's name.
+
+        Returns:
+            RenderProfile: The profile.
+
+        Raises:
+            ValueError: If there is no such profile.
+        """
+        try:
+            return self.profiles[name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown render profile '{name}', expected one of "
+                f"{tuple(self.profiles)}"
+            )
+
+    def for_url(self, url: str) -> RenderProfile:
+        """
+        Get the profile for a URL.
+
+        Args:
+            url (str): The URL of the page being converted.
+
+        Returns:
+            RenderProfile: The profile mapped to the URL's domain, or the default.
+        """
+        host = (urlparse(url).hostname or "").lower()
+        matches = [domain for domain in self.domains if domain_matches(host, domain)]
+        if not matches:
+            return self.profiles[self.default]
+        return self.profiles[self.domains[max(matches, key=len)]]
+
+
+def default_profiles_path() -> str:
+    """
+    Get the path of the profiles file read when none is given, honouring
+    XDG_CONFIG_HOME.
+
+    Returns:
+        str: The path to profiles.toml in the web-snatcher config directory.
+    """
+    base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(
+        os.path.expanduser("~"), ".config"
+    )
+    return os.path.join(base, "web-snatcher", "profiles.toml")
+
+
+def parse_profile(
+    name: str, table: dict, profiles: dict[str, RenderProfile]
+) -> RenderProfile:
+    """
+    Build a profile from its table in the profiles file.
+
+    Args:
+        name (str): The profile's name.
+        table (dict): The profile's settings. "extends" names the profile it
+            starts from (default: the built-in profile of the same name, if
+            there is one, otherwise "default").
+        profiles (dict[str, RenderProfile]): The profiles defined so far.
+
+    Returns:
+        RenderProfile: The profile.
+
+    Raises:
+        ValueError: If a setting is unknown or has the wrong type.
+    """
+    if not isinstance(table, dict):
+        raise ValueError(f"Profile '{name}' should be a table")
+    base_name = table.get("extends", name if name in profiles else DEFAULT_PROFILE)
+    if base_name not in profiles:
+        raise ValueError(f"Profile '{name}' extends unknown profile '{base_name}'")
+    changes = {"name": name}
+    for key, value in table.items():
+        if key == "extends":
+            continue
+        if key not in PROFILE_KEYS:
+            raise ValueError(f"Unknown setting '{key}' in profile '{name}'")
+        attribute, kind = PROFILE_KEYS[key]
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ValueError(
+                f"Setting '{key}' in profile '{name}' should be of type {kind.__name__}"
+            )
+        if kind is list:
+            value = tuple(str(option) for option in value)
+        changes[attribute] = value
+    profile = dataclasses.replace(profiles[base_name], **changes)
+    # Fail now rather than on the first page using the profile
+    profile.readiness_mode()
+    return profile
+
+
+def load_profiles(path: str | None = None, default: str | None = None) -> ProfilePolicy:
+    """
+    Load render profiles from a TOML file, on top of the built-in ones.
+
+    The file may set `default`, the profile used for pages without a domain
+    mapping; define or override profiles in `[profiles.NAME]` tables; and map
+    domains to profiles in a `[domains]` table, e.g. `"the42.ie" = "fast-text"`.
+
+    Args:
+        path (str | None): The file, or None to read the default profiles file if
+            it exists (default: None).
+        default (str | None): Overrides the file's default profile (default: None).
+
+    Returns:
+        ProfilePolicy: The profiles and domain mappings.
+
+    Raises:
+        ValueError: If the file can't be read or is invalid, or a profile is unknown.
+    """
+    config: dict = {}
+    if path or os.path.exists(default_profiles_path()):
+        path = path or default_profiles_path()
+        try:
+            with open(path, "rb") as f:
+                config = tomllib.load(f)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            raise ValueError(f"Could not read profiles from {path}: {e}")
+
+    profiles = dict(BUILTIN_PROFILES)
+    tables = config.get("profiles", {})
+    pending = dict(tables)
+    # Define profiles in dependency order, so any profile can extend any other
+    while pending:
+        ready = [
+            name
+            for name, table in pending.items()
+            if not isinstance(table, dict)
+            or table.get("extends", name) == name
+            or table["extends"] not in pending
+        ]
+        if not ready:
+            raise ValueError(
+                f"Profiles extend each other in a cycle: {sorted(pending)}"
+            )
+        for name in ready:
+            profiles[name] = parse_profile(name, pending.pop(name), profiles)
+
+    policy = ProfilePolicy(
+        profiles,
+        default or config.get("default", DEFAULT_PROFILE),
+        {domain.lower(): name for domain, name in config.get("domains", {}).items()},
+    )
+    for name in (policy.default, *policy.domains.values()):
+        policy.get(name)
+    return policy
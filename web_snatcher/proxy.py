@@ -0,0 +1,788 @@
+import asyncio
+import html
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from urllib.parse import urljoin, urlsplit
+
+import httpx
+
+from web_snatcher.blocklist import Blocklist
+from web_snatcher.fetch import create_client, parse_attributes, parse_srcset
+from web_snatcher.http_cache import CacheEntry, HttpCache
+from web_snatcher.metrics import BLOCKED_REQUESTS, PROXY_BYTES, PROXY_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 64 * 1024
+
+# Bodies up to MAX_MEMORY_ENTRY_BYTES are also kept in memory, up to
+# DEFAULT_MEMORY_BYTES in total, so hot assets such as fonts skip the disk
+DEFAULT_MEMORY_BYTES = 64 * 1024 * 1024
+MAX_MEMORY_ENTRY_BYTES = 1024 * 1024
+
+# How many rewritten asset URLs are remembered for upgrading back to HTTPS. The
+# oldest are forgotten first; by then the pages that use them have rendered.
+MAX_UPGRADED_URLS = 100_000
+
+# Heuristic freshness for responses with only Last-Modified: a tenth of their
+# age, capped at a day (RFC 9111, section 4.2.2)
+HEURISTIC_FRACTION = 0.1
+MAX_HEURISTIC_AGE = 24 * 3600.0
+
+TUNNEL_CHUNK_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 30.0
+
+# Tags whose URL attributes wkhtmltopdf downloads as part of the page, and
+# those attributes. <a href> is left alone, so links in the PDF keep pointing
+# at the real site.
+ASSET_TAG_PATTERN = re.compile(
+    rb"<(?:img|link|script|source|video|audio|track|embed|input|iframe)\s[^>]*>",
+    re.IGNORECASE,
+)
+ASSET_ATTRIBUTE_PATTERN = re.compile(
+    rb"""(?<=\s)(src|href|srcset|poster)(\s*=\s*)("[^"]*"|'[^']*'|[^\s>]+)""",
+    re.IGNORECASE,
+)
+# Absolute HTTPS URLs in <style> blocks and style attributes, and the rest of
+# such a URL after its scheme
+CSS_URL_PATTERN = re.compile(rb"""(url\(\s*["']?)https://""", re.IGNORECASE)
+CSS_URL_REST_PATTERN = re.compile(rb"""[^\s"')]+""")
+BASE_TAG_PATTERN = re.compile(rb"<base\s[^>]*>", re.IGNORECASE)
+
+# Headers that only apply to a single connection, and are never forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Request headers dropped on the way upstream: httpx sets the host and length,
+# and negotiates its own content encoding since it decodes bodies itself
+DROPPED_REQUEST_HEADERS = HOP_BY_HOP_HEADERS | {
+    "host",
+    "content-length",
+    "accept-encoding",
+}
+
+# Response headers dropped on the way back: bodies are sent decoded, with
+# their own length
+DROPPED_RESPONSE_HEADERS = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"}
+
+# Response headers kept with a cached asset, besides its Content-Type
+REPLAYED_HEADERS = ("Access-Control-Allow-Origin", "Cache-Control", "Content-Language")
+
+
+class ProxyError(Exception):
+    """
+    Raised while handling a proxied request to send an error response.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class ProxyStats:
+    """
+    Counts of how the proxy served wkhtmltopdf's requests.
+
+    Attributes:
+        hits (int): Requests answered from the cache without contacting the site.
+        revalidated (int): Requests answered from the cache after a 304 Not Modified.
+        misses (int): Requests fetched from the site.
+        tunnels (int): HTTPS connections passed through, which can't be cached.
+        errors (int): Requests that failed upstream.
+        blocked (int): Requests and tunnels refused because of the blocklist.
+        cached_bytes (int): Bytes served from the cache.
+        fetched_bytes (int): Bytes fetched from sites.
+    """
+
+    hits: int = 0
+    revalidated: int = 0
+    misses: int = 0
+    tunnels: int = 0
+    errors: int = 0
+    blocked: int = 0
+    cached_bytes: int = 0
+    fetched_bytes: int = 0
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.revalidated + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The share of requests not tunnelled that were answered from the cache,
+        from 0 to 1.
+        """
+        return (self.hits + self.revalidated) / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> dict:
+        return {**asdict(self), "requests": self.requests, "hit_rate": self.hit_rate}
+
+
+def parse_cache_control(value: str) -> dict[str, str | None]:
+    """
+    Parse a Cache-Control header into its directives.
+
+    Args:
+        value (str): The header value, e.g. 'public, max-age=3600'.
+
+    Returns:
+        dict[str, str | None]: Each directive, lowercased, mapped to its argument
+            or to None if it has none.
+    """
+    directives = {}
+    for part in value.split(","):
+        name, sep, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') if sep else None
+    return directives
+
+
+def is_cacheable(method: str, response: httpx.Response) -> bool:
+    """
+    Check whether a response may be stored and served to later renders.
+
+    Args:
+        method (str): The request method.
+        response (httpx.Response): The response.
+
+    Returns:
+        bool: True for successful GETs that are not private, marked no-store,
+            setting cookies or varying on anything but their encoding.
+    """
+    if method != "GET" or response.status_code != HTTPStatus.OK:
+        return False
+    directives = parse_cache_control(response.headers.get("Cache-Control", ""))
+    if "no-store" in directives or "private" in directives:
+        return False
+    if "set-cookie" in response.headers:
+        return False
+    vary = {
+        name.strip().lower() for name in response.headers.get("Vary", "").split(",")
+    }
+    return vary <= {"", "accept-encoding"}
+
+
+def freshness_lifetime(headers: httpx.Headers) -> float:
+    """
+    Work out how long a response may be reused without revalidating it.
+
+    Args:
+        headers (httpx.Headers): The response headers.
+
+    Returns:
+        float: The lifetime in seconds, from s-maxage, max-age or Expires, or
+            estimated from Last-Modified. 0 if it must always be revalidated.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name):
+            try:
+                return max(0.0, float(directives[name]))
+            except ValueError:
+                return 0.0
+
+    try:
+        date = time.time()
+        if "Date" in headers:
+            date = parsedate_to_datetime(headers["Date"]).timestamp()
+        if "Expires" in headers:
+            return max(
+                0.0, parsedate_to_datetime(headers["Expires"]).timestamp() - date
+            )
+        if "Last-Modified" in headers:
+            age = date - parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+            return min(max(0.0, age * HEURISTIC_FRACTION), MAX_HEURISTIC_AGE)
+    except (TypeError, ValueError):
+        pass
+    return 0.0
+
+
+def document_base(content: bytes, url: str) -> str:
+    """
+    Find the URL a document's relative links resolve against.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from.
+
+    Returns:
+        str: The href of its <base> element, if it has one, otherwise the URL.
+    """
+    match = BASE_TAG_PATTERN.search(content)
+    href = parse_attributes(match.group()).get(b"href") if match else None
+    if href is None:
+        return url
+    return urljoin(url, html.unescape(href.decode("utf-8", "replace")))
+
+
+def request_key(url: str) -> str:
+    """
+    Normalize a URL the way it appears in a request, so an asset URL written in
+    a page matches the request wkhtmltopdf makes for it.
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The URL with its host lowercased, its path and query percent-encoded
+            and no fragment, or the URL as given if it cannot be parsed.
+    """
+    try:
+        return str(httpx.URL(url).copy_with(fragment=None))
+    except (httpx.InvalidURL, ValueError):
+        return url
+
+
+def downgrade_asset_urls(content: bytes, url: str) -> tuple[bytes, set[str]]:
+    """
+    Rewrite the HTTPS asset URLs of a document to plain HTTP.
+
+    Relative asset URLs are made absolute first, so those of an HTTPS page
+    are rewritten too.
+
+    Args:
+        content (bytes): The HTML document.
+        url (str): The URL the document was fetched from.
+
+    Returns:
+        tuple[bytes, set[str]]: The rewritten document, and the plain HTTP URLs
+            it now refers to in place of HTTPS ones.
+    """
+    base = document_base(content, url)
+    downgraded = set()
+
+    def downgrade(value: bytes) -> bytes:
+        text = html.unescape(value.decode("utf-8", "replace")).strip()
+        if not text or text.startswith(("data:", "javascript:", "#")):
+            return value
+        try:
+            absolute = urljoin(base, text)
+            parts = urlsplit(absolute)
+        except ValueError:
+            return value
+        if parts.scheme != "https" or not parts.netloc:
+            return value
+        plain = "http" + absolute[len("https") :]
+        downgraded.add(plain)
+        return html.escape(plain, quote=True).encode()
+
+    def downgrade_srcset(value: bytes) -> bytes:
+        return b", ".join(
+            downgrade(link) + (b" " + descriptor if descriptor else b"")
+            for link, descriptor in parse_srcset(value)
+        )
+
+    def rewrite_attribute(match: re.Match) -> bytes:
+        name, equals, value = match.groups()
+        quote = value[:1] if value[:1] in (b'"', b"'") else b""
+        inner = value[1:-1] if quote else value
+        if name.lower() == b"srcset":
+            inner = downgrade_srcset(inner)
+        else:
+            inner = downgrade(inner)
+        return name + equals + quote + inner + quote
+
+    def rewrite_tag(match: re.Match) -> bytes:
+        return ASSET_ATTRIBUTE_PATTERN.sub(rewrite_attribute, match.group())
+
+    def rewrite_css(match: re.Match) -> bytes:
+        return match.group(1) + b"http://"
+
+    content = ASSET_TAG_PATTERN.sub(rewrite_tag, content)
+    for match in CSS_URL_PATTERN.finditer(content):
+        rest = CSS_URL_REST_PATTERN.match(content, match.end())
+        if rest:
+            text = html.unescape(rest.group().decode("utf-8", "replace"))
+            downgraded.add("http://" + text)
+    content = CSS_URL_PATTERN.sub(rewrite_css, content)
+    return content, downgraded
+
+
+async def read_head(
+    reader: asyncio.StreamReader,
+) -> tuple[str, str, str, dict[str, str]] | None:
+    """
+    Read the request line and headers of the next request on a connection.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader.
+
+    Returns:
+        tuple[str, str, str, dict[str, str]] | None: The method, target, HTTP
+            version and headers (with lowercased names), or None if the client
+            closed the connection.
+
+    Raises:
+        ProxyError: If the request is malformed or its headers are too large.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ProxyError(
+            HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers too large"
+        )
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise ProxyError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, version, headers
+
+
+def wants_keep_alive(version: str, headers: dict[str, str]) -> bool:
+    """
+    Check whether the client expects the connection to stay open after a response.
+
+    Args:
+        version (str): The request's HTTP version, e.g. "HTTP/1.1".
+        headers (dict[str, str]): The request headers, with lowercased names.
+
+    Returns:
+        bool: True unless the client asked to close, or speaks HTTP/1.0 without
+            asking for keep-alive.
+    """
+    connection = (
+        headers.get("proxy-connection") or headers.get("connection") or ""
+    ).lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+async def pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Copy bytes from one connection to another until the first one closes.
+
+    Args:
+        reader (asyncio.StreamReader): The connection to read from.
+        writer (asyncio.StreamWriter): The connection to write to.
+    """
+    try:
+        while data := await reader.read(TUNNEL_CHUNK_SIZE):
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class AssetProxy:
+    """
+    A local forward proxy that caches the assets wkhtmltopdf downloads.
+
+    Each wkhtmltopdf process starts with an empty cache, so every page of a
+    site downloads the same stylesheets, fonts, logos and scripts again.
+    Pointed at this proxy with `--proxy`, every render shares one cache,
+    kept on disk between runs and in memory for the hottest assets. Assets
+    are reused for as long as their Cache-Control or Expires headers allow,
+    then revalidated with a conditional request.
+
+    HTTPS requests reach the proxy as CONNECT tunnels, whose contents are
+    encrypted end to end, so they are passed through but can't be cached.
+    To cache them anyway, `route_https` rewrites the HTTPS asset URLs of a
+    pre-fetched document to plain HTTP, and the proxy fetches those over
+    HTTPS. Assets whose URLs it can't see are still tunnelled: HTTPS URLs
+    inside stylesheets, those added by scripts, and all of those of pages
+    wkhtmltopdf fetches itself.
+
+    With a blocklist, requests for blocked URLs get an immediate empty 204
+    response, and tunnels to blocked hosts are refused.
+    """
+
+    def __init__(
+        self,
+        cache: HttpCache | None = None,
+        memory_bytes: int = DEFAULT_MEMORY_BYTES,
+        max_connections: int = 20,
+        host: str = "127.0.0.1",
+        blocklist: Blocklist | None = None,
+    ):
+        """
+        Args:
+            cache (HttpCache | None): The on-disk store for cached assets, or None
+                to only keep them in memory for this run (default: None).
+            memory_bytes (int): The total size of assets kept in memory
+                (default: 64 MiB).
+            max_connections (int): The maximum number of connections to sites
+                (default: 20).
+            host (str): The interface to listen on (default: 127.0.0.1).
+            blocklist (Blocklist | None): Hosts and URL patterns not to fetch
+                (default: None).
+        """
+        self.cache = cache
+        self.memory_bytes = memory_bytes
+        self.max_connections = max_connections
+        self.host = host
+        self.blocklist = blocklist
+        self.url: str | None = None
+        self.stats = ProxyStats()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used = 0
+        self._memory_entries: dict[str, CacheEntry] = {}
+        self._upgraded: OrderedDict[str, None] = OrderedDict()
+        self._client: httpx.AsyncClient | None = None
+        self._server: asyncio.Server | None = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> str:
+        """
+        Start listening on a free port, if the proxy is not running yet.
+
+        Returns:
+            str: The proxy's URL, to pass to wkhtmltopdf's `--proxy`.
+        """
+        async with self._lock:
+            if self._server is None:
+                self._client = create_client(self.max_connections)
+                self._server = await asyncio.start_server(
+                    self._handle, self.host, 0, limit=MAX_HEADER_BYTES
+                )
+                port = self._server.sockets[0].getsockname()[1]
+                self.url = f"http://{self.host}:{port}"
+                logger.info(f"Asset proxy listening on {self.url}")
+        return self.url
+
+    def options(self) -> list[str]:
+        """
+        Get the wkhtmltopdf options that send its requests through the proxy.
+
+        Returns:
+            list[str]: The options, or an empty list if the proxy is not running.
+        """
+        return ["--proxy", self.url] if self.url else []
+
+    def route_https(self, content: bytes, url: str) -> bytes:
+        """
+        Send a document's HTTPS assets through the proxy's cache.
+
+        Their URLs are rewritten to plain HTTP, so wkhtmltopdf requests them
+        from the proxy instead of opening a tunnel, and the proxy fetches them
+        from their hosts over HTTPS. Only the rewritten URLs are upgraded; other
+        plain HTTP requests, even to the same hosts, are forwarded as they are.
+
+        Args:
+            content (bytes): The HTML document piped to wkhtmltopdf.
+            url (str): The URL its relative links resolve against.
+
+        Returns:
+            bytes: The rewritten document.
+        """
+        content, downgraded = downgrade_asset_urls(content, url)
+        for plain in downgraded:
+            key = request_key(plain)
+            self._upgraded[key] = None
+            self._upgraded.move_to_end(key)
+        while len(self._upgraded) > MAX_UPGRADED_URLS:
+            self._upgraded.popitem(last=False)
+        return content
+
+    async def close(self) -> None:
+        """
+        Stop listening and close the connections to sites.
+        """
+        if self._server:
+            self._server.close()
+            self._server = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                head = await read_head(reader)
+                if head is None:
+                    break
+                method, target, version, headers = head
+                if method == "CONNECT":
+                    await self._tunnel(target, reader, writer)
+                    return
+                keep_alive = wants_keep_alive(version, headers)
+                await self._forward(method, target, headers, reader, writer, keep_alive)
+                if not keep_alive:
+                    break
+        except ProxyError as e:
+            await self._send(writer, e.status, [], e.message.encode(), keep_alive=False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.debug("Proxy client disconnected")
+        except Exception:
+            logger.exception("Error handling proxied request")
+        finally:
+            writer.close()
+
+    async def _forward(
+        self,
+        method: str,
+        url: str,
+        headers: dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        keep_alive: bool,
+    ) -> None:
+        if not url.startswith("http://"):
+            raise ProxyError(HTTPStatus.BAD_REQUEST, "Expected an absolute http:// URL")
+        url = self._upstream_url(url)
+        if self.blocklist and self.blocklist.blocks(url):
+            self._record_blocked(url)
+            await self._send(writer, HTTPStatus.NO_CONTENT, [], b"", keep_alive, True)
+            return
+        if "transfer-encoding" in headers:
+            raise ProxyError(
+                HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported"
+            )
+        try:
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+        except ValueError:
+            raise ProxyError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        upstream = {
+            name: value
+            for name, value in headers.items()
+            if name not in DROPPED_REQUEST_HEADERS
+        }
+
+        try:
+            if (
+                method == "GET"
+                and "range" not in headers
+                and "authorization" not in headers
+            ):
+                status, response_headers, content = await self._get(url, upstream)
+            else:
+                response = await self._client.request(
+                    method, url, headers=upstream, content=body, follow_redirects=False
+                )
+                status, response_headers, content = self._passed_through(response)
+        except httpx.HTTPError as e:
+            logger.debug(f"Proxy could not fetch {url}: {e}")
+            self.stats.errors += 1
+            PROXY_REQUESTS.inc(labels=("error",))
+            status, response_headers, content = (
+                HTTPStatus.BAD_GATEWAY,
+                [],
+                str(e).encode(),
+            )
+
+        await self._send(
+            writer, status, response_headers, content, keep_alive, method == "HEAD"
+        )
+
+    def _upstream_url(self, url: str) -> str:
+        # URLs rewritten by route_https go back to HTTPS on the way upstream
+        if request_key(url) in self._upgraded:
+            return "https" + url[len("http") :]
+        return url
+
+    async def _get(
+        self, url: str, headers: dict[str, str]
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        entry = self._lookup(url)
+        if entry and entry.is_fresh():
+            content = self._read(entry)
+            if content is not None:
+                return self._from_cache(entry, content, "hit")
+
+        # Conditional headers from WebKit are replaced by the cache's own
+        headers = {
+            name: value
+            for name, value in headers.items()
+            if name not in ("if-none-match", "if-modified-since")
+        }
+        if entry:
+            headers.update(entry.conditional_headers())
+        response = await self._client.get(url, headers=headers, follow_redirects=False)
+
+        if entry and response.status_code == HTTPStatus.NOT_MODIFIED:
+            lifetime = freshness_lifetime(response.headers)
+            if self.cache:
+                self.cache.refresh(entry, response.headers, lifetime or None)
+            else:
+                entry.stored_at, entry.max_age = time.time(), lifetime or None
+            content = self._read(entry)
+            if content is not None:
+                return self._from_cache(entry, content, "revalidated")
+            response = await self._client.get(url, follow_redirects=False)
+
+        if is_cacheable("GET", response):
+            self._store(url, response)
+        return self._passed_through(response)
+
+    def _passed_through(
+        self, response: httpx.Response
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        self.stats.misses += 1
+        self.stats.fetched_bytes += len(response.content)
+        PROXY_REQUESTS.inc(labels=("miss",))
+        PROXY_BYTES.inc(len(response.content), labels=("upstream",))
+        dropped = DROPPED_RESPONSE_HEADERS
+        if response.request.method == "HEAD":
+            # There is no body, so the length describes the resource and is kept
+            dropped = dropped - {"content-length"}
+        headers = [
+            (name, value)
+            for name, value in response.headers.multi_items()
+            if name.lower() not in dropped
+        ]
+        return response.status_code, headers, response.content
+
+    def _from_cache(
+        self, entry: CacheEntry, content: bytes, result: str
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        if result == "hit":
+            self.stats.hits += 1
+        else:
+            self.stats.revalidated += 1
+        self.stats.cached_bytes += len(content)
+        PROXY_REQUESTS.inc(labels=(result,))
+        PROXY_BYTES.inc(len(content), labels=("cache",))
+        headers = [("Content-Type", entry.content_type)] if entry.content_type else []
+        return HTTPStatus.OK, headers + list(entry.headers.items()), content
+
+    def _lookup(self, url: str) -> CacheEntry | None:
+        if self.cache:
+            return self.cache.get(url)
+        return self._memory_entries.get(HttpCache.key_for(url))
+
+    def _store(self, url: str, response: httpx.Response) -> None:
+        lifetime = freshness_lifetime(response.headers)
+        replayed = {
+            name: response.headers[name]
+            for name in REPLAYED_HEADERS
+            if name in response.headers
+        }
+        if self.cache:
+            entry = self.cache.put(
+                url,
+                str(response.url),
+                response.headers,
+                response.content,
+                lifetime or None,
+                replayed,
+            )
+        else:
+            entry = CacheEntry(
+                key=HttpCache.key_for(url),
+                url=url,
+                final_url=str(response.url),
+                content_type=response.headers.get("Content-Type", ""),
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                size=len(response.content),
+                max_age=lifetime or None,
+                headers=replayed,
+            )
+            if entry.max_age is None and not entry.conditional_headers():
+                return
+            self._memory_entries[entry.key] = entry
+        if entry:
+            self._remember(entry.key, response.content)
+
+    def _read(self, entry: CacheEntry) -> bytes | None:
+        content = self._memory.get(entry.key)
+        if content is not None:
+            self._memory.move_to_end(entry.key)
+            return content
+        if not self.cache:
+            return None
+        try:
+            content = self.cache.read_body(entry)
+        except OSError:
+            return None
+        self._remember(entry.key, content)
+        return content
+
+    def _remember(self, key: str, content: bytes) -> None:
+        if len(content) > MAX_MEMORY_ENTRY_BYTES:
+            return
+        self._memory_used += len(content) - len(self._memory.pop(key, b""))
+        self._memory[key] = content
+        while self._memory_used > self.memory_bytes:
+            evicted, evicted_content = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted_content)
+            if not self.cache:
+                self._memory_entries.pop(evicted, None)
+
+    async def _tunnel(
+        self, target: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        host, _, port = target.rpartition(":")
+        if self.blocklist and self.blocklist.blocks_host(host.strip("[]")):
+            self._record_blocked(target)
+            raise ProxyError(HTTPStatus.FORBIDDEN, f"{host} is blocked")
+        try:
+            upstream_reader, upstream_writer = await asyncio.wait_for(
+                asyncio.open_connection(host.strip("[]"), int(port)), CONNECT_TIMEOUT
+            )
+        except (OSError, ValueError, asyncio.TimeoutError) as e:
+            self.stats.errors += 1
+            PROXY_REQUESTS.inc(labels=("error",))
+            raise ProxyError(
+                HTTPStatus.BAD_GATEWAY, f"Could not connect to {target}: {e}"
+            )
+
+        self.stats.tunnels += 1
+        PROXY_REQUESTS.inc(labels=("tunnel",))
+        writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+        await writer.drain()
+        await asyncio.gather(
+            pipe(reader, upstream_writer), pipe(upstream_reader, writer)
+        )
+
+    def _record_blocked(self, target: str) -> None:
+        logger.debug(f"Proxy blocked {target}")
+        self.stats.blocked += 1
+        PROXY_REQUESTS.inc(labels=("blocked",))
+        BLOCKED_REQUESTS.inc(labels=("proxy",))
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        headers: list[tuple[str, str]],
+        content: bytes,
+        keep_alive: bool,
+        head_only: bool = False,
+    ) -> None:
+        try:
+            phrase = HTTPStatus(status).phrase
+        except ValueError:
+            phrase = ""
+        lines = [f"HTTP/1.1 {int(status)} {phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        if not head_only:
+            lines.append(f"Content-Length: {len(content)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if not head_only:
+            writer.write(content)
+        await writer.drain()
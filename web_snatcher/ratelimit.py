@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    A token bucket allowing `rate` acquisitions per second, with bursts of up to
+    `capacity`.
+
+    Callers that find the bucket empty reserve a future token and sleep until
+    it is due, so waiters are served in arrival order without a lock.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (int): The maximum number of tokens the bucket can hold.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        """
+        Take a token, waiting until one is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+def domain_of(url: str) -> str:
+    """
+    Get the key a URL is rate limited under.
+
+    Args:
+        url (str): The URL.
+
+    Returns:
+        str: The lowercased netloc of the URL.
+    """
+    return urlparse(url).netloc.lower()
+
+
+class DomainPermit:
+    """
+    Leave to send one request to a domain: its token has been taken, and its
+    in-flight slot is held until the permit is released.
+    """
+
+    def __init__(self, semaphore: asyncio.Semaphore | None = None):
+        """
+        Args:
+            semaphore (asyncio.Semaphore | None): The domain's in-flight semaphore,
+                already acquired, or None if in-flight requests are not capped
+                (default: None).
+        """
+        self.held = True
+        self._semaphore = semaphore
+
+    def release(self) -> None:
+        """
+        Give the in-flight slot back. Releasing a permit again does nothing.
+        """
+        if self.held:
+            self.held = False
+            if self._semaphore:
+                self._semaphore.release()
+
+
+class DomainLimiter:
+    """
+    Per-domain rate limiting and in-flight caps.
+
+    Each domain gets its own token bucket and semaphore, so a throttled domain
+    only holds up its own jobs while other domains keep flowing.
+    """
+
+    def __init__(
+        self,
+        rate: float | None = None,
+        burst: int | None = None,
+        max_in_flight: int | None = None,
+    ):
+        """
+        Args:
+            rate (float | None): Requests per second allowed to each domain, or None
+                for no rate limit (default: None).
+            burst (int | None): How many requests a domain may receive at once after
+                being idle (default: the rate rounded up, at least 1).
+            max_in_flight (int | None): The maximum concurrent requests to each domain,
+                or None for no cap (default: None).
+        """
+        self.rate = rate
+        self.burst = burst or max(1, math.ceil(rate or 1))
+        self.max_in_flight = max_in_flight
+        self._buckets: dict[str, TokenBucket] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rate or self.max_in_flight)
+
+    async def acquire(self, url: str) -> DomainPermit:
+        """
+        Wait until a request may be sent to the URL's domain.
+
+        Waits for a free in-flight slot first and then for a token, so the rate
+        applies to when requests actually start.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Returns:
+            DomainPermit: The permit, to be released once the request is done.
+        """
+        if not self.enabled:
+            return DomainPermit()
+
+        domain = domain_of(url)
+        semaphore = None
+        if self.max_in_flight:
+            semaphore = self._semaphores.get(domain)
+            if semaphore is None:
+                semaphore = self._semaphores[domain] = asyncio.Semaphore(
+                    self.max_in_flight
+                )
+            await semaphore.acquire()
+        permit = DomainPermit(semaphore)
+        try:
+            if self.rate:
+                bucket = self._buckets.get(domain)
+                if bucket is None:
+                    bucket = self._buckets[domain] = TokenBucket(self.rate, self.burst)
+                await bucket.acquire()
+        except BaseException:
+            permit.release()
+            raise
+        return permit
+
+    @asynccontextmanager
+    async def limit(
+        self, url: str, permit: DomainPermit | None = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot for a request to the URL's domain for the duration of the block.
+
+        Args:
+            url (str): The URL about to be requested.
+            permit (DomainPermit | None): A permit acquired ahead of time for this
+                request. It is used if still held, and released with the block
+                (default: None, to acquire one now).
+        """
+        if permit is None or not permit.held:
+            permit = await self.acquire(url)
+        try:
+            yield
+        finally:
+            permit.release()
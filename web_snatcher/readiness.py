@@ -0,0 +1,168 @@
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+# The value window.status is set to once a page is ready to print
+READY_STATUS = "web-snatcher-ready"
+
+# Polls until the document and all its images have loaded, or the cap passes.
+# Kept on one line so it can be passed through --read-args-from-stdin.
+READINESS_SCRIPT = (
+    "(function(){var deadline=Date.now()+%(cap)d;"
+    "function loaded(){if(document.readyState!=='complete')return false;"
+    "var images=document.images;for(var i=0;i<images.length;i++)"
+    "{if(!images[i].complete)return false;}return true;}"
+    "(function poll(){if(loaded()||Date.now()>=deadline)"
+    "{window.status='%(status)s';}else{setTimeout(poll,50);}})();})();"
+)
+
+# Delay after the ready signal; wkhtmltopdf skips the window status check at 0
+SETTLE_DELAY_MS = 10
+
+# Renders with this option never run the page's scripts
+DISABLE_JAVASCRIPT = "--disable-javascript"
+
+MODES = ("adaptive", "fixed", "static")
+
+
+@dataclass(frozen=True)
+class Readiness:
+    """
+    How long wkhtmltopdf waits before printing a page.
+
+    Attributes:
+        mode (str): "adaptive" to print as soon as the page signals it is ready,
+            "fixed" to always wait the full delay, or "static" to disable
+            JavaScript and print as soon as the page has loaded.
+        delay_ms (int): The fixed delay, or the cap on the adaptive wait, in
+            milliseconds. Static pages do not wait.
+    """
+
+    mode: str = "adaptive"
+    delay_ms: int = 1000
+
+    def options(self) -> list[str]:
+        """
+        Build the wkhtmltopdf options implementing this readiness mode.
+
+        Returns:
+            list[str]: The options to append to the base wkhtmltopdf options.
+        """
+        if self.mode == "static":
+            return [DISABLE_JAVASCRIPT]
+        if self.mode == "fixed":
+            return ["--javascript-delay", str(self.delay_ms)]
+        script = READINESS_SCRIPT % {"cap": self.delay_ms, "status": READY_STATUS}
+        return [
+            "--run-script",
+            script,
+            "--window-status",
+            READY_STATUS,
+            "--javascript-delay",
+            str(SETTLE_DELAY_MS),
+        ]
+
+
+def parse_readiness(spec: str) -> Readiness:
+    """
+    Parse a readiness spec of the form MODE or MODE:MILLISECONDS.
+
+    Args:
+        spec (str): The spec, e.g. "adaptive", "fixed:1500", "adaptive:3000" or
+            "static".
+
+    Returns:
+        Readiness: The parsed readiness mode.
+
+    Raises:
+        ValueError: If the mode is unknown or the delay is not a non-negative integer.
+    """
+    mode, _, delay = spec.strip().partition(":")
+    mode = mode.lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown readiness mode '{mode}', expected one of {MODES}")
+    if not delay:
+        return Readiness(mode)
+    if not delay.isdigit():
+        raise ValueError(f"Invalid delay '{delay}', expected milliseconds")
+    return Readiness(mode, int(delay))
+
+
+def domain_matches(host: str, domain: str) -> bool:
+    """
+    Check whether a host is a domain or one of its subdomains.
+
+    Args:
+        host (str): The host to check, e.g. "www.the42.ie".
+        domain (str): The domain to match against, e.g. "the42.ie".
+
+    Returns:
+        bool: True if the host is the domain or a subdomain of it.
+    """
+    return host == domain or host.endswith("." + domain)
+
+
+@dataclass
+class ReadinessPolicy:
+    """
+    The readiness mode to use for each page, with per-domain overrides.
+
+    Attributes:
+        default (Readiness | None): The mode used when no override matches, or
+            None if none was chosen, to use the render profile's mode or else the
+            adaptive one.
+        overrides (dict[str, Readiness]): Modes keyed by domain. A domain also
+            matches its subdomains, and the most specific match wins.
+    """
+
+    default: Readiness | None = None
+    overrides: dict[str, Readiness] = field(default_factory=dict)
+
+    def for_url(self, url: str) -> Readiness:
+        """
+        Get the readiness mode for a URL.
+
+        Args:
+            url (str): The URL of the page being converted.
+
+        Returns:
+            Readiness: The matching override, or the default.
+        """
+        return self.override_for(url) or self.default or Readiness()
+
+    def override_for(self, url: str) -> Readiness | None:
+        """
+        Get the per-domain override for a URL, if there is one.
+
+        Args:
+            url (str): The URL of the page being converted.
+
+        Returns:
+            Readiness | None: The most specific matching override, or None.
+        """
+        host = (urlparse(url).hostname or "").lower()
+        matches = [domain for domain in self.overrides if domain_matches(host, domain)]
+        if not matches:
+            return None
+        return self.overrides[max(matches, key=len)]
+
+
+def parse_domain_overrides(specs: list[str]) -> dict[str, Readiness]:
+    """
+    Parse per-domain readiness overrides of the form DOMAIN=MODE[:MILLISECONDS].
+
+    Args:
+        specs (list[str]): The overrides, e.g. ["the42.ie=adaptive:500"].
+
+    Returns:
+        dict[str, Readiness]: The readiness modes keyed by lowercased domain.
+
+    Raises:
+        ValueError: If an override is malformed.
+    """
+    overrides = {}
+    for spec in specs:
+        domain, sep, readiness = spec.partition("=")
+        if not sep or not domain.strip():
+            raise ValueError(f"Invalid override '{spec}', expected DOMAIN=MODE[:MS]")
+        overrides[domain.strip().lower()] = parse_readiness(readiness)
+    return overrides
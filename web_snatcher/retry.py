@@ -0,0 +1,214 @@
+import logging
+import random
+import re
+import subprocess
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from web_snatcher.engine import RenderTimeoutError
+from web_snatcher.ratelimit import domain_of
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth trying again: rate limiting and server-side failures
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Qt network errors wkhtmltopdf reports for failures that may not recur.
+# Errors such as ContentNotFoundError or ProtocolUnknownError are left out.
+TRANSIENT_RENDER_ERRORS = re.compile(
+    r"ConnectionRefused|RemoteHostClosed|HostNotFound|Timeout|OperationCanceled"
+    r"|TemporaryNetworkFailure|NetworkSessionFailed|UnknownNetwork"
+    r"|ProxyConnection|ProxyTimeout|InternalServerError|ServiceUnavailable"
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of contacting a domain whose circuit breaker is open.
+    """
+
+    def __init__(self, domain: str, retry_after: float):
+        self.domain = domain
+        self.retry_after = retry_after
+        super().__init__(
+            f"{domain} is paused after repeated failures, for another "
+            f"{retry_after:.0f}s"
+        )
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Decide whether a failed conversion could succeed if it were tried again.
+
+    Network errors, timeouts and server errors are transient. Client errors
+    such as a 404, and wkhtmltopdf failures on the document itself, would
+    fail the same way every time.
+
+    Args:
+        error (BaseException): The exception raised while converting a page.
+
+    Returns:
+        bool: True if the conversion should be retried.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUSES
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, RenderTimeoutError):
+        return True
+    if isinstance(error, subprocess.CalledProcessError):
+        return bool(TRANSIENT_RENDER_ERRORS.search(str(error.output or "")))
+    return False
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Read the delay a server asked for in a Retry-After header, if it sent one in
+    seconds.
+
+    Args:
+        error (BaseException): The exception raised while converting a page.
+
+    Returns:
+        float | None: The requested delay in seconds, or None.
+    """
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    How often and how patiently transient failures are retried.
+
+    Attributes:
+        attempts (int): The maximum number of attempts, including the first.
+        base_delay (float): The backoff before the first retry, in seconds.
+        max_delay (float): The cap on any single backoff, in seconds.
+    """
+
+    attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, error: BaseException | None = None) -> float:
+        """
+        Get how long to wait before the next attempt.
+
+        Uses exponential backoff with full jitter, so retries from many jobs that
+        failed together do not all hit the site again at the same moment. A
+        Retry-After header from the server is honoured, up to `max_delay`.
+
+        Args:
+            attempt (int): The number of attempts made so far, starting at 1.
+            error (BaseException | None): The error that ended the last attempt
+                (default: None).
+
+        Returns:
+            float: The delay in seconds.
+        """
+        delay = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        requested = retry_after(error) if error else None
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+
+@dataclass
+class Circuit:
+    """
+    The failure record of a single domain.
+
+    Attributes:
+        failures (int): Consecutive transient failures.
+        opened_at (float | None): When the circuit last opened or admitted a probe,
+            or None while it is closed.
+    """
+
+    failures: int = 0
+    opened_at: float | None = None
+
+
+class CircuitBreaker:
+    """
+    Stops sending jobs to a domain after repeated transient failures.
+
+    Once `threshold` consecutive attempts against a domain fail with transient
+    errors, its circuit opens and further jobs fail immediately instead of
+    tying up workers. After `cooldown` seconds a single job is let through as
+    a probe: if it succeeds the circuit closes, and if it fails it stays open
+    for another cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        """
+        Args:
+            threshold (int): Consecutive failures that open a domain's circuit, or
+                0 to never open it (default: 5).
+            cooldown (float): Seconds to wait before probing an open circuit
+                (default: 30.0).
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._circuits: dict[str, Circuit] = {}
+
+    def check(self, url: str) -> None:
+        """
+        Make sure a request to the URL's domain may go ahead.
+
+        Args:
+            url (str): The URL about to be requested.
+
+        Raises:
+            CircuitOpenError: If the domain's circuit is open and it is not yet time to
+                probe it.
+        """
+        domain = domain_of(url)
+        circuit = self._circuits.get(domain)
+        if circuit is None or circuit.opened_at is None:
+            return
+        now = time.monotonic()
+        remaining = circuit.opened_at + self.cooldown - now
+        if remaining > 0:
+            raise CircuitOpenError(domain, remaining)
+        # Let this request through as the probe, and hold everything else
+        # back for another cooldown in case it hangs or is cancelled
+        logger.info(f"Probing {domain}")
+        circuit.opened_at = now
+
+    def record_success(self, url: str) -> None:
+        """
+        Record that a request to the URL's domain worked, closing its circuit.
+
+        Args:
+            url (str): The URL that was requested.
+        """
+        circuit = self._circuits.pop(domain_of(url), None)
+        if circuit and circuit.opened_at is not None:
+            logger.info(f"{domain_of(url)} has recovered")
+
+    def record_failure(self, url: str) -> None:
+        """
+        Record a transient failure against the URL's domain.
+
+        Args:
+            url (str): The URL that was requested.
+        """
+        if not self.threshold:
+            return
+        domain = domain_of(url)
+        circuit = self._circuits.setdefault(domain, Circuit())
+        circuit.failures += 1
+        if circuit.opened_at is not None or circuit.failures >= self.threshold:
+            if circuit.opened_at is None:
+                logger.warning(
+                    f"{domain} failed {circuit.failures} times in a row, pausing it "
+                    f"for {self.cooldown:.0f}s"
+                )
+            circuit.opened_at = time.monotonic()
@@ -0,0 +1,178 @@
+import hashlib
+import logging
+import math
+import sqlite3
+import time
+
+from web_snatcher.urls import page_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_urls (
+    url TEXT PRIMARY KEY,
+    output TEXT NOT NULL,
+    seen REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS seen_bloom (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    capacity INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    bits BLOB NOT NULL
+);
+"""
+
+DEFAULT_CAPACITY = 1_000_000
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter over strings.
+
+    Membership tests never give false negatives, and give false positives at
+    roughly `error_rate` while no more than `capacity` items have been added.
+    """
+
+    def __init__(
+        self, capacity: int, error_rate: float = 0.01, bits: bytes | None = None
+    ):
+        """
+        Args:
+            capacity (int): The number of items the filter is sized for.
+            error_rate (float): The false positive rate at capacity (default: 0.01).
+            bits (bytes | None): The bit array of a filter saved earlier with the same
+                capacity and error rate (default: an empty filter).
+        """
+        self.capacity = capacity
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits else bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> list[int]:
+        # Double hashing: two 64-bit halves of one digest give every position
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class SeenIndex:
+    """
+    A persistent record of every page archived, keyed by canonical URL.
+
+    Lookups go through an in-memory Bloom filter first, so the common case of
+    a page that has never been seen is answered without touching the disk,
+    however many millions of entries the index holds. The filter is saved
+    alongside the index on close, and rebuilt from it if the two disagree.
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        """
+        Args:
+            path (str): The SQLite database file. Created if missing, and it may be
+                shared with a job store.
+            capacity (int): The number of entries the Bloom filter is first sized
+                for. It is resized as the index grows (default: 1,000,000).
+        """
+        self.path = path
+        self.skipped = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.count = self._conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+        self.bloom = self._load_bloom(capacity)
+
+    def _load_bloom(self, capacity: int) -> BloomFilter:
+        row = self._conn.execute(
+            "SELECT capacity, count, bits FROM seen_bloom WHERE id = 0"
+        ).fetchone()
+        if row and row[1] == self.count and self.count <= row[0]:
+            return BloomFilter(row[0], bits=row[2])
+        return self._rebuild(max(capacity, self.count * 2))
+
+    def _rebuild(self, capacity: int) -> BloomFilter:
+        bloom = BloomFilter(capacity)
+        if not self.count:
+            return bloom
+        logger.info(f"Building the seen-URL filter for {self.count} entries")
+        for (url,) in self._conn.execute("SELECT url FROM seen_urls"):
+            bloom.add(url)
+        return bloom
+
+    def get(self, url: str) -> str | None:
+        """
+        Look up where a page was archived.
+
+        Args:
+            url (str): The page's URL, in any of its spellings.
+
+        Returns:
+            str | None: The path of the PDF the page was saved to, or None if it
+                has not been archived.
+        """
+        key = page_key(url)
+        if key not in self.bloom:
+            return None
+        row = self._conn.execute(
+            "SELECT output FROM seen_urls WHERE url = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) is not None
+
+    def add(self, url: str, output: str) -> None:
+        """
+        Record that a page has been archived.
+
+        Args:
+            url (str): The page's URL, in any of its spellings.
+            output (str): The path of the PDF it was saved to.
+        """
+        key = page_key(url)
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO seen_urls (url, output, seen) VALUES (?, ?, ?)",
+                (key, output, time.time()),
+            )
+            if not cursor.rowcount:
+                self._conn.execute(
+                    "UPDATE seen_urls SET output = ?, seen = ? WHERE url = ?",
+                    (output, time.time(), key),
+                )
+                return
+        self.count += 1
+        self.bloom.add(key)
+        if self.count > self.bloom.capacity:
+            self.bloom = self._rebuild(self.bloom.capacity * 2)
+
+    def close(self) -> None:
+        """
+        Save the Bloom filter and close the database.
+        """
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO seen_bloom (id, capacity, count, bits) "
+                "VALUES (0, ?, ?, ?)",
+                (self.bloom.capacity, self.count, bytes(self.bloom.bits)),
+            )
+        self._conn.close()
+
+    def __enter__(self) -> "SeenIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,524 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from web_snatcher.metrics import (
+    CONTENT_TYPE,
+    JOBS_FINISHED,
+    JOBS_QUEUED,
+    JOBS_STARTED,
+    REGISTRY,
+)
+from web_snatcher.profiles import RenderProfile
+from web_snatcher.readiness import Readiness, parse_readiness
+from web_snatcher.retry import CircuitOpenError
+from web_snatcher.snatcher import Snatcher, describe_error, failure_reason
+from web_snatcher.tracing import active_tracer, new_track, span
+from web_snatcher.urls import validate_url
+
+logger = logging.getLogger(__name__)
+
+# Limits on what a client may send
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+# Size of the chunks a PDF is streamed back in
+CHUNK_SIZE = 64 * 1024
+
+# How long the results of asynchronous jobs are kept, in seconds
+DEFAULT_JOB_TTL = 3600.0
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while the queue is at capacity.
+    """
+
+
+class HttpError(Exception):
+    """
+    Raised by request handlers to send an error response.
+    """
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Job:
+    """
+    A conversion requested through the service.
+
+    Attributes:
+        id (str): The job id returned to the client.
+        url (str): The URL to convert.
+        output (str): Where the PDF is written.
+        readiness (Readiness | None): A readiness override for this job.
+        profile (RenderProfile | None): A render profile override for this job.
+        state (str): One of "queued", "running", "done" or "failed".
+        error (str | None): The failure description if the job failed.
+        created (float): When the job was submitted.
+        finished (float | None): When the job completed, successfully or not.
+    """
+
+    id: str
+    url: str
+    output: str
+    readiness: Readiness | None = None
+    profile: RenderProfile | None = None
+    state: str = "queued"
+    error: str | None = None
+    created: float = field(default_factory=time.time)
+    finished: float | None = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "url": self.url,
+            "state": self.state,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+@dataclass
+class Request:
+    """
+    A parsed HTTP request.
+
+    Attributes:
+        method (str): The request method.
+        path (str): The request path, without the query string.
+        query (dict[str, list[str]]): The parsed query string.
+        headers (dict[str, str]): The request headers, with lowercased names.
+        body (bytes): The request body.
+    """
+
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes
+
+    def json(self) -> dict:
+        """
+        Decode a JSON object body.
+
+        Returns:
+            dict: The decoded body, or an empty dict if there is no body.
+
+        Raises:
+            HttpError: If the body is not a JSON object.
+        """
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return payload
+
+
+async def read_request(reader: asyncio.StreamReader) -> Request | None:
+    """
+    Read and parse one HTTP/1.1 request.
+
+    Args:
+        reader (asyncio.StreamReader): The connection's reader.
+
+    Returns:
+        Request | None: The request, or None if the client closed the connection.
+
+    Raises:
+        HttpError: If the request is malformed or too large.
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers too large")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed header")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", "0"))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+    if length < 0 or length > MAX_BODY_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large")
+    body = await reader.readexactly(length) if length else b""
+
+    parts = urlsplit(target)
+    return Request(method.upper(), parts.path, parse_qs(parts.query), headers, body)
+
+
+async def send_response(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    body: bytes = b"",
+    content_type: str = "application/json",
+    headers: dict[str, str] | None = None,
+) -> None:
+    """
+    Write a complete HTTP response.
+
+    Args:
+        writer (asyncio.StreamWriter): The connection's writer.
+        status (HTTPStatus): The response status.
+        body (bytes): The response body (default: empty).
+        content_type (str): The Content-Type of the body (default: application/json).
+        headers (dict[str, str] | None): Extra response headers (default: None).
+    """
+    head = [
+        f"HTTP/1.1 {status.value} {status.phrase}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        "Connection: close",
+    ]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def send_json(
+    writer: asyncio.StreamWriter,
+    status: HTTPStatus,
+    payload: dict,
+    headers: dict[str, str] | None = None,
+) -> None:
+    """
+    Write a JSON response.
+
+    Args:
+        writer (asyncio.StreamWriter): The connection's writer.
+        status (HTTPStatus): The response status.
+        payload (dict): The object to serialise.
+        headers (dict[str, str] | None): Extra response headers (default: None).
+    """
+    await send_response(writer, status, json.dumps(payload).encode(), headers=headers)
+
+
+async def send_file(writer: asyncio.StreamWriter, path: str, filename: str) -> None:
+    """
+    Stream a PDF back to the client in chunks, without loading it into memory.
+
+    Args:
+        writer (asyncio.StreamWriter): The connection's writer.
+        path (str): The path of the PDF.
+        filename (str): The filename suggested to the client.
+    """
+    size = os.path.getsize(path)
+    head = [
+        f"HTTP/1.1 {HTTPStatus.OK.value} {HTTPStatus.OK.phrase}",
+        "Content-Type: application/pdf",
+        f"Content-Length: {size}",
+        f'Content-Disposition: attachment; filename="{filename}"',
+        "Connection: close",
+    ]
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            writer.write(chunk)
+            await writer.drain()
+
+
+class RenderService:
+    """
+    A long-running HTTP service that converts pages on a warm worker pool.
+
+    Jobs go through a bounded queue. When it is full new requests get a 429,
+    so a burst can't grow memory use without limit.
+
+    Endpoints:
+        POST /convert: Convert {"url": ..., "readiness": ..., "profile": ...,
+            "wait": true}.
+            With wait (the default) the PDF is streamed back once rendered,
+            otherwise a 202 with the job id is returned immediately.
+        GET /jobs/{id}: The state of a job.
+        GET /jobs/{id}/pdf: The PDF of a finished job.
+        GET /healthz: Queue and worker status, and the asset proxy's cache statistics.
+        GET /metrics: Prometheus metrics.
+    """
+
+    def __init__(
+        self,
+        snatcher: Snatcher,
+        output_dir: str,
+        workers: int,
+        queue_size: int,
+        job_ttl: float = DEFAULT_JOB_TTL,
+    ):
+        """
+        Args:
+            snatcher (Snatcher): The resources shared by every conversion.
+            output_dir (str): The directory PDFs are written to while they are kept.
+            workers (int): The number of conversions to run at once.
+            queue_size (int): The number of jobs that may wait for a worker.
+            job_ttl (float): How long finished jobs are kept, in seconds
+                (default: 1 hour).
+        """
+        self.snatcher = snatcher
+        self.output_dir = output_dir
+        self.workers = workers
+        self.job_ttl = job_ttl
+        self.jobs: dict[str, Job] = {}
+        self.busy = 0
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+
+    def submit(
+        self,
+        url: str,
+        readiness: Readiness | None = None,
+        profile: RenderProfile | None = None,
+    ) -> Job:
+        """
+        Queue a conversion.
+
+        Args:
+            url (str): The URL to convert.
+            readiness (Readiness | None): A readiness override for this job
+                (default: None).
+            profile (RenderProfile | None): A render profile override for this job
+                (default: None).
+
+        Returns:
+            Job: The queued job.
+
+        Raises:
+            QueueFullError: If the queue is at capacity.
+        """
+        job_id = uuid.uuid4().hex
+        job = Job(
+            job_id,
+            url,
+            os.path.join(self.output_dir, f"{job_id}.pdf"),
+            readiness,
+            profile,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Queue is full ({self._queue.maxsize} jobs waiting)")
+        self.jobs[job_id] = job
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.state = "running"
+            self.busy += 1
+            JOBS_STARTED.inc()
+            tracer = active_tracer()
+            if tracer:
+                new_track(job.url)
+                now = tracer.now()
+                tracer.record("queued", now - (time.time() - job.created), now)
+            try:
+                with span("job", url=job.url):
+                    await self.snatcher.snatch(
+                        job.url, job.output, job.readiness, job.profile
+                    )
+                job.state = "done"
+                JOBS_FINISHED.inc(labels=("succeeded", ""))
+            except (httpx.HTTPError, subprocess.SubprocessError, CircuitOpenError) as e:
+                job.state, job.error = "failed", describe_error(e)
+                JOBS_FINISHED.inc(labels=("failed", failure_reason(e)))
+            except Exception as e:
+                logger.exception(f"Unexpected error converting {job.url}")
+                job.state, job.error = "failed", str(e)
+                JOBS_FINISHED.inc(labels=("failed", "unexpected"))
+            finally:
+                self.busy -= 1
+                job.finished = time.time()
+                job.done.set()
+                self._queue.task_done()
+
+    async def _expire_jobs(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.job_ttl, 60))
+            cutoff = time.time() - self.job_ttl
+            for job in list(self.jobs.values()):
+                if job.finished and job.finished < cutoff:
+                    self._discard(job)
+
+    def _discard(self, job: Job) -> None:
+        self.jobs.pop(job.id, None)
+        try:
+            os.unlink(job.output)
+        except FileNotFoundError:
+            pass
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await self._route(request, writer)
+        except HttpError as e:
+            await send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logger.debug("Client disconnected")
+        except Exception:
+            logger.exception("Error handling request")
+            await send_json(
+                writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal error"}
+            )
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        parts = [part for part in request.path.split("/") if part]
+
+        if parts == ["convert"]:
+            if request.method != "POST":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST")
+            await self._convert(request, writer)
+        elif parts == ["healthz"]:
+            await send_json(
+                writer,
+                HTTPStatus.OK,
+                {
+                    "queued": self._queue.qsize(),
+                    "queue_size": self._queue.maxsize,
+                    "busy": self.busy,
+                    "workers": self.workers,
+                    "proxy": (
+                        self.snatcher.proxy.stats.to_dict()
+                        if self.snatcher.proxy
+                        else None
+                    ),
+                },
+            )
+        elif parts == ["metrics"]:
+            await send_response(
+                writer, HTTPStatus.OK, REGISTRY.render().encode(), CONTENT_TYPE
+            )
+        elif len(parts) in (2, 3) and parts[0] == "jobs":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                raise HttpError(HTTPStatus.NOT_FOUND, "Unknown job")
+            if len(parts) == 2:
+                await send_json(writer, HTTPStatus.OK, job.to_dict())
+            elif parts[2] == "pdf":
+                await self._send_result(job, writer)
+            else:
+                raise HttpError(HTTPStatus.NOT_FOUND, "Not found")
+        else:
+            raise HttpError(HTTPStatus.NOT_FOUND, "Not found")
+
+    async def _convert(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        payload = request.json()
+        url = payload.get("url") or request.query.get("url", [None])[0]
+        if not url or not isinstance(url, str):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Missing 'url'")
+        if not validate_url(url) or urlsplit(url).scheme not in ("http", "https"):
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid URL '{url}'")
+
+        readiness = None
+        if payload.get("readiness"):
+            try:
+                readiness = parse_readiness(str(payload["readiness"]))
+            except ValueError as e:
+                raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+
+        profile = None
+        if payload.get("profile"):
+            try:
+                profile = self.snatcher.profiles.get(str(payload["profile"]))
+            except ValueError as e:
+                raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+
+        try:
+            job = self.submit(url, readiness, profile)
+        except QueueFullError as e:
+            await send_json(
+                writer,
+                HTTPStatus.TOO_MANY_REQUESTS,
+                {"error": str(e)},
+                headers={"Retry-After": "1"},
+            )
+            return
+
+        if not payload.get("wait", True):
+            await send_json(
+                writer,
+                HTTPStatus.ACCEPTED,
+                job.to_dict(),
+                headers={"Location": f"/jobs/{job.id}"},
+            )
+            return
+
+        await job.done.wait()
+        try:
+            await self._send_result(job, writer)
+        finally:
+            # Nobody else knows this job's id, so it won't be fetched again
+            self._discard(job)
+
+    async def _send_result(self, job: Job, writer: asyncio.StreamWriter) -> None:
+        if job.state == "failed":
+            await send_json(writer, HTTPStatus.BAD_GATEWAY, job.to_dict())
+        elif job.state != "done":
+            await send_json(writer, HTTPStatus.CONFLICT, job.to_dict())
+        else:
+            await send_file(writer, job.output, f"{job.id}.pdf")
+
+    async def serve(self, host: str, port: int) -> None:
+        """
+        Start the workers and serve requests until cancelled.
+
+        Args:
+            host (str): The interface to listen on.
+            port (int): The port to listen on.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        JOBS_QUEUED.set_function(self._queue.qsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._expire_jobs()))
+        server = await asyncio.start_server(
+            self._handle, host, port, limit=MAX_HEADER_BYTES
+        )
+        logger.info(f"Listening on {host}:{port} with {self.workers} workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            await self.snatcher.aclose()
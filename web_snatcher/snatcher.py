@@ -0,0 +1,571 @@
+import asyncio
+import dataclasses
+import functools
+import logging
+import os
+import subprocess
+import uuid
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+
+from web_snatcher.blocklist import Blocklist, BlockReport, strip_blocked
+from web_snatcher.coalesce import SingleFlight
+from web_snatcher.engine import RenderTimeoutError, convert
+from web_snatcher.extract import extract_article, render_article
+from web_snatcher.fetch import fetch_page, find_canonical, inject_base
+from web_snatcher.http_cache import HttpCache
+from web_snatcher.metrics import BLOCKED_BYTES, BLOCKED_REQUESTS, EXTRACTIONS, PDF_BYTES
+from web_snatcher.pdf_cache import PdfCache, link_or_copy
+from web_snatcher.persistent import PersistentPool
+from web_snatcher.preprocess import preprocess
+from web_snatcher.profiles import ProfilePolicy, RenderProfile
+from web_snatcher.proxy import AssetProxy
+from web_snatcher.ratelimit import DomainLimiter, DomainPermit
+from web_snatcher.readiness import DISABLE_JAVASCRIPT, Readiness, ReadinessPolicy
+from web_snatcher.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    is_retryable,
+)
+from web_snatcher.seen import SeenIndex
+from web_snatcher.tracing import span
+from web_snatcher.urls import page_key
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def remove_file(path: str) -> None:
+    """
+    Delete a file if it exists.
+
+    Args:
+        path (str): The file to delete.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def flight_key(url: str, options: list[str]) -> tuple:
+    """
+    Build the key that concurrent renders of the same page and options share.
+
+    Args:
+        url (str): The page's URL.
+        options (list[str]): The wkhtmltopdf options it is rendered with.
+
+    Returns:
+        tuple: The key. A URL that can't be canonicalized is keyed as given.
+    """
+    return (page_key(url), tuple(options))
+
+
+def describe_error(error: Exception) -> str:
+    """
+    Describe a conversion failure in one line for reporting.
+
+    Args:
+        error (Exception): The exception raised while converting a page.
+
+    Returns:
+        str: A short description of the failure.
+    """
+    if isinstance(error, httpx.HTTPError):
+        return f"fetch error: {error}"
+    if isinstance(error, RenderTimeoutError):
+        return str(error)
+    if isinstance(error, subprocess.CalledProcessError):
+        return f"wkhtmltopdf error: {error.output}"
+    return str(error)
+
+
+def failure_reason(error: Exception) -> str:
+    """
+    Classify a conversion failure for metrics, with a small fixed set of values.
+
+    Args:
+        error (Exception): The exception raised while converting a page.
+
+    Returns:
+        str: The reason, such as "http_4xx", "network" or "render_timeout".
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"http_{error.response.status_code // 100}xx"
+    if isinstance(error, httpx.TimeoutException):
+        return "fetch_timeout"
+    if isinstance(error, httpx.HTTPError):
+        return "network"
+    if isinstance(error, RenderTimeoutError):
+        return "render_timeout"
+    if isinstance(error, subprocess.CalledProcessError):
+        return "render_error"
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    return "unexpected"
+
+
+@dataclasses.dataclass
+class PreparedPage:
+    """
+    A page that has been through the fetch stage and is waiting to be rendered.
+
+    Attributes:
+        url (str): The URL the page was requested as.
+        output (str): The path where the PDF will be saved.
+        options (list[str]): The wkhtmltopdf options to render it with.
+        final_url (str | None): The URL the page was fetched from after redirects,
+            or None if it was not pre-fetched.
+        html (bytes | None): The pre-fetched document, or None to let wkhtmltopdf
+            fetch the page itself.
+        canonical (str | None): The page's rel=canonical URL, if it has one.
+        cache_key (str | None): The page's PDF cache key, if the cache is enabled.
+        done (bool): Whether the PDF is already in place and there is nothing to render.
+    """
+
+    url: str
+    output: str
+    options: list[str]
+    final_url: str | None = None
+    html: bytes | None = None
+    canonical: str | None = None
+    cache_key: str | None = None
+    done: bool = False
+
+    @property
+    def source(self) -> str:
+        """
+        The URL wkhtmltopdf renders the page as.
+        """
+        return self.final_url or self.url
+
+
+class Snatcher:
+    """
+    The shared resources used to turn URLs into PDFs.
+
+    A single Snatcher is meant to be reused for every page in a run, so that
+    the HTTP client's connection pool and the caches are shared between jobs.
+    Concurrent requests for the same page and options share one render.
+    """
+
+    def __init__(
+        self,
+        render: Callable[..., Awaitable[None]] = convert,
+        client: httpx.AsyncClient | None = None,
+        http_cache: HttpCache | None = None,
+        pdf_cache: PdfCache | None = None,
+        readiness: ReadinessPolicy | None = None,
+        pool: PersistentPool | None = None,
+        limiter: DomainLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        seen: SeenIndex | None = None,
+        proxy: AssetProxy | None = None,
+        extract: bool = False,
+        blocklist: Blocklist | None = None,
+        profiles: ProfilePolicy | None = None,
+    ):
+        """
+        Args:
+            render (Callable[..., Awaitable[None]]): The conversion coroutine
+                (default: engine.convert).
+            client (httpx.AsyncClient | None): The shared HTTP client used to pre-fetch
+                pages, or None to let wkhtmltopdf fetch them itself.
+            http_cache (HttpCache | None): The on-disk response cache used by the
+                pre-fetch (default: None).
+            pdf_cache (PdfCache | None): The store of rendered PDFs, used to skip
+                rendering pre-fetched pages that have not changed (default: None).
+            readiness (ReadinessPolicy | None): How long wkhtmltopdf waits before
+                printing each page (default: adaptive, capped at one second).
+            pool (PersistentPool | None): A pool of long-lived wkhtmltopdf processes.
+                When given it replaces `render`, and it is shut down on close.
+            limiter (DomainLimiter | None): Per-domain rate limits, charged once per
+                page: to the pre-fetch, or to the wkhtmltopdf launch when it fetches
+                the page itself (default: no limits).
+            retry (RetryPolicy | None): How transient failures are retried
+                (default: three attempts with exponential backoff).
+            breaker (CircuitBreaker | None): Stops sending jobs to domains that keep
+                failing (default: opens after five consecutive failures).
+            seen (SeenIndex | None): The index of pages already archived. Pages found
+                in it are copied from their earlier PDF instead of being rendered
+                again, and it is closed with the Snatcher (default: None).
+            proxy (AssetProxy | None): A caching proxy wkhtmltopdf fetches page
+                assets through. It is started with the first job and stopped on
+                close (default: None).
+            extract (bool): Render the article extracted from each pre-fetched page
+                with a minimal print template instead of the full page. Pages where
+                no article is found are rendered in full (default: False).
+            blocklist (Blocklist | None): Hosts and URL patterns whose scripts,
+                iframes, images and stylesheets are removed from pre-fetched pages
+                before rendering (default: None).
+            profiles (ProfilePolicy | None): The render profile used for each page
+                (default: the built-in "default" profile for every page).
+        """
+        self.pool = pool
+        self.limiter = limiter or DomainLimiter()
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = 0
+        self.seen = seen
+        self.proxy = proxy
+        self.extract = extract
+        self.blocklist = blocklist
+        self.blocked = BlockReport()
+        self.blocked_pages = 0
+        self.render = pool.convert if pool else render
+        self.client = client
+        self.http_cache = http_cache
+        self.pdf_cache = pdf_cache
+        self.readiness = readiness or ReadinessPolicy()
+        self.profiles = profiles or ProfilePolicy()
+        self._options: dict[tuple[str, Readiness | None], list[str]] = {}
+        self.flights = SingleFlight()
+
+    def options_for(
+        self,
+        url: str,
+        readiness: Readiness | None = None,
+        profile: RenderProfile | None = None,
+    ) -> list[str]:
+        """
+        Get the wkhtmltopdf options for a page, building each variant only once.
+
+        Args:
+            url (str): The URL of the page being converted.
+            readiness (Readiness | None): Overrides the readiness mode (default: None).
+            profile (RenderProfile | None): Overrides the page's render profile
+                (default: None).
+
+        Returns:
+            list[str]: The wkhtmltopdf options.
+        """
+        profile = profile or self.profiles.for_url(url)
+        if not profile.javascript:
+            # Pages rendered without scripts can't wait on them, whatever was asked
+            readiness = Readiness("static")
+        else:
+            # An explicit readiness mode, per job, per domain or for the whole run,
+            # beats the profile's
+            readiness = (
+                readiness or self.readiness.override_for(url) or self.readiness.default
+            )
+        key = (profile.name, readiness)
+        options = self._options.get(key)
+        if options is None:
+            readiness = readiness or profile.readiness_mode() or Readiness()
+            options = self._options[key] = [
+                *profile.wkhtmltopdf_options(),
+                *readiness.options(),
+            ]
+        return options
+
+    async def snatch(
+        self,
+        url: str,
+        output: str,
+        readiness: Readiness | None = None,
+        profile: RenderProfile | None = None,
+    ) -> None:
+        """
+        Convert a single page, pre-fetching it when the Snatcher has a client.
+
+        Pre-fetched documents are piped to wkhtmltopdf's stdin, so the page itself
+        is downloaded over a pooled keep-alive connection rather than by WebKit.
+        If the exact same document was already rendered with the same options,
+        the cached PDF is reused instead. If the same page is already being
+        converted with the same options, this call waits for that render and
+        receives the same result. URLs are compared in canonical form, so
+        tracking parameters and similar variations do not cause extra renders.
+
+        Args:
+            url (str): The URL of the webpage to convert.
+            output (str): The path where the PDF will be saved.
+            readiness (Readiness | None): Overrides the policy's readiness mode for
+                this page (default: None).
+            profile (RenderProfile | None): Overrides the render profile for this
+                page (default: None).
+
+        Transient failures, such as network errors, 5xx responses and timeouts,
+        are retried according to the retry policy.
+
+        Raises:
+            httpx.HTTPError: If fetching the page fails.
+            subprocess.CalledProcessError: If wkhtmltopdf execution fails.
+            CircuitOpenError: If the page's domain has been failing and is paused.
+        """
+        if self._reuse_archived(url, output):
+            return
+        if self.proxy:
+            await self.proxy.start()
+
+        options = self.options_for(url, readiness, profile)
+        key = flight_key(url, options)
+        work = functools.partial(self._render_shared, url, output, options)
+
+        async with self.flights.join(key, work, cleanup=remove_file) as path:
+            with span("write"):
+                link_or_copy(path, output)
+
+    async def prepare(
+        self,
+        url: str,
+        output: str,
+        readiness: Readiness | None = None,
+        profile: RenderProfile | None = None,
+        permit: DomainPermit | None = None,
+    ) -> PreparedPage:
+        """
+        Run the fetch stage of a conversion: everything before wkhtmltopdf starts.
+
+        The page is pre-fetched when the Snatcher has a client. If it was already
+        archived, or the same document was rendered before with the same options,
+        the PDF is put in place straight away and the page comes back done.
+        Transient failures are retried according to the retry policy.
+
+        Args:
+            url (str): The URL of the webpage to convert.
+            output (str): The path where the PDF will be saved.
+            readiness (Readiness | None): Overrides the policy's readiness mode for
+                this page (default: None).
+            profile (RenderProfile | None): Overrides the render profile for this
+                page (default: None).
+            permit (DomainPermit | None): A permit for the page's domain acquired
+                ahead of time, used by the pre-fetch. It is left held if the page
+                is not pre-fetched, for `render_prepared` (default: None).
+
+        Returns:
+            PreparedPage: The page, to be passed to `render_prepared` unless done.
+
+        Raises:
+            httpx.HTTPError: If fetching the page fails.
+            CircuitOpenError: If the page's domain has been failing and is paused.
+        """
+        options = self.options_for(url, readiness, profile)
+        if self._reuse_archived(url, output):
+            return PreparedPage(url, output, options, done=True)
+        page = await self._with_retries(
+            url, lambda: self._fetch(url, output, options, permit)
+        )
+        if page.done:
+            self._record_seen(page, output)
+        return page
+
+    async def render_prepared(
+        self, page: PreparedPage, permit: DomainPermit | None = None
+    ) -> None:
+        """
+        Run the render stage of a conversion started with `prepare`.
+
+        Transient failures are retried with the same pre-fetched document, and
+        concurrent renders of the same page and options are shared as in `snatch`.
+
+        Args:
+            page (PreparedPage): The page. Pages that are already done are left alone.
+            permit (DomainPermit | None): A permit for the page's domain acquired
+                ahead of time, used if wkhtmltopdf fetches the page itself
+                (default: None).
+
+        Raises:
+            subprocess.CalledProcessError: If wkhtmltopdf execution fails.
+            CircuitOpenError: If the page's domain has been failing and is paused.
+        """
+        if page.done:
+            return
+        if self.proxy:
+            await self.proxy.start()
+
+        key = flight_key(page.source, page.options)
+
+        async def work() -> str:
+            path = self._inflight_path(page.output)
+            rendering = dataclasses.replace(page, output=path)
+            try:
+                await self._with_retries(
+                    page.url, lambda: self._render_page(rendering, permit)
+                )
+            except BaseException:
+                remove_file(path)
+                raise
+            self._record_seen(page, page.output)
+            return path
+
+        async with self.flights.join(key, work, cleanup=remove_file) as path:
+            with span("write"):
+                link_or_copy(path, page.output)
+        page.done = True
+
+    async def _render_shared(self, url: str, output: str, options: list[str]) -> str:
+        # Render to a private file next to the first caller's output, so every
+        # caller sharing this render can link it into place before it is removed
+        path = self._inflight_path(output)
+        try:
+            page = await self._with_retries(
+                url, lambda: self._render(url, path, options)
+            )
+        except BaseException:
+            remove_file(path)
+            raise
+        # The PDF is linked into place at `output` as soon as this returns
+        self._record_seen(page, output)
+        return path
+
+    def _inflight_path(self, output: str) -> str:
+        return os.path.join(
+            os.path.dirname(os.path.abspath(output)),
+            f".inflight-{uuid.uuid4().hex}.pdf",
+        )
+
+    def _record_seen(self, page: PreparedPage, output: str) -> None:
+        if self.seen:
+            archived = os.path.abspath(output)
+            self.seen.add(page.url, archived)
+            if page.canonical:
+                self.seen.add(page.canonical, archived)
+
+    def _reuse_archived(self, url: str, output: str) -> bool:
+        archived = self.seen.get(url) if self.seen else None
+        if not archived or not os.path.exists(archived):
+            return False
+        logger.info(f"Already archived {url} as {archived}")
+        link_or_copy(archived, output)
+        self.seen.skipped += 1
+        return True
+
+    async def _with_retries(self, url: str, work: Callable[[], Awaitable[T]]) -> T:
+        attempt = 1
+        while True:
+            self.breaker.check(url)
+            try:
+                result = await work()
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure(url)
+                if attempt >= self.retry.attempts:
+                    raise
+                delay = self.retry.delay(attempt, e)
+                logger.warning(
+                    f"Attempt {attempt} for {url} failed ({describe_error(e)}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                self.retries += 1
+                attempt += 1
+                with span("retry backoff", attempt=attempt):
+                    await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success(url)
+                return result
+
+    def _render_options(self, options: list[str]) -> list[str]:
+        # The proxy's port changes from run to run, so it is left out of the
+        # options used to key the PDF cache and shared renders
+        return [*options, *self.proxy.options()] if self.proxy else options
+
+    async def _render(self, url: str, output: str, options: list[str]) -> PreparedPage:
+        page = await self._fetch(url, output, options)
+        if not page.done:
+            await self._render_page(page)
+        return page
+
+    async def _fetch(
+        self,
+        url: str,
+        output: str,
+        options: list[str],
+        permit: DomainPermit | None = None,
+    ) -> PreparedPage:
+        if self.client is None:
+            # wkhtmltopdf fetches the page itself
+            return PreparedPage(url, output, options)
+
+        async with self.limiter.limit(url, permit):
+            with span("fetch", url=url):
+                fetched = await fetch_page(self.client, url, self.http_cache)
+        canonical = find_canonical(fetched.content, fetched.url)
+        if canonical and self._reuse_archived(canonical, output):
+            return PreparedPage(url, output, options, canonical=canonical, done=True)
+        html = self._document(
+            fetched.content, fetched.url, DISABLE_JAVASCRIPT not in options
+        )
+
+        page = PreparedPage(url, output, options, fetched.url, html, canonical)
+        if self.pdf_cache:
+            with span("pdf cache lookup"):
+                page.cache_key = PdfCache.key_for(html, options)
+                page.done = self.pdf_cache.restore(page.cache_key, output)
+        return page
+
+    def _document(self, content: bytes, url: str, javascript: bool) -> bytes:
+        # The document piped to wkhtmltopdf: the extracted article when there is
+        # one, otherwise the page itself
+        with span("preprocess"):
+            content = preprocess(content, javascript)
+        if self.blocklist:
+            with span("block") as blocking:
+                content, report = strip_blocked(content, url, self.blocklist)
+                if blocking:
+                    blocking.args.update(requests=report.requests, bytes=report.bytes)
+            self._record_blocked(url, report)
+        article = None
+        if self.extract:
+            with span("extract"):
+                article = extract_article(content, url)
+            EXTRACTIONS.inc(labels=("extracted" if article else "fallback",))
+        content = render_article(article) if article else inject_base(content, url)
+        if self.proxy:
+            content = self.proxy.route_https(content, url)
+        return content
+
+    def _record_blocked(self, url: str, report: BlockReport) -> None:
+        if not report.requests:
+            return
+        logger.info(
+            f"Blocked {report.requests} requests ({report.bytes / 1024:.1f} KiB of "
+            f"markup) on {url}"
+        )
+        self.blocked.add(report)
+        self.blocked_pages += 1
+        BLOCKED_REQUESTS.inc(report.requests, labels=("document",))
+        BLOCKED_BYTES.inc(report.bytes)
+
+    async def _render_page(
+        self, page: PreparedPage, permit: DomainPermit | None = None
+    ) -> None:
+        source, options = page.source, self._render_options(page.options)
+        if page.html is None:
+            # wkhtmltopdf fetches the page itself, so its launch is the page's request
+            async with self.limiter.limit(source, permit):
+                with span("render", url=source):
+                    await self.render(source, page.output, options)
+        else:
+            with span("render", url=source, bytes=len(page.html)):
+                await self.render(source, page.output, options, page.html)
+        PDF_BYTES.observe(os.path.getsize(page.output))
+        if self.pdf_cache and page.cache_key:
+            with span("pdf cache store"):
+                self.pdf_cache.store(page.cache_key, page.output)
+
+    async def aclose(self) -> None:
+        """
+        Close the HTTP client, the persistent pool, the asset proxy and the seen-URL
+        index, if there are any.
+        """
+        if self.proxy:
+            await self.proxy.close()
+        if self.seen:
+            self.seen.close()
+        if self.pool:
+            await self.pool.close()
+        if self.client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "Snatcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
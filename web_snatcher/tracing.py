@@ -0,0 +1,214 @@
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# The trace track (a "thread" in the trace viewer) spans in this context belong to
+_track: ContextVar[int] = ContextVar("track", default=0)
+
+# Shared by every span while tracing is off, so disabled spans cost one check
+NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Collects timed spans and writes them in Chrome's trace-event format.
+
+    The output can be opened in Perfetto (https://ui.perfetto.dev) or
+    chrome://tracing. Each job gets its own track, so spans from concurrent
+    jobs are shown side by side instead of overlapping.
+    """
+
+    def __init__(self):
+        self.events: list[dict] = []
+        self.durations: dict[str, list[float]] = {}
+        self._pid = os.getpid()
+        self._tracks = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        """
+        Get the current time on the tracer's clock, in seconds.
+        """
+        return time.perf_counter()
+
+    def record(self, name: str, start: float, end: float, **args) -> None:
+        """
+        Add a finished span.
+
+        Args:
+            name (str): The name of the stage.
+            start (float): When it started, from `now()`.
+            end (float): When it ended, from `now()`.
+            **args: Details shown with the span in the trace viewer.
+        """
+        event = {
+            "name": name,
+            "cat": "web-snatcher",
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": self._pid,
+            "tid": _track.get(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            self.durations.setdefault(name, []).append(end - start)
+
+    def new_track(self, label: str) -> None:
+        """
+        Put the spans of the current task, and of tasks it starts, on a new track.
+
+        Args:
+            label (str): The track's name in the trace viewer, such as the job's URL.
+        """
+        track = next(self._tracks)
+        _track.set(track)
+        with self._lock:
+            self.events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": track,
+                    "args": {"name": label},
+                }
+            )
+
+    def write(self, path: str) -> None:
+        """
+        Write the trace to a JSON file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        logger.debug(f"Wrote {len(events)} trace events to {path}")
+
+    def summary(self) -> list[tuple[str, int, float, float, float]]:
+        """
+        Summarise the time spent in each stage.
+
+        Returns:
+            list[tuple[str, int, float, float, float]]: The stage name, span count,
+                and total, mean and maximum duration in seconds, in order of first use.
+        """
+        with self._lock:
+            durations = {name: list(values) for name, values in self.durations.items()}
+        return [
+            (name, len(values), sum(values), sum(values) / len(values), max(values))
+            for name, values in durations.items()
+        ]
+
+
+class Span:
+    """
+    Times the body of a `with` block as a span.
+    """
+
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "Span":
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.record(self.name, self.start, self.tracer.now(), **self.args)
+
+
+_tracer: Tracer | None = None
+
+
+def start_tracing() -> Tracer:
+    """
+    Start collecting spans.
+
+    Returns:
+        Tracer: The tracer the spans are collected in.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> None:
+    """
+    Stop collecting spans.
+    """
+    global _tracer
+    _tracer = None
+
+
+def active_tracer() -> Tracer | None:
+    """
+    Get the tracer spans are being collected in, if tracing is on.
+    """
+    return _tracer
+
+
+def span(name: str, **args):
+    """
+    Time a stage, if tracing is on.
+
+    Use as `with span("fetch", url=url): ...`.
+
+    Args:
+        name (str): The name of the stage.
+        **args: Details shown with the span in the trace viewer.
+
+    Returns:
+        A context manager timing its block.
+    """
+    if _tracer is None:
+        return NULL_SPAN
+    return Span(_tracer, name, args)
+
+
+def new_track(label: str) -> None:
+    """
+    Put the spans of the current task on their own track, if tracing is on.
+
+    Args:
+        label (str): The track's name in the trace viewer.
+    """
+    if _tracer is not None:
+        _tracer.new_track(label)
+
+
+def current_track() -> int:
+    """
+    Get the track the current task's spans are put on.
+
+    Returns:
+        int: The track, to be passed to `use_track` by another task.
+    """
+    return _track.get()
+
+
+def use_track(track: int) -> None:
+    """
+    Put the spans of the current task on a track started by another task, such as
+    the track of a job that is handed from one pipeline stage to the next.
+
+    Args:
+        track (int): The track, from `current_track`.
+    """
+    _track.set(track)
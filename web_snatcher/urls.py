@@ -0,0 +1,177 @@
+import os
+import re
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
+
+# Ports that can be dropped from a URL without changing what it points to
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track where a visitor came from. Any parameter
+# starting with "utm_" is dropped as well.
+TRACKING_PARAMS = {
+    "fbclid",
+    "gclid",
+    "dclid",
+    "msclkid",
+    "mc_cid",
+    "mc_eid",
+    "igshid",
+    "_ga",
+    "ref_src",
+}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so trivially different spellings of it compare equal.
+
+    The scheme and host are lowercased, default ports and fragments are dropped
+    and an empty path becomes "/". The query string is left untouched.
+
+    Args:
+        url (str): The URL to normalize.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        # IPv6 literals need their brackets back
+        host = f"[{host}]"
+    netloc = host
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username
+        if parts.password:
+            userinfo = f"{userinfo}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def is_tracking_param(name: str) -> bool:
+    """
+    Check whether a query parameter only tracks where a visitor came from.
+
+    Args:
+        name (str): The parameter name.
+
+    Returns:
+        bool: True if the parameter can be dropped without changing the page.
+    """
+    name = name.lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Reduce a URL to the form used to recognise pages that were already archived.
+
+    On top of normalize_url, tracking parameters are stripped, the remaining
+    query parameters are sorted, a leading "www." is dropped from the host and
+    a trailing slash is dropped from the path. The result identifies a page;
+    it is not meant to be fetched, as not every site serves the bare host.
+
+    Args:
+        url (str): The URL to canonicalize.
+
+    Returns:
+        str: The canonical URL.
+    """
+    parts = urlsplit(normalize_url(url))
+    netloc = parts.netloc
+    host = netloc.rpartition("@")[2]
+    if host.startswith("www."):
+        netloc = netloc[: len(netloc) - len(host)] + host[4:]
+    path = parts.path
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    params = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ]
+    query = urlencode(sorted(params))
+    return urlunsplit((parts.scheme, netloc, path, query, ""))
+
+
+def page_key(url: str) -> str:
+    """
+    Get the key that identifies a page across the spellings of its URL.
+
+    Args:
+        url (str): The page's URL.
+
+    Returns:
+        str: The canonical URL, or the URL as given if it is too malformed to be
+            canonicalized.
+    """
+    try:
+        return canonicalize_url(url)
+    except ValueError:
+        return url
+
+
+def validate_url(value: str) -> bool:
+    """
+    Validate if the given string is a valid URL.
+
+    A valid URL has a scheme and a host, and its port, if any, is a number
+    between 0 and 65535, so it can always be canonicalized.
+
+    Args:
+        value (str): The URL to validate.
+
+    Returns:
+        bool: True if the URL is valid, False otherwise.
+    """
+    try:
+        result = urlparse(value)
+        # Raises ValueError for a port that is not a number or out of range
+        result.port
+        return all([result.scheme, result.netloc, result.hostname])
+    except ValueError:
+        return False
+
+
+def generate_output_name(url: str) -> str:
+    """
+    Generate a meaningful output name based on the URL, always including the domain
+    name.
+
+    Args:
+        url (str): The URL to generate the output name from.
+
+    Returns:
+        str: A string representing the output name.
+    """
+    try:
+        parsed_url = urlparse(url)
+        domain, path = parsed_url.netloc, parsed_url.path
+    except ValueError:
+        # Malformed URLs still get a name, as they are reported like any other job
+        domain, path = "invalid", ""
+    path_parts = path.split("/")
+
+    # Remove empty parts and the first part (which is usually empty)
+    path_parts = [part for part in path_parts if part]
+
+    if path_parts:
+        # Use the last part of the path as the base name
+        base_name = path_parts[-1]
+    else:
+        # If no path parts, use 'index' as the base name
+        base_name = "index"
+
+    # Remove any file extension
+    base_name = os.path.splitext(base_name)[0]
+
+    # Replace any non-alphanumeric characters with underscores
+    base_name = re.sub(r"\W+", "_", base_name)
+
+    # Add a timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    return f"{domain}_{base_name}_{timestamp}.pdf"
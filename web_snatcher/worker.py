@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from web_snatcher.defaults import DEFAULT_TIMEOUT, TIMEOUT_EXIT_CODE
+from web_snatcher.urls import generate_output_name, validate_url
+
+# httpx and the modules doing the work are imported once there is a job to run
+if TYPE_CHECKING:
+    from web_snatcher.snatcher import Snatcher
+
+logger = logging.getLogger(__name__)
+
+
+def positive_int(value: str) -> int:
+    """
+    Read a command-line value that must be a whole number of at least 1.
+
+    Args:
+        value (str): The value as given.
+
+    Returns:
+        int: The number.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not a number of at least 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Parse the worker's command line.
+
+    Args:
+        argv (list[str] | None): The arguments (default: sys.argv[1:]).
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m web_snatcher.worker",
+        description="Convert pages to PDF and report each result as a line of JSON. "
+        "Pass '-' instead of a URL to read jobs from stdin, one "
+        '{"url": ..., "output": ...} object per line.',
+    )
+    parser.add_argument(
+        "url", help="URL of the webpage to convert, or - to read jobs from stdin"
+    )
+    parser.add_argument("-o", "--output", help="Output PDF file path (single URL only)")
+    parser.add_argument(
+        "-j",
+        "--concurrency",
+        type=positive_int,
+        default=1,
+        help="wkhtmltopdf processes to run at once",
+    )
+    parser.add_argument(
+        "--persistent",
+        action="store_true",
+        help="Keep one wkhtmltopdf process per worker",
+    )
+    parser.add_argument(
+        "--no-prefetch",
+        dest="prefetch",
+        action="store_false",
+        help="Let wkhtmltopdf fetch pages",
+    )
+    parser.add_argument(
+        "--no-http-cache",
+        dest="http_cache",
+        action="store_false",
+        help="Disable the HTTP cache",
+    )
+    parser.add_argument(
+        "--no-pdf-cache",
+        dest="pdf_cache",
+        action="store_false",
+        help="Disable the PDF cache",
+    )
+    parser.add_argument("--cache-dir", help="Base directory for caches")
+    parser.add_argument(
+        "--asset-proxy",
+        action="store_true",
+        help="Fetch assets through a local caching proxy (HTTPS assets are only "
+        "cached when referenced by the pre-fetched HTML)",
+    )
+    parser.add_argument(
+        "--extract",
+        action="store_true",
+        help="Render only the article, with a print template",
+    )
+    parser.add_argument(
+        "--block",
+        action="store_true",
+        help="Block a built-in list of ad and tracking hosts",
+    )
+    parser.add_argument(
+        "--blocklist", help="File of extra hosts and URL patterns to block"
+    )
+    parser.add_argument(
+        "--profile", help="Render profile for pages without a per-domain mapping"
+    )
+    parser.add_argument(
+        "--profiles", help="TOML file of render profiles and per-domain mappings"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="Seconds before a wkhtmltopdf job is killed (0 disables the timeout)",
+    )
+    parser.add_argument(
+        "--readiness",
+        help="Readiness mode as MODE[:MS] (default: the profile's, or adaptive:1000)",
+    )
+    parser.add_argument(
+        "--disable-javascript",
+        action="store_true",
+        help="Render with JavaScript disabled (same as --readiness static)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Times to retry a page after a transient failure",
+    )
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    return parser.parse_args(argv)
+
+
+def read_jobs(lines: list[str]) -> list[dict]:
+    """
+    Read jobs from JSON lines, skipping blank lines.
+
+    Args:
+        lines (list[str]): The lines, each a {"url": ..., "output": ...} object.
+
+    Returns:
+        list[dict]: The jobs. A line that is not a valid job becomes a job with
+            an "error" key, so it is reported like any other failure.
+    """
+    jobs = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            jobs.append({"url": None, "output": None, "error": f"Invalid JSON: {e}"})
+            continue
+        if not isinstance(job, dict) or not job.get("url") or not job.get("output"):
+            jobs.append(
+                {"url": None, "output": None, "error": "Expected url and output"}
+            )
+            continue
+        jobs.append({"url": job["url"], "output": job["output"]})
+    return jobs
+
+
+async def run_job(job: dict, snatcher: "Snatcher") -> dict:
+    """
+    Convert a page, capturing any failure in the result instead of raising it.
+
+    Args:
+        job (dict): The job, with "url" and "output" keys.
+        snatcher (Snatcher): The shared resources to convert the page with.
+
+    Returns:
+        dict: The result, with the job's url and output, "ok", and on failure
+            "error" and "reason" (see snatcher.failure_reason).
+    """
+    import httpx
+
+    from web_snatcher.retry import CircuitOpenError
+    from web_snatcher.snatcher import describe_error, failure_reason
+
+    url, output = job["url"], job["output"]
+    result = {"url": url, "output": output, "ok": False}
+    if job.get("error"):
+        return {**result, "error": job["error"], "reason": "invalid_job"}
+    if not validate_url(url):
+        return {**result, "error": "Invalid URL", "reason": "invalid_url"}
+
+    started = time.monotonic()
+    try:
+        await snatcher.snatch(url, output)
+        result["ok"] = True
+    except (httpx.HTTPError, subprocess.SubprocessError, CircuitOpenError) as e:
+        result["error"], result["reason"] = describe_error(e), failure_reason(e)
+    except Exception as e:
+        logger.exception(f"Unexpected error converting {url}")
+        result["error"], result["reason"] = str(e), "unexpected"
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
+
+
+async def run_jobs(jobs: list[dict], snatcher: "Snatcher") -> list[dict]:
+    """
+    Run jobs concurrently, writing each result to stdout as soon as it is known.
+
+    Args:
+        jobs (list[dict]): The jobs.
+        snatcher (Snatcher): The shared resources. It is closed afterwards.
+
+    Returns:
+        list[dict]: The result of each job, in completion order.
+    """
+    results = []
+    async with snatcher:
+        for task in asyncio.as_completed([run_job(job, snatcher) for job in jobs]):
+            result = await task
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    """
+    Run the worker.
+
+    A minimal entry point for scripts and other programs: it imports neither
+    typer nor rich, writes nothing but one JSON result per job to stdout and
+    leaves logging on stderr.
+
+    Args:
+        argv (list[str] | None): The arguments (default: sys.argv[1:]).
+
+    Returns:
+        int: The exit status: 0 if every job succeeded, 124 if a single page
+            timed out, 2 for invalid options and 1 for any other failure.
+    """
+    from web_snatcher.factory import conversion_settings, snatcher_from_settings
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
+
+    if args.url == "-":
+        jobs = read_jobs(sys.stdin.read().splitlines())
+    else:
+        jobs = [
+            {"url": args.url, "output": args.output or generate_output_name(args.url)}
+        ]
+
+    try:
+        options = {
+            name: value
+            for name, value in vars(args).items()
+            if name not in ("url", "output", "debug")
+        }
+        snatcher = snatcher_from_settings(conversion_settings(options))
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    results = asyncio.run(run_jobs(jobs, snatcher))
+    if all(result["ok"] for result in results):
+        return 0
+    if len(results) == 1 and results[0]["reason"] == "render_timeout":
+        return TIMEOUT_EXIT_CODE
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())